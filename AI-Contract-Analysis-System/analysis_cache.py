@@ -0,0 +1,142 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Lifetime of entries in the 'analysis_cache' collection
+STORE_TTL_DAYS = float(os.environ.get("LEXIGUARD_CACHE_TTL_DAYS", "30"))
+
+class AnalysisCache:
+    """
+    Two-tier cache of contract analysis results, shared by app.py and api.py.
+
+    Keys are a SHA256 of the whitespace-normalized contract text plus the
+    analysis version (model, keywords, segmenter), so re-exported or
+    re-submitted copies of the same text hit, and a new model or keyword set
+    misses. An in-process LRU tier (bounded size, TTL) sits in front of the
+    persistent 'analysis_cache' collection, whose entries carry an expires_at
+    timestamp (store_ttl seconds after the write) and are ignored once expired.
+    """
+    def __init__(self, db, max_entries=256, ttl=3600, collection='analysis_cache',
+                 store_ttl=STORE_TTL_DAYS * 86400):
+        self.db = db
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store_ttl = store_ttl
+        self.collection = collection
+        self._entries = OrderedDict()   # key -> (expires_at, result)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text, version):
+        normalized = " ".join(text.split())
+        digest = hashlib.sha256()
+        digest.update(version.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(normalized.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Returns the cached result or None. Store hits are promoted to memory.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    metrics.inc("cache_hits", cache="analysis", tier="memory")
+                    return entry[1]
+                del self._entries[key]
+
+        result = None
+        try:
+            ref = self.db.collection(self.collection).document(key)
+            snapshot = ref.get()
+            if snapshot.exists:
+                result = snapshot.to_dict()
+                expires_at = result.pop("expires_at", None)
+                # Firestore reads naive datetimes as UTC and returns them tz-aware
+                if expires_at is not None and expires_at.tzinfo is None:
+                    expires_at = expires_at.replace(tzinfo=timezone.utc)
+                if expires_at is not None and expires_at <= datetime.now(timezone.utc):
+                    # Firestore's TTL policy deletes lazily; don't wait for it
+                    ref.delete()
+                    result = None
+        except Exception as e:
+            logger.warning(f"Analysis cache lookup failed: {e}")
+
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                metrics.inc("cache_misses", cache="analysis")
+                return None
+            self.store_hits += 1
+            metrics.inc("cache_hits", cache="analysis", tier="store")
+            self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._remember(key, result)
+        try:
+            self.db.collection(self.collection).document(key).set(self._stored(result))
+        except Exception as e:
+            logger.warning(f"Analysis cache write failed: {e}")
+
+    def put_many(self, items, batch_size=500):
+        """
+        Caches several (key, result) pairs, persisting them with batched writes.
+        """
+        items = list(items)
+        with self._lock:
+            for key, result in items:
+                self._remember(key, result)
+        try:
+            for start in range(0, len(items), batch_size):
+                batch = self.db.batch()
+                for key, result in items[start:start + batch_size]:
+                    batch.set(self.db.collection(self.collection).document(key), self._stored(result))
+                batch.commit()
+        except Exception as e:
+            logger.warning(f"Analysis cache write failed: {e}")
+
+    def invalidate(self, key=None):
+        """
+        Drops one key (or the whole memory tier) from the in-process cache.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.store_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "memory_hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.store_hits) / lookups if lookups else 0.0
+            }
+
+    def _stored(self, result):
+        return {**result, "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.store_ttl)}
+
+    def _remember(self, key, result):
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
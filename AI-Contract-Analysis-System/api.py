@@ -1,63 +1,480 @@
-from flask import Flask, request, jsonify
-from nlp_processor import NLPProcessor
-from risk_engine import RiskEngine
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from firebase_config import db
+from contract_store import contract_aggregates, save_contract, save_contracts, find_by_hash, fetch_risks, load_risks, iter_risks, CONTRACTS
+from reports import ReportCache
+from revisions import analyze_revision, RevisionError
+from utils import render_pdf_report
+from uploads import stage_upload
+from analysis_cache import AnalysisCache
+from jobs import JobQueue, QueueFullError
+from metrics import metrics, RequestProfiler
+from startup import Warmup, STARTUP_MODE
 from datetime import datetime
 import os
+import json
+import time
 import logging
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize components
-nlp = NLPProcessor()
-risk_engine = RiskEngine()
+# Initialize components. The heavy ones are set by load_components(): while
+# importing (LEXIGUARD_STARTUP=eager, the default) or in a background thread
+# (LEXIGUARD_STARTUP=lazy), in which case /ready reports when they are loaded.
+analysis_cache = AnalysisCache(db)
+report_cache = ReportCache()
+parser = nlp = risk_engine = near_duplicates = clause_index = None
+
+def load_components():
+    global parser, nlp, risk_engine, near_duplicates, clause_index
+    # spaCy, scikit-learn/scipy, pdfplumber and python-docx are imported here, not at module load
+    from contract_parser import ContractParser
+    from nlp_processor import NLPProcessor
+    from risk_engine import RiskEngine
+    from near_duplicates import NearDuplicateIndex
+    from clause_index import ClauseIndex
+
+    # No db.client() here: under gunicorn this runs in the master before the
+    # fork, and the gRPC Firestore client must be created in each worker
+    parser = ContractParser()
+    nlp = NLPProcessor()
+    risk_engine = RiskEngine()
+    near_duplicates = NearDuplicateIndex(db)
+    clause_index = ClauseIndex(db)
+
+def load_indexes():
+    """
+    Loads this process's clause similarity and near-duplicate indexes from Firestore.
+    """
+    warmup.wait()
+    near_duplicates.load()
+    clause_index.load()
+
+warmup = Warmup(load_components)
+# Per process, never in the preloading gunicorn master: started by the
+# post_worker_init hook, in lazy mode, or by the first /clauses/similar request
+indexes = Warmup(load_indexes, name="indexes")
+# Endpoints served while the models are still loading
+NO_MODEL_ENDPOINTS = {"health_check", "readiness", "prometheus_metrics", "get_job", "get_contract",
+                      "get_contract_risks"}
+
+# Documents per spaCy/model/Firestore batch in /analyze/batch
+BATCH_CHUNK_SIZE = int(os.environ.get("LEXIGUARD_BATCH_CHUNK_SIZE", 64))
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl')
+
+# Sampled cProfile dumps for requests slower than LEXIGUARD_SLOW_REQUEST_SECONDS
+profiler = RequestProfiler(
+    sample_rate=float(os.environ.get("LEXIGUARD_PROFILE_SAMPLE", 0)),
+    threshold=float(os.environ.get("LEXIGUARD_SLOW_REQUEST_SECONDS", 2.0)),
+    dump_dir=os.environ.get("LEXIGUARD_PROFILE_DIR", "profiles")
+)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.profile = profiler.start()
+
+@app.before_request
+def require_models():
+    if not warmup.ready and request.endpoint in app.view_functions and request.endpoint not in NO_MODEL_ENDPOINTS:
+        response = jsonify({"error": "Models are still loading, retry shortly", "models": warmup.status()})
+        response.headers['Retry-After'] = "5"
+        return response, 503
+
+@app.after_request
+def record_request_metrics(response):
+    # Streamed responses (/analyze/batch) are timed up to the first byte only
+    elapsed = time.perf_counter() - g.request_started
+    endpoint = request.endpoint or "unknown"
+    metrics.observe("request_seconds", elapsed, help="API request latency.", endpoint=endpoint)
+    metrics.inc("requests", endpoint=endpoint, status=response.status_code)
+    if g.get("profile") is not None:
+        profiler.stop(g.profile, endpoint, elapsed)
+        g.profile = None
+    return response
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy", "service": "LexiGuard API"})
+    """
+    Liveness: answers as soon as the app is imported, even while models load.
+    """
+    return jsonify({"status": "healthy", "service": "LexiGuard API", "models": warmup.status(),
+                    "indexes": indexes.status(), "cache": analysis_cache.stats(), "jobs": job_queue.stats()})
+
+@app.route('/ready', methods=['GET'])
+def readiness():
+    """
+    Readiness: 200 once the models are loaded, 503 while loading or after a failed load.
+    The indexes are reported but not waited for: only /clauses/similar needs them.
+    """
+    body = {"ready": warmup.ready, "models": warmup.status(), "warmup_seconds": warmup.seconds,
+            "indexes": indexes.status()}
+    if warmup.error is not None:
+        body["error"] = str(warmup.error)
+    return jsonify(body), 200 if warmup.ready else 503
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/analyze', methods=['POST'])
 def analyze_contract():
     try:
+        if 'file' in request.files:
+            return jsonify(analyze_upload(request.files['file'], revision_of=request.form.get('revision_of')))
         data = request.json
         if not data or 'text' not in data:
             return jsonify({"error": "No text provided"}), 400
 
-        raw_text = data['text']
-        filename = data.get('filename', 'api_upload.txt')
+        return jsonify(run_analysis(data['text'], data.get('filename', 'api_upload.txt'),
+                                    revision_of=data.get('revision_of')))
 
-        # Clean and Segment
-        clean_text = nlp.clean_text(raw_text)
-        clauses = nlp.segment_clauses(clean_text)
+    except RevisionError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        logger.error(f"API Error: {e}")
+        return jsonify({"error": str(e)}), 500
 
-        # Analyze Risk
-        analysis_result = risk_engine.analyze_contract(clauses)
+def analyze_upload(file_storage, revision_of=None):
+    """
+    /analyze with a multipart PDF/DOCX upload ('file'). The file is hashed and
+    looked up before parsing, so re-uploading a stored contract costs a hash
+    and one query instead of a full parse and analysis.
+    """
+    filename = file_storage.filename or "upload"
+    with stage_upload(file_storage.stream, filename) as upload:
+        duplicate = find_by_hash(db, upload.file_hash)
+        if duplicate is not None:
+            metrics.inc("duplicate_uploads")
+            return {
+                "success": True,
+                "risk_score": duplicate.get('risk_score'),
+                "summary": duplicate.get('summary'),
+                "details": load_risks(db, duplicate['id'], legacy=duplicate.get('risks')),
+                "id": duplicate['id'],
+                "duplicate": True
+            }
+        with metrics.span("parse"):
+            raw_text = parser.parse_stream(upload.open(), filename)
+    return run_analysis(raw_text, filename, revision_of=revision_of, file_hash=upload.file_hash)
 
-        # Store Results
-        contract_data = {
-            "filename": filename,
-            "timestamp": datetime.now(),
-            "risk_score": analysis_result['risk_score'],
-            "risks": analysis_result['risks'],
-            "summary": analysis_result['summary'],
-            "source": "api"
-        }
-        
-        _, doc_ref = db.collection('contracts').add(contract_data)
-        
-        return jsonify({
+def run_analysis(raw_text, filename, source="api", revision_of=None, file_hash=None):
+    """
+    The full single-document pipeline: cache lookup, clean, segment, score, store.
+    revision_of: id of a stored contract this text is a revision of; only
+    changed clauses are scored and the response carries the risk delta.
+    file_hash: SHA256 of the uploaded file, stored for duplicate detection.
+    """
+    base = None
+    if revision_of:
+        base = db.collection(CONTRACTS).document(revision_of).get()
+        if not base.exists:
+            raise RevisionError(f"Contract {revision_of} not found")
+
+    # Identical text already analyzed with this model/keyword version?
+    cache_key = AnalysisCache.make_key(raw_text, f"{risk_engine.version}/{nlp.segmenter}")
+    cached = analysis_cache.get(cache_key) if base is None else None
+    if cached:
+        return {
             "success": True,
-            "risk_score": analysis_result['risk_score'],
-            "summary": analysis_result['summary'],
-            "details": analysis_result['risks'],
-            "id": doc_ref.id
-        })
+            "risk_score": cached['risk_score'],
+            "summary": cached['summary'],
+            "details": load_risks(db, cached.get('contract_id'), legacy=cached.get('risks')),
+            "id": cached.get('contract_id'),
+            "cached": True
+        }
 
-    except Exception as e:
-        logger.error(f"API Error: {e}")
-        return jsonify({"error": str(e)}), 500
+    # Clean and Segment
+    clauses = nlp.segment_document(raw_text)
+    metrics.inc("documents", source=source)
+    metrics.inc("clauses", len(clauses))
+
+    # Analyze Risk, reusing clause results of the base revision or the closest earlier contract
+    match = delta = None
+    if base is not None:
+        analysis_result, delta = analyze_revision(risk_engine, near_duplicates, base.to_dict(), revision_of, clauses)
+    else:
+        match = near_duplicates.find(clauses, risk_engine.version)
+        analysis_result = risk_engine.analyze_contract(clauses, known_results=match["known"] if match else None)
+
+    # Store Results (clause details go to risk_analysis, the contract keeps aggregates)
+    aggregates = contract_aggregates(analysis_result)
+    contract_data = {
+        "filename": filename,
+        "timestamp": datetime.now(),
+        **aggregates,
+        "analysis_key": cache_key,
+        "source": source
+    }
+    if revision_of:
+        contract_data["revision_of"] = revision_of
+    if file_hash:
+        contract_data["hash"] = file_hash
+    
+    with metrics.span("persist"):
+        contract_id = save_contract(db, contract_data, analysis_result['risks'])
+    near_duplicates.add(contract_id, analysis_result['clause_digest'], risk_engine.version)
+    analysis_cache.put(cache_key, {**aggregates, "contract_id": contract_id})
+    
+    response = {
+        "success": True,
+        "risk_score": analysis_result['risk_score'],
+        "summary": analysis_result['summary'],
+        "details": analysis_result['risks'],
+        "id": contract_id
+    }
+    if match:
+        response["near_duplicate"] = _near_duplicate_info(match, analysis_result)
+    if delta is not None:
+        response["revision"] = delta
+    return response
+
+def _near_duplicate_info(match, analysis_result):
+    return {
+        "contract_id": match["contract_id"],
+        "similarity": match["similarity"],
+        "reused_clauses": sum(1 for c in analysis_result['clause_digest'] if c['fp'] in match["known"])
+    }
+
+def _run_job(payload):
+    return run_analysis(payload['text'], payload.get('filename', 'api_upload.txt'), source="api_job",
+                        revision_of=payload.get('revision_of'))
+
+job_queue = JobQueue(
+    _run_job,
+    workers=int(os.environ.get("LEXIGUARD_JOB_WORKERS", 2)),
+    max_queue=int(os.environ.get("LEXIGUARD_JOB_QUEUE_SIZE", 100)),
+    db=db
+)
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queues an analysis and returns immediately; poll GET /jobs/<id> for the result.
+    """
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('text'), str):
+        return jsonify({"error": "No text provided"}), 400
+    try:
+        job_id = job_queue.submit({"text": data['text'], "filename": data.get('filename', 'api_upload.txt'),
+                                   "revision_of": data.get('revision_of')})
+    except QueueFullError as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = "5"
+        return response, 429
+    response = jsonify({"job_id": job_id, "status": "queued"})
+    response.headers['Location'] = f"/jobs/{job_id}"
+    return response, 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/clauses/similar', methods=['GET', 'POST'])
+def similar_clauses():
+    """
+    The stored flagged clauses most similar to a clause text.
+    Parameters (query string or JSON body): text, k (default 10, max 100) and
+    exclude_contract (e.g. the id of the contract the clause comes from).
+    """
+    params = request.get_json(silent=True) if request.method == 'POST' else request.args
+    if not params or not isinstance(params.get('text'), str) or not params.get('text').strip():
+        return jsonify({"error": "No text provided"}), 400
+    try:
+        k = int(params.get('k', 10))
+    except (TypeError, ValueError):
+        return jsonify({"error": "k must be an integer"}), 400
+    if not 1 <= k <= 100:
+        return jsonify({"error": "k must be between 1 and 100"}), 400
+    if not indexes.start().ready:
+        response = jsonify({"error": "Clause index is still loading, retry shortly", "indexes": indexes.status()})
+        response.headers['Retry-After'] = "5"
+        return response, 503
+    matches = clause_index.query(params['text'], k=k, exclude_contract=params.get('exclude_contract'))
+    return jsonify({"matches": matches, "indexed_clauses": len(clause_index)})
+
+@app.route('/contracts/<contract_id>', methods=['GET'])
+def get_contract(contract_id):
+    """
+    Contract aggregates only; clause details are paged via /contracts/<id>/risks.
+    """
+    snapshot = db.collection(CONTRACTS).document(contract_id).get()
+    if not snapshot.exists:
+        return jsonify({"error": "Contract not found"}), 404
+    contract = snapshot.to_dict()
+    legacy = contract.pop('risks', None)
+    if legacy is not None:
+        contract.setdefault('risk_count', len(legacy))
+    return jsonify({**contract, "id": contract_id})
+
+@app.route('/contracts/<contract_id>/risks', methods=['GET'])
+def get_contract_risks(contract_id):
+    """
+    Pages through a contract's clause results: ?page_size=20&after=<next from the previous page>.
+    """
+    try:
+        page_size = min(max(int(request.args.get('page_size', 20)), 1), 100)
+        after = request.args.get('after', type=int)
+    except ValueError:
+        return jsonify({"error": "page_size must be an integer"}), 400
+
+    snapshot = db.collection(CONTRACTS).document(contract_id).get()
+    if not snapshot.exists:
+        return jsonify({"error": "Contract not found"}), 404
+    legacy = (snapshot.to_dict() or {}).get('risks')
+    if legacy:
+        # Contracts stored before the split still embed their clauses
+        start = 0 if after is None else after + 1
+        risks = [{"position": start + i, **risk} for i, risk in enumerate(legacy[start:start + page_size])]
+        next_after = start + page_size - 1 if start + page_size < len(legacy) else None
+        return jsonify({"risks": risks, "next": next_after})
+    return jsonify(fetch_risks(db, contract_id, page_size=page_size, after=after))
+
+@app.route('/contracts/<contract_id>/report', methods=['GET'])
+def get_contract_report(contract_id):
+    """
+    The PDF report, rendered in memory and cached per contract and model version.
+    """
+    snapshot = db.collection(CONTRACTS).document(contract_id).get()
+    if not snapshot.exists:
+        return jsonify({"error": "Contract not found"}), 404
+    contract = {**snapshot.to_dict(), "id": contract_id}
+    key = ReportCache.make_key(contract, risk_engine.version)
+    report = report_cache.get(key)
+    if report is None:
+        with metrics.span("report"):
+            report = render_pdf_report(contract, iter_risks(db, contract_id, legacy=contract.get('risks')))
+        report_cache.put(key, report)
+    return Response(report, mimetype='application/pdf',
+                    headers={"Content-Disposition": f'attachment; filename="report_{contract_id}.pdf"'})
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """
+    Accepts a JSON array of {"text", "filename"} documents (or {"documents": [...]}),
+    or an NDJSON stream with one document per line. Streams back one NDJSON
+    result line per document, in input order, as each chunk completes.
+    """
+    if request.mimetype not in NDJSON_MIMETYPES:
+        data = request.get_json(silent=True)
+        documents = data.get('documents') if isinstance(data, dict) else data
+        if not isinstance(documents, list):
+            return jsonify({"error": "Expected a JSON array of documents or an NDJSON stream"}), 400
+    else:
+        documents = None
+
+    def generate():
+        chunk = []
+        for index, document in enumerate(_iter_documents(documents)):
+            chunk.append((index, document))
+            if len(chunk) == BATCH_CHUNK_SIZE:
+                yield from _analyze_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield from _analyze_chunk(chunk)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def _iter_documents(documents):
+    if documents is not None:
+        yield from documents
+        return
+    for line in request.stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield {"error": f"Invalid JSON line: {e}"}
+
+def _analyze_chunk(chunk):
+    """
+    Runs one chunk of documents through batched segmentation (nlp.pipe), one
+    vectorized risk scoring call and one batched Firestore write.
+    """
+    version = f"{risk_engine.version}/{nlp.segmenter}"
+    results = {}
+    pending = {}  # cache key -> [(index, filename)], so duplicates in a chunk are analyzed once
+    texts = {}
+    for index, document in chunk:
+        if not isinstance(document, dict) or not isinstance(document.get('text'), str):
+            error = document.get('error') if isinstance(document, dict) else None
+            results[index] = {"index": index, "success": False, "error": error or "No text provided"}
+            continue
+        cache_key = AnalysisCache.make_key(document['text'], version)
+        cached = analysis_cache.get(cache_key)
+        if cached:
+            details = load_risks(db, cached.get('contract_id'), legacy=cached.get('risks'))
+            results[index] = _batch_result(index, cached, details, cached.get('contract_id'), cached=True)
+            continue
+        pending.setdefault(cache_key, []).append((index, document.get('filename', 'api_upload.txt')))
+        texts.setdefault(cache_key, document['text'])
+
+    if pending:
+        try:
+            keys = list(pending)
+            clause_lists = nlp.segment_documents([texts[key] for key in keys], batch_size=BATCH_CHUNK_SIZE)
+            # Clause results are a function of (clause, version), so the
+            # known results of all near-duplicate matches can be pooled
+            known = {}
+            for clauses in clause_lists:
+                match = near_duplicates.find(clauses, risk_engine.version)
+                if match:
+                    known.update(match["known"])
+            analyses = risk_engine.analyze_contracts(clause_lists, known_results=known)
+            metrics.inc("documents", len(keys), source="api_batch")
+            metrics.inc("clauses", sum(len(clauses) for clauses in clause_lists))
+
+            now = datetime.now()
+            aggregates = [contract_aggregates(analysis) for analysis in analyses]
+            with metrics.span("persist"):
+                ids = save_contracts(db, (({
+                    "filename": pending[key][0][1],
+                    "timestamp": now,
+                    **aggregate,
+                    "analysis_key": key,
+                    "source": "api_batch"
+                }, analysis['risks']) for key, analysis, aggregate in zip(keys, analyses, aggregates)))
+            near_duplicates.add_many((doc_id, analysis['clause_digest'], risk_engine.version)
+                                     for analysis, doc_id in zip(analyses, ids))
+            analysis_cache.put_many((key, {**aggregate, "contract_id": doc_id})
+                                    for key, aggregate, doc_id in zip(keys, aggregates, ids))
+
+            for key, analysis, doc_id in zip(keys, analyses, ids):
+                for n, (index, _) in enumerate(pending[key]):
+                    results[index] = _batch_result(index, analysis, analysis['risks'], doc_id, cached=n > 0)
+        except Exception as e:
+            logger.error(f"API Batch Error: {e}")
+            for entries in pending.values():
+                for index, _ in entries:
+                    results[index] = {"index": index, "success": False, "error": str(e)}
+
+    for index, _ in chunk:
+        yield json.dumps(results[index], default=str) + "\n"
+
+def _batch_result(index, analysis, details, doc_id, cached=False):
+    return {
+        "index": index,
+        "success": True,
+        "risk_score": analysis['risk_score'],
+        "summary": analysis['summary'],
+        "details": details,
+        "id": doc_id,
+        "cached": cached
+    }
+
+if STARTUP_MODE == "lazy":
+    warmup.start()
+    indexes.start()
+else:
+    warmup.wait()
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    indexes.start()
+    # Development server; for production use: gunicorn -c gunicorn.conf.py api:app
+    app.run(debug=os.environ.get("LEXIGUARD_DEBUG") == "1", port=5000, threaded=True)
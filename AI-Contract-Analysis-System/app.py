@@ -2,22 +2,62 @@ import streamlit as st
 import os
 from datetime import datetime
 import tempfile
-from contract_parser import ContractParser
-from nlp_processor import NLPProcessor
-from risk_engine import RiskEngine
 from firebase_config import db
-from utils import generate_pdf_report, log_audit_event, compute_file_hash
+from utils import render_pdf_report, log_audit_event
+from analysis_cache import AnalysisCache
+from history_queries import fetch_page, HISTORY_FIELDS, AUDIT_FIELDS
+from contract_store import contract_aggregates, save_contract, find_by_hash, fetch_risks, iter_risks, CONTRACTS
+from uploads import stage_upload
+from reports import ReportCache
+from revisions import analyze_revision, RevisionError
+from metrics import metrics
+from startup import Warmup, STARTUP_MODE
 
-# Initialize components
-@st.cache_resource
-def get_components():
+def build_components():
+    # spaCy, scikit-learn/scipy, pdfplumber and python-docx are imported here, not at module load
+    from contract_parser import ContractParser
+    from nlp_processor import NLPProcessor
+    from risk_engine import RiskEngine
+    from near_duplicates import NearDuplicateIndex
+    from clause_index import ClauseIndex
+
+    # Empty until load_indexes has run (lookups before that wait for it or load themselves)
     return {
         "parser": ContractParser(),
         "nlp": NLPProcessor(),
-        "risk_engine": RiskEngine()
+        "risk_engine": RiskEngine(),
+        "cache": AnalysisCache(db),
+        "reports": ReportCache(),
+        "near_duplicates": NearDuplicateIndex(db),
+        "clause_index": ClauseIndex(db)
     }
 
+def load_indexes(components):
+    """
+    Loads the clause similarity and near-duplicate indexes from Firestore.
+    """
+    components["near_duplicates"].load()
+    components["clause_index"].load()
+
+# Initialize components. With LEXIGUARD_STARTUP=lazy they load in a background
+# thread and components["..."] waits for them, so pages that need no model
+# (History list, Admin) render right away.
+@st.cache_resource
+def get_components():
+    warmup = Warmup(build_components)
+    if STARTUP_MODE == "lazy":
+        return warmup.start()
+    warmup.wait()
+    return warmup
+
+# The indexes grow with the stored contracts, so they always load in the
+# background, as in the API, and never hold up the first page
+@st.cache_resource
+def get_indexes(_components):
+    return Warmup(lambda: load_indexes(_components), name="indexes").start()
+
 components = get_components()
+indexes = get_indexes(components)
 
 def main():
     st.set_page_config(page_title="LexiGuard AI Contract Analysis", layout="wide")
@@ -26,6 +66,10 @@ def main():
     # Sidebar for Navigation
     menu = ["Analysis", "History", "Admin"]
     choice = st.sidebar.selectbox("Menu", menu)
+    if not components.ready:
+        st.sidebar.caption(f"Models: {components.status()}")
+    if not indexes.ready:
+        st.sidebar.caption(f"Indexes: {indexes.status()}")
 
     if choice == "Analysis":
         show_analysis_page()
@@ -38,20 +82,33 @@ def show_analysis_page():
     st.header("Upload Contract for Analysis")
     uploaded_file = st.file_uploader("Upload PDF or DOCX", type=["pdf", "docx"])
 
+    # Optional: treat the upload as a redline of a recent contract
+    recent = fetch_page(db, CONTRACTS, HISTORY_FIELDS, "timestamp", descending=True, page_size=25)["rows"]
+    names = {row['id']: f"{row.get('filename')} ({row.get('timestamp')})" for row in recent}
+    revision_of = st.selectbox("Revision of", [None] + list(names),
+                               format_func=lambda contract_id: "- (new contract)" if contract_id is None else names[contract_id])
+
     if uploaded_file is not None:
         if st.button("Analyze Contract"):
             with st.spinner("Processing document..."):
                 try:
-                    # 1. Parse File
-                    raw_text = components["parser"].parse_uploaded_file(uploaded_file)
-                    
-                    # 2. Check for Duplicates
-                    file_hash = compute_file_hash(uploaded_file.getvalue())
-                    existing_docs = db.collection('contracts').where('hash', '==', file_hash).stream()
-                    duplicate = None
-                    for doc in existing_docs:
-                        duplicate = doc.to_dict()
-                        break
+                    # The base revision may have been deleted since the list was loaded
+                    base = None
+                    if revision_of:
+                        base = db.collection(CONTRACTS).document(revision_of).get()
+                        if not base.exists:
+                            st.error(f"Base contract {revision_of} not found. It may have been deleted; "
+                                     f"choose another revision or analyze as a new contract.")
+                            return
+
+                    # 1. Hash the upload and check for duplicates before parsing
+                    with stage_upload(uploaded_file, uploaded_file.name) as upload:
+                        file_hash = upload.file_hash
+                        duplicate = find_by_hash(db, file_hash)
+                        # 2. Parse File
+                        if duplicate is None:
+                            with metrics.span("parse"):
+                                raw_text = components["parser"].parse_stream(upload.open(), upload.name)
                     
                     if duplicate:
                         st.warning(f"Duplicate contract detected! Analyzed on {duplicate['timestamp']}")
@@ -59,35 +116,95 @@ def show_analysis_page():
                         display_results(duplicate)
                         return
 
+                    # Same contract text (e.g. re-exported file) already analyzed with this model?
+                    version = f"{components['risk_engine'].version}/{components['nlp'].segmenter}"
+                    cache_key = AnalysisCache.make_key(raw_text, version)
+                    cached = components["cache"].get(cache_key) if not revision_of else None
+                    if cached:
+                        st.warning("Identical contract text was analyzed before. Showing cached results.")
+                        display_results({**cached, "id": cached.get('contract_id'),
+                                         "filename": uploaded_file.name, "hash": file_hash})
+                        return
+
                     # 3. Clean and Segment
+                    clauses = components["nlp"].segment_document(raw_text)
                     clean_text = components["nlp"].clean_text(raw_text)
-                    clauses = components["nlp"].segment_clauses(clean_text)
+                    metrics.inc("documents", source="streamlit")
+                    metrics.inc("clauses", len(clauses))
                     
-                    # 4. Analyze Risk
-                    analysis_result = components["risk_engine"].analyze_contract(clauses)
+                    # 4. Analyze Risk (only clauses that differ from the base revision
+                    #    or the closest earlier contract)
+                    match = delta = None
+                    if base is not None:
+                        analysis_result, delta = analyze_revision(components["risk_engine"], components["near_duplicates"],
+                                                                  base.to_dict(), revision_of, clauses)
+                    else:
+                        match = components["near_duplicates"].find(clauses, components["risk_engine"].version)
+                        analysis_result = components["risk_engine"].analyze_contract(
+                            clauses, known_results=match["known"] if match else None)
                     
-                    # 5. Store Results
+                    # 5. Store Results (clause details go to risk_analysis)
+                    aggregates = contract_aggregates(analysis_result)
                     contract_data = {
                         "filename": uploaded_file.name,
                         "hash": file_hash,
                         "timestamp": datetime.now(),
-                        "risk_score": analysis_result['risk_score'],
-                        "risks": analysis_result['risks'],
-                        "summary": analysis_result['summary'],
-                        "full_text_snippet": clean_text[:500]
+                        **aggregates,
+                        "full_text_snippet": clean_text[:500],
+                        "analysis_key": cache_key
                     }
+                    if revision_of:
+                        contract_data["revision_of"] = revision_of
                     
-                    _, doc_ref = db.collection('contracts').add(contract_data)
+                    with metrics.span("persist"):
+                        contract_id = save_contract(db, contract_data, analysis_result['risks'])
+                    components["near_duplicates"].add(contract_id, analysis_result['clause_digest'],
+                                                      components["risk_engine"].version)
+                    components["cache"].put(cache_key, {**aggregates, "contract_id": contract_id})
                     log_audit_event(db, "user", "analyze_contract", f"Analyzed {uploaded_file.name}")
                     
                     # 6. Display Results
                     st.success("Analysis Complete!")
+                    if match:
+                        reused = sum(1 for c in analysis_result['clause_digest'] if c['fp'] in match["known"])
+                        st.info(f"Near-duplicate of an earlier contract ({match['similarity']:.0%} similar): "
+                                f"reused results for {reused} unchanged clauses.")
+                    if delta is not None:
+                        show_revision_delta(delta, analysis_result['risk_score'])
                     display_results(contract_data)
 
+                except RevisionError as e:
+                    st.error(f"Cannot analyze as a revision: {e}")
                 except Exception as e:
                     st.error(f"An error occurred: {e}")
                     log_audit_event(db, "system", "error", str(e))
 
+def show_revision_delta(delta, risk_score):
+    st.subheader("Changes from previous revision")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Risk Score", risk_score, delta=delta["risk_score_change"], delta_color="inverse")
+    col2.metric("Unchanged clauses", delta["unchanged"])
+    col3.metric("Added / Modified", f"{len(delta['added'])} / {len(delta['modified'])}")
+    col4.metric("Removed", len(delta["removed"]))
+    if not delta.get("base_clauses_known", True):
+        st.info("The previous revision's clauses were not stored, so clause changes cannot be shown. "
+                "All clauses were scored again.")
+    if delta["modified"]:
+        st.write("**Modified clauses**")
+        st.dataframe([{
+            "Clause": change["clause"],
+            "Before": f"{change['before']['level']} ({change['before']['score']:.2f})",
+            "After": f"{change['after']['level']} ({change['after']['score']:.2f})"
+        } for change in delta["modified"]])
+    if delta["added"]:
+        st.write("**Added clauses**")
+        st.dataframe([{"Clause": change["clause"], "Level": change["level"], "Score": round(change["score"], 2)}
+                      for change in delta["added"]])
+    if delta["removed"]:
+        st.write("**Removed clauses**")
+        st.dataframe([{"Position": change["position"], "Level": change["level"], "Score": round(change["score"], 2)}
+                      for change in delta["removed"]])
+
 def display_results(data):
     st.subheader(f"Risk Score: {data['risk_score']}/100")
     
@@ -105,52 +222,157 @@ def display_results(data):
         st.write(f"Date: {data.get('timestamp', 'Unknown')}")
 
     st.subheader("Detailed Risk Analysis")
-    risks = data.get('risks', [])
+    risk_count = data.get('risk_count', len(data.get('risks', [])))
     
-    if not risks:
+    if not risk_count:
         st.success("No high risks detected.")
     else:
+        st.write(f"{risk_count} clauses flagged.")
+        risks = show_risk_page(data)
         for risk in risks:
             with st.expander(f"{risk['level']} Risk: {risk['type']}"):
                 st.write(f"**Clause:** {risk['clause']}")
                 st.write(f"**Explanation:** {risk['explanation']}")
                 st.write(f"**Score:** {risk['score']:.2f}")
+        show_similar_clauses(data, risks)
 
-    # Export Report
-    if st.button("Download PDF Report"):
-        report_path = f"reports/report_{data['hash']}.pdf"
-        # Ensure reports dir exists
-        if not os.path.exists("reports"):
-            os.makedirs("reports")
-            
-        generated_path = generate_pdf_report(data, report_path)
-        if generated_path:
-            with open(generated_path, "rb") as f:
-                st.download_button(
-                    label="Download PDF",
-                    data=f,
-                    file_name="risk_report.pdf",
-                    mime="application/pdf"
-                )
+    # Export Report (rendered in memory, cached per contract + model version)
+    report_key = ReportCache.make_key(data, components["risk_engine"].version)
+    report = components["reports"].get(report_key)
+    if report is None and st.button("Download PDF Report"):
+        with metrics.span("report"):
+            report = render_pdf_report(data, iter_risks(db, data.get('id'), legacy=data.get('risks')))
+        components["reports"].put(report_key, report)
+    if report is not None:
+        st.download_button(
+            label="Download PDF",
+            data=report,
+            file_name="risk_report.pdf",
+            mime="application/pdf"
+        )
+
+def show_similar_clauses(data, risks, k=10):
+    """
+    Compares a flagged clause (from the current page) with the most similar
+    clauses of other stored contracts.
+    """
+    st.subheader("Similar Clauses in Past Contracts")
+    choice = st.selectbox("Flagged clause", list(range(len(risks))), key=f"similar_{data.get('id')}",
+                          format_func=lambda i: f"{risks[i]['level']}: {risks[i]['clause'][:100]}")
+    if choice is None:
+        return
+    matches = components["clause_index"].query(risks[choice]['clause'], k=k, exclude_contract=data.get('id'))
+    if not matches:
+        st.info("No similar clauses in other contracts yet.")
+        return
+    st.dataframe([{
+        "Similarity": f"{match['similarity']:.0%}",
+        "Level": match["level"],
+        "Score": round(match["score"], 2),
+        "Type": match["type"],
+        "Clause": match["clause"],
+        "Contract": match["contract_id"]
+    } for match in matches])
+
+def show_risk_page(data, page_size=20):
+    """
+    Loads one page of a contract's clause results from risk_analysis, with
+    Prev/Next buttons. Contracts stored before the split embed their risks.
+    """
+    state = st.session_state.setdefault(f"risks_{data.get('id')}_pager", [None])
+    page_index = len(state) - 1
+    if data.get('risks'):
+        start = 0 if state[-1] is None else state[-1] + 1
+        risks = data['risks'][start:start + page_size]
+        next_after = start + page_size - 1 if start + page_size < len(data['risks']) else None
+    else:
+        page = fetch_risks(db, data.get('id'), page_size=page_size, after=state[-1])
+        risks, next_after = page["risks"], page["next"]
+
+    if page_index > 0 or next_after is not None:
+        prev_col, label_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            if st.button("Previous", key=f"risks_{data.get('id')}_prev", disabled=page_index == 0):
+                state.pop()
+                st.rerun()
+        with label_col:
+            st.write(f"Clauses page {page_index + 1}")
+        with next_col:
+            if st.button("Next", key=f"risks_{data.get('id')}_next", disabled=next_after is None):
+                state.append(next_after)
+                st.rerun()
+    return risks
 
 def show_history_page():
     st.header("Contract History")
-    docs = db.collection('contracts').stream()
-    
-    data = []
-    for doc in docs:
-        d = doc.to_dict()
-        data.append({
-            "Filename": d.get('filename'),
-            "Date": d.get('timestamp'),
-            "Risk Score": d.get('risk_score')
-        })
-    
-    if data:
-        st.dataframe(data)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        sort_label = st.selectbox("Sort by", ["Date", "Risk Score"])
+        descending = st.checkbox("Newest / highest first", value=True)
+    # Firestore only serves a range filter on the field the query is ordered by,
+    # so the range offered follows the sort field
+    ranges = {}
+    with col2:
+        if sort_label == "Date":
+            order_field = "timestamp"
+            date_range = st.date_input("Date range", value=())
+            if len(date_range) == 2:
+                ranges["timestamp"] = (datetime.combine(date_range[0], datetime.min.time()),
+                                       datetime.combine(date_range[1], datetime.max.time()))
+        else:
+            order_field = "risk_score"
+            score_range = st.slider("Risk Score", 0, 100, (0, 100))
+            if score_range != (0, 100):
+                ranges["risk_score"] = score_range
+
+    page = show_paged_table("history", "contracts", HISTORY_FIELDS, order_field, descending, ranges)
+    if page["rows"]:
+        st.dataframe([{
+            "Filename": row.get('filename'),
+            "Date": row.get('timestamp'),
+            "Risk Score": row.get('risk_score')
+        } for row in page["rows"]])
+
+        # Clause details are only loaded for the contract the user opens
+        names = {row['id']: f"{row.get('filename')} ({row.get('timestamp')})" for row in page["rows"]}
+        selected = st.selectbox("View contract details", [None] + list(names),
+                                format_func=lambda contract_id: "-" if contract_id is None else names[contract_id])
+        if selected:
+            snapshot = db.collection(CONTRACTS).document(selected).get()
+            if snapshot.exists:
+                display_results({**snapshot.to_dict(), "id": selected})
     else:
         st.info("No contracts found in history.")
 
+def show_paged_table(state_key, collection, fields, order_field, descending, ranges=None, page_size=25):
+    """
+    Cursor-based pagination with Prev/Next buttons. The cursor stack is kept in
+    session state and reset whenever the query parameters change.
+    """
+    params = (collection, order_field, descending, tuple(sorted((ranges or {}).items())), page_size)
+    state = st.session_state.setdefault(f"{state_key}_pager", {"params": None, "cursors": [None]})
+    if state["params"] != params:
+        state["params"] = params
+        state["cursors"] = [None]
+
+    page_index = len(state["cursors"]) - 1
+    page = fetch_page(db, collection, fields, order_field, descending, page_size,
+                      cursor=state["cursors"][-1], ranges=ranges)
+
+    prev_col, label_col, next_col = st.columns([1, 2, 1])
+    with prev_col:
+        if st.button("Previous", key=f"{state_key}_prev", disabled=page_index == 0):
+            state["cursors"].pop()
+            st.rerun()
+    with label_col:
+        st.write(f"Page {page_index + 1}")
+    with next_col:
+        if st.button("Next", key=f"{state_key}_next", disabled=not page["has_more"]):
+            state["cursors"].append(page["cursor"])
+            st.rerun()
+    return page
+
 def show_admin_page():
     st.header("Admin Dashboard")
     password = st.text_input("Enter Admin Password", type="password")
@@ -159,17 +381,25 @@ def show_admin_page():
         st.success("Access Granted")
         
         st.subheader("Audit Logs")
-        logs = db.collection('audit_logs').stream()
-        log_data = []
-        for log in logs:
-            l = log.to_dict()
-            log_data.append(l)
+        page = show_paged_table("audit", "audit_logs", AUDIT_FIELDS, "timestamp", True, page_size=50)
         
-        if log_data:
-            st.dataframe(log_data)
+        if page["rows"]:
+            st.dataframe(page["rows"])
         else:
             st.info("No audit logs available.")
             
+        st.subheader("Pipeline Metrics")
+        snapshot = metrics.snapshot()
+        if snapshot["histograms"]:
+            st.dataframe([{
+                "Series": series,
+                "Count": values["count"],
+                "Mean (ms)": round(1000 * values["sum"] / values["count"], 2) if values["count"] else 0.0
+            } for series, values in sorted(snapshot["histograms"].items())])
+            st.json(snapshot["counters"])
+        else:
+            st.info("No pipeline activity recorded in this session yet.")
+
         st.subheader("Manage Risk Keywords")
         st.write("Feature coming soon: Add/Remove keywords from Firestore.")
     elif password:
@@ -0,0 +1,236 @@
+import atexit
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import json_lines
+from history_queries import notify_write
+
+logger = logging.getLogger(__name__)
+
+# Base name: each process spills to "<base>.<pid>" (see AuditSink)
+DEFAULT_SPILL_PATH = os.environ.get("LEXIGUARD_AUDIT_SPILL", "audit_spill.jsonl")
+
+class AuditSink:
+    """
+    Buffered, asynchronous audit log writer.
+
+    log() only enqueues. A background thread writes events to 'audit_logs' in
+    batched writes whenever batch_size events are waiting or flush_interval
+    seconds have passed. Events that cannot be written (store unreachable, or
+    the in-memory queue is full) are appended to a local spill file and
+    replayed after the next successful flush, so delivery is at-least-once.
+    Pending events are flushed at interpreter exit.
+
+    Each process spills to its own file, spill_path + ".<pid>", so forked
+    workers never interleave or steal each other's spill. Files left behind
+    by processes that are no longer running are adopted and replayed.
+    """
+    def __init__(self, db, batch_size=100, flush_interval=2.0, max_queue=10000,
+                 spill_path=DEFAULT_SPILL_PATH, collection='audit_logs'):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.collection = collection
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        atexit.register(self.close)
+
+    def log(self, user, action, details):
+        event = {
+            'user': user,
+            'action': action,
+            'details': details,
+            'timestamp': datetime.now()
+        }
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._spill([event])
+
+    def flush(self):
+        """
+        Writes everything queued so far (and any spilled events) synchronously.
+        """
+        with self._flush_lock:
+            events = self._drain(None)
+            while events:
+                self._write(events)
+                events = self._drain(None)
+            self._replay_spill()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._flush_lock:
+            if self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="audit-sink", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while not self._stop.is_set():
+            events = self._drain(self.flush_interval)
+            if not events:
+                continue
+            try:
+                with self._flush_lock:
+                    if self._write(events):
+                        self._replay_spill()
+            except Exception as e:
+                # Keep the thread alive: a dead sink would silently drop every later event
+                logger.error(f"Audit sink error: {e}")
+
+    def _drain(self, timeout):
+        """
+        Collects up to batch_size events, waiting at most timeout seconds for
+        the batch to fill (timeout=None: take what is queued without waiting).
+        """
+        events = []
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while len(events) < self.batch_size:
+            try:
+                if deadline is None:
+                    events.append(self._queue.get_nowait())
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    events.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return events
+
+    def _write(self, events):
+        try:
+            batch = self.db.batch()
+            for event in events:
+                batch.set(self.db.collection(self.collection).document(), event)
+            batch.commit()
+            notify_write(self.collection)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to write {len(events)} audit events, spilling to {self._spill_file()}: {e}")
+            self._spill(events)
+            return False
+
+    def _spill_file(self, pid=None):
+        return f"{self.spill_path}.{pid or os.getpid()}"
+
+    def _spill(self, events):
+        try:
+            with self._spill_lock, open(self._spill_file(), "a", encoding="utf-8") as f:
+                for event in events:
+                    f.write(json_lines.dumps(event) + "\n")
+        except OSError as e:
+            logger.error(f"Failed to spill audit events: {e}")
+
+    def _replay_spill(self):
+        replay_path = f"{self._spill_file()}.replay"
+        with self._spill_lock:
+            for path in [self._spill_file()] + self._orphaned_spills():
+                try:
+                    self._claim(path, replay_path)
+                except OSError as e:
+                    logger.error(f"Could not read spilled audit events from {path}: {e}")
+            if not os.path.exists(replay_path):
+                return
+        events = []
+        try:
+            with open(replay_path, encoding="utf-8") as f:
+                for number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        events.append(json_lines.loads(line))
+                    except ValueError:
+                        logger.warning(f"Skipping unreadable audit event on line {number} of {replay_path}")
+        except OSError as e:
+            logger.error(f"Could not read {replay_path}: {e}")
+            return
+        replayed = 0
+        for start in range(0, len(events), self.batch_size):
+            if not self._write(events[start:start + self.batch_size]):
+                # _write spilled this chunk; put the rest back too
+                self._spill(events[start + self.batch_size:])
+                break
+            replayed = min(len(events), start + self.batch_size)
+        try:
+            os.remove(replay_path)
+        except FileNotFoundError:
+            pass
+        if replayed:
+            logger.info(f"Replayed {replayed} spilled audit events.")
+
+    def _claim(self, path, replay_path):
+        """
+        Appends the events of spill file path to replay_path. The file is first
+        renamed, so when two processes adopt the same orphan only one gets it.
+        """
+        claimed = f"{replay_path}.claim"
+        if path != claimed:
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                return
+        with open(claimed, encoding="utf-8") as src, open(replay_path, "a", encoding="utf-8") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(claimed)
+
+    def _orphaned_spills(self):
+        """
+        Spill, replay and claim files of processes that are no longer running,
+        this process's own interrupted claim, and a spill file from before
+        spill files were per process.
+        """
+        directory, base = os.path.split(os.path.abspath(self.spill_path))
+        pattern = re.compile(rf"{re.escape(base)}\.(\d+)(\.replay)?(\.claim)?")
+        own_claim = f"{self._spill_file()}.replay.claim"
+        orphans = [self.spill_path] if os.path.exists(self.spill_path) else []
+        try:
+            names = os.listdir(directory or ".")
+        except OSError:
+            return orphans
+        for name in names:
+            match = pattern.fullmatch(name)
+            if not match:
+                continue
+            path = os.path.join(os.path.dirname(self.spill_path), name)
+            pid = int(match.group(1))
+            if pid == os.getpid():
+                if path == own_claim:
+                    orphans.append(path)
+            elif not _process_alive(pid):
+                orphans.append(path)
+        return orphans
+
+def _process_alive(pid):
+    if os.name == "nt":
+        # os.kill would terminate the process; leave other processes' files alone
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,307 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from docx import Document
+from fpdf import FPDF
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("parse", "clean", "segment", "analyze", "persist", "report")
+
+# Clause templates for the synthetic corpus: a mix of keyword hits, model-scored
+# risky wording and neutral boilerplate. ASCII only (fpdf core fonts are latin-1).
+CLAUSE_TEMPLATES = [
+    ("INDEMNIFICATION", "{party_a} shall indemnify and hold harmless {party_b} against all claims, losses and expenses arising from this Agreement."),
+    ("TERMINATION", "Either party may terminate this Agreement upon {days} days written notice to the other party."),
+    ("LIMITATION OF LIABILITY", "The total liability of {party_a} under this Agreement shall not exceed {amount} USD in the aggregate."),
+    ("DISPUTE RESOLUTION", "Any dispute arising out of this Agreement shall be settled by binding arbitration in {city}."),
+    ("CONFIDENTIALITY", "{party_b} shall keep all Confidential Information strictly confidential for a period of {years} years."),
+    ("GOVERNING LAW", "This Agreement shall be governed by and construed under the laws of the State of {state}."),
+    ("PAYMENT", "{party_a} shall pay all undisputed invoices within {days} days of receipt."),
+    ("SERVICES", "{party_b} shall perform the services in a professional and workmanlike manner consistent with industry standards."),
+    ("RENEWAL", "This Agreement renews automatically for successive {years} year terms unless either party objects in writing."),
+    ("SEVERABILITY", "If any provision of this Agreement is held invalid, the remaining provisions shall remain in full force and effect."),
+    ("REPORTING", "{party_b} shall deliver a monthly status report to {party_a} no later than the {day}th day of each month."),
+    ("LATE DELIVERY", "Liquidated damages of {amount} USD per day shall apply to any late delivery by {party_b}."),
+    ("PENALTIES", "{party_a} may impose a penalty of {amount} USD for each breach of the service levels."),
+    ("ASSIGNMENT", "Neither party may assign this Agreement without the prior written consent of the other party."),
+]
+PARTIES = ["Acme Corp", "Globex Ltd", "Initech LLC", "Umbrella Inc", "Stark Industries", "Wayne Enterprises"]
+CITIES = ["New York", "London", "Singapore", "Chicago", "Toronto"]
+STATES = ["Delaware", "New York", "California", "Texas"]
+
+def make_clauses(rng, n_clauses):
+    """
+    Returns [(heading, text)] for one synthetic contract.
+    """
+    party_a, party_b = rng.sample(PARTIES, 2)
+    clauses = []
+    for _ in range(n_clauses):
+        heading, template = rng.choice(CLAUSE_TEMPLATES)
+        clauses.append((heading, template.format(
+            party_a=party_a, party_b=party_b, days=rng.choice([10, 15, 30, 45, 60, 90]),
+            amount=f"{rng.randint(1, 500) * 1000:,}", city=rng.choice(CITIES), state=rng.choice(STATES),
+            years=rng.randint(1, 7), day=rng.randint(5, 28))))
+    return clauses
+
+def write_pdf(path, title, clauses):
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 14)
+    pdf.cell(0, 10, txt=title, ln=True, align='C')
+    for number, (heading, text) in enumerate(clauses, 1):
+        pdf.set_font("Arial", 'B', 11)
+        pdf.cell(0, 8, txt=f"{number}. {heading}", ln=True)
+        pdf.set_font("Arial", size=10)
+        pdf.multi_cell(0, 5, txt=text)
+    pdf.output(path)
+
+def write_docx(path, title, clauses):
+    document = Document()
+    document.add_heading(title, level=1)
+    for number, (heading, text) in enumerate(clauses, 1):
+        document.add_paragraph(f"{number}. {heading}")
+        document.add_paragraph(text)
+    document.save(path)
+
+def generate_corpus(directory, n_docs, n_clauses, formats=("pdf", "docx"), seed=0):
+    """
+    Writes n_docs synthetic contracts (alternating formats) of n_clauses clauses each.
+    Returns the file paths.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(n_docs):
+        fmt = formats[i % len(formats)]
+        path = os.path.join(directory, f"contract_{i:04d}.{fmt}")
+        title = f"MASTER SERVICES AGREEMENT {i + 1}"
+        clauses = make_clauses(rng, n_clauses)
+        (write_pdf if fmt == "pdf" else write_docx)(path, title, clauses)
+        paths.append(path)
+    return paths
+
+def percentile(values, q):
+    """
+    Linear-interpolated percentile (q in 0..100) of a list of numbers.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+class PipelineBenchmark:
+    """
+    Runs each corpus document through the full pipeline and times every stage
+    separately: parse, clean_text, segmentation, analyze_contract, the
+    contract/risk_analysis write and render_pdf_report.
+    """
+    def __init__(self, spacy_model="en_core_web_sm", clause_cache=False, db=None):
+        from contract_parser import ContractParser
+        from nlp_processor import NLPProcessor
+        from risk_engine import RiskEngine
+        from mock_firestore import MockFirestore
+
+        started = time.perf_counter()
+        self.parser = ContractParser()
+        self.nlp = NLPProcessor(spacy_model)
+        # Clause cache off by default, so every clause is really scored
+        self.risk_engine = RiskEngine(clause_cache_size=50000 if clause_cache else 0)
+        self.db = db if db is not None else MockFirestore()
+        self.startup_s = time.perf_counter() - started
+        self.timings = {stage: [] for stage in STAGES}
+        self.totals = []
+        self.bytes_parsed = 0
+        self.clauses_scored = 0
+
+    def run_document(self, path, record=True):
+        from contract_store import contract_aggregates, save_contract
+        from utils import render_pdf_report
+
+        timings = {}
+        start = time.perf_counter()
+        raw_text = self.parser.parse_file(path)
+        timings["parse"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        clean_text = self.nlp.clean_text(raw_text)
+        timings["clean"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if self.nlp.segmenter == "structural":
+            # Works on the raw text (it needs the line breaks), as the app and API do
+            clauses = self.nlp.segment_document(raw_text)
+        else:
+            clauses = self.nlp.segment_clauses(clean_text)
+        timings["segment"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = self.risk_engine.analyze_contract(clauses)
+        timings["analyze"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        contract_data = {"filename": os.path.basename(path), "timestamp": datetime.now(),
+                         **contract_aggregates(result), "source": "benchmark"}
+        save_contract(self.db, contract_data, result['risks'])
+        timings["persist"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        render_pdf_report(result)
+        timings["report"] = time.perf_counter() - start
+
+        if record:
+            for stage, seconds in timings.items():
+                self.timings[stage].append(seconds)
+            self.totals.append(sum(timings.values()))
+            self.bytes_parsed += os.path.getsize(path)
+            self.clauses_scored += len(clauses)
+
+    def results(self):
+        stages = {}
+        for stage, values in self.timings.items():
+            total = sum(values)
+            stages[stage] = {
+                "count": len(values),
+                "total_s": round(total, 4),
+                "mean_ms": round(1000 * total / len(values), 3) if values else 0.0,
+                "p50_ms": round(1000 * percentile(values, 50), 3),
+                "p99_ms": round(1000 * percentile(values, 99), 3),
+                "docs_per_s": round(len(values) / total, 2) if total else None
+            }
+        total = sum(self.totals)
+        peak = peak_rss_mb()
+        return {
+            "startup_s": round(self.startup_s, 3),
+            "stages": stages,
+            "end_to_end": {
+                "docs": len(self.totals),
+                "total_s": round(total, 4),
+                "p50_ms": round(1000 * percentile(self.totals, 50), 3),
+                "p99_ms": round(1000 * percentile(self.totals, 99), 3),
+                "docs_per_s": round(len(self.totals) / total, 2) if total else None,
+                "clauses_per_s": round(self.clauses_scored / total, 1) if total else None,
+                "parse_mb_per_s": round(self.bytes_parsed / (1024 * 1024) / sum(self.timings["parse"]), 2)
+                                  if self.timings["parse"] else None
+            },
+            "peak_rss_mb": round(peak, 1) if peak is not None else None
+        }
+
+def compare(current, baseline, threshold=0.10):
+    """
+    Compares p50/p99 per stage (and end to end) against a baseline run.
+    Returns [(name, metric, baseline, current, change)] and the regressions among them.
+    """
+    rows, regressions = [], []
+    pairs = [(stage, current["stages"].get(stage), baseline["stages"].get(stage)) for stage in STAGES]
+    pairs.append(("end_to_end", current["end_to_end"], baseline["end_to_end"]))
+    for name, now, before in pairs:
+        if not now or not before:
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            if not before.get(metric):
+                continue
+            change = now[metric] / before[metric] - 1
+            row = (name, metric, before[metric], now[metric], change)
+            rows.append(row)
+            if change > threshold:
+                regressions.append(row)
+    if current.get("peak_rss_mb") and baseline.get("peak_rss_mb"):
+        change = current["peak_rss_mb"] / baseline["peak_rss_mb"] - 1
+        row = ("process", "peak_rss_mb", baseline["peak_rss_mb"], current["peak_rss_mb"], change)
+        rows.append(row)
+        if change > threshold:
+            regressions.append(row)
+    return rows, regressions
+
+def print_results(results):
+    print(f"{'stage':<12}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'docs/s':>10}")
+    for stage in STAGES:
+        s = results["stages"][stage]
+        print(f"{stage:<12}{s['p50_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['mean_ms']:>10.2f}{s['docs_per_s'] or 0:>10.1f}")
+    e = results["end_to_end"]
+    print(f"{'end_to_end':<12}{e['p50_ms']:>10.2f}{e['p99_ms']:>10.2f}{'':>10}{e['docs_per_s'] or 0:>10.1f}")
+    print(f"{e['docs']} docs, {e['clauses_per_s']} clauses/s, parse {e['parse_mb_per_s']} MB/s, "
+          f"startup {results['startup_s']} s, peak RSS {results['peak_rss_mb']} MB")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LexiGuard end-to-end pipeline benchmark")
+    parser.add_argument("--docs", type=int, default=20, help="Number of synthetic contracts")
+    parser.add_argument("--clauses", type=int, default=60, help="Clauses per contract")
+    parser.add_argument("--formats", default="pdf,docx", help="Comma-separated: pdf, docx")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed runs before measuring")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spacy-model", default="en_core_web_sm")
+    parser.add_argument("--clause-cache", action="store_true", help="Enable the clause result cache")
+    parser.add_argument("--corpus-dir", default=None, help="Keep the generated corpus here (default: temp dir)")
+    parser.add_argument("--output", default=None, help="Write results as a JSON baseline")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown before flagging a regression")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="lexiguard-bench-")
+    corpus_dir = args.corpus_dir or os.path.join(workdir, "corpus")
+    try:
+        formats = tuple(f.strip() for f in args.formats.split(",") if f.strip())
+        paths = generate_corpus(corpus_dir, args.docs, args.clauses, formats, args.seed)
+        bench = PipelineBenchmark(args.spacy_model, clause_cache=args.clause_cache)
+        for path in paths[:args.warmup]:
+            bench.run_document(path, record=False)
+        for path in paths:
+            bench.run_document(path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "cpu_count": os.cpu_count()},
+        "config": {"docs": args.docs, "clauses": args.clauses, "formats": list(formats),
+                   "warmup": args.warmup, "seed": args.seed, "spacy_model": args.spacy_model,
+                   "segmenter": bench.nlp.segmenter, "clause_cache": args.clause_cache},
+        **bench.results()
+    }
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print("WARNING: baseline was recorded with a different configuration.")
+        rows, regressions = compare(results, baseline, args.threshold)
+        print(f"\nvs {args.compare} ({baseline.get('created')}):")
+        for name, metric, before, now, change in rows:
+            flag = "  REGRESSION" if change > args.threshold else ""
+            print(f"  {name:<12}{metric:<13}{before:>10.2f} -> {now:>10.2f} ({change:+.1%}){flag}")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+def clause_fingerprint(clause_text):
+    """
+    Hash of the normalized clause text (case and whitespace insensitive, like
+    the keyword matcher and the TF-IDF vectorizer).
+    """
+    normalized = " ".join(clause_text.lower().split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+class ClauseCache:
+    """
+    Bounded LRU map of clause fingerprint -> risk result.
+    Tagged with the RiskEngine version; a different version empties it.
+    """
+    def __init__(self, max_entries=50000, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def ensure_version(self, version):
+        with self._lock:
+            if self.version != version:
+                if self._entries:
+                    logger.info(f"Clause cache invalidated ({self.version} -> {version}).")
+                self._entries.clear()
+                self.version = version
+
+    def get(self, fingerprint):
+        with self._lock:
+            result = self._entries.get(fingerprint)
+            if result is not None:
+                self._entries.move_to_end(fingerprint)
+            return result
+
+    def put(self, fingerprint, result):
+        with self._lock:
+            self._entries[fingerprint] = result
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def save(self, path=None):
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            snapshot = {"version": self.version, "entries": list(self._entries.items())}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def load(self, path=None):
+        path = path or self.path
+        try:
+            with open(path, "rb") as f:
+                snapshot = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Could not load clause cache {path}: {e}")
+            return
+        with self._lock:
+            self.version = snapshot["version"]
+            self._entries = OrderedDict(snapshot["entries"][-self.max_entries:])
@@ -0,0 +1,246 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from contract_store import RISK_ANALYSIS
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CLAUSE_INDEX_MODE = os.environ.get("LEXIGUARD_CLAUSE_INDEX_MODE", "exact")
+_HASH_PRIME = np.uint64((1 << 61) - 1)
+_LOAD_BATCH = 10000
+
+class ClauseIndex:
+    """
+    Nearest-neighbour search over the flagged clauses in 'risk_analysis'.
+
+    Clauses are hashed into L2-normalized sparse vectors (word uni/bigrams),
+    so cosine similarity is a dot product and no vocabulary has to be fitted.
+    mode="exact" keeps the vectors column-major and scores a query against
+    every clause through the posting lists of its terms only, then takes the
+    top k with argpartition. mode="lsh" buckets clauses by random-hyperplane
+    signatures (tables x bits) and only rescores clauses sharing a bucket with
+    the query, or a bucket one bit away (multi-probe): faster on very large
+    indexes, at the cost of missing some neighbours. When fewer than k
+    candidates match at all, the query is scored exactly instead.
+
+    Like NearDuplicateIndex, the index is loaded from the collection on first
+    use (or by load(), e.g. during warm-up) and topped up with newer clauses
+    every refresh_interval seconds.
+    """
+    def __init__(self, db, mode=CLAUSE_INDEX_MODE, n_features=2 ** 20, tables=16, bits=10,
+                 collection=RISK_ANALYSIS, refresh_interval=30, seed=1):
+        if mode not in ("exact", "lsh"):
+            raise ValueError(f"Unknown clause index mode: {mode}")
+        self.db = db
+        self.mode = mode
+        self.collection = collection
+        self.refresh_interval = refresh_interval
+        self.vectorizer = HashingVectorizer(n_features=n_features, ngram_range=(1, 2), stop_words='english',
+                                            alternate_sign=False, norm='l2', dtype=np.float32)
+        self.tables = tables
+        self.bits = bits
+        rng = np.random.RandomState(seed)
+        if bits > 40:
+            raise ValueError("bits must be at most 40")
+        self._plane_a = rng.randint(1, int(_HASH_PRIME), size=tables, dtype=np.uint64)
+        self._plane_b = rng.randint(0, int(_HASH_PRIME), size=tables, dtype=np.uint64)
+        self._plane_shifts = np.arange(20, 20 + bits, dtype=np.uint64)
+        self._bit_values = (1 << np.arange(bits, dtype=np.int64))
+
+        self._rows = []            # (contract_id, position, clause, level, score, type)
+        self._contracts = {}       # contract id -> small int, for exclusion
+        self._pending = []         # (vectors, contract codes, LSH codes) not yet in a segment
+        self._segments = []
+        self._boundary_ids = set()
+        self._loaded_until = None
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+        # Held for a whole refresh, so concurrent queries do not each reload
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _append(self, rows):
+        rows = [row for row in rows if row[2]]
+        if not rows:
+            return
+        vectors = self.vectorizer.transform([row[2] for row in rows])
+        codes = self._lsh_codes(vectors) if self.mode == "lsh" else None
+        with self._lock:
+            contract_codes = np.array([self._contracts.setdefault(row[0], len(self._contracts)) for row in rows],
+                                      dtype=np.int32)
+            self._rows.extend(rows)
+            self._pending.append((vectors, contract_codes, codes))
+
+    def _planes(self, columns):
+        """
+        +-1 hyperplane coordinates (columns x tables*bits) for the given
+        feature columns, derived by hashing so no dense n_features x planes
+        matrix has to be stored. One hash per column and table supplies the
+        bits of all that table's planes.
+        """
+        hashed = (columns.astype(np.uint64)[:, None] * self._plane_a + self._plane_b) % _HASH_PRIME
+        signs = (hashed[:, :, None] >> self._plane_shifts) & np.uint64(1)
+        return (signs.reshape(len(columns), -1).astype(np.float32) * 2 - 1)
+
+    def _lsh_codes(self, vectors):
+        columns, compact = np.unique(vectors.indices, return_inverse=True)
+        if not len(columns):
+            return np.zeros((vectors.shape[0], self.tables), dtype=np.int64)
+        # Renumber the used columns 0..n-1 instead of slicing them out
+        compacted = sp.csr_matrix((vectors.data, compact, vectors.indptr), shape=(vectors.shape[0], len(columns)))
+        projected = compacted @ self._planes(columns)
+        signs = (projected > 0).reshape(vectors.shape[0], self.tables, self.bits)
+        return signs @ self._bit_values
+
+    def _compiled(self):
+        """
+        Turns pending rows into a new segment (caller holds the lock). Once
+        the smaller segments add up to more than a quarter of the largest, all
+        segments are stacked into one. That rebuilds the whole index, but only
+        after it has grown by a quarter, so the cost per added row stays constant.
+        """
+        if self._pending:
+            self._segments.append(self._segment(self._pending, len(self._rows) - sum(
+                block[0].shape[0] for block in self._pending)))
+            self._pending = []
+            sizes = [segment["size"] for segment in self._segments]
+            if len(sizes) > 1 and sum(sizes) - max(sizes) > max(sizes) // 4:
+                blocks = [(segment["vectors"], segment["contracts"], segment["codes"]) for segment in self._segments]
+                self._segments = [self._segment(blocks, 0)]
+        return self._segments
+
+    def _segment(self, blocks, offset):
+        vectors, contract_codes, codes = zip(*blocks)
+        vectors = sp.vstack(vectors, format="csr")
+        segment = {"offset": offset, "size": vectors.shape[0], "contracts": np.concatenate(contract_codes),
+                   "codes": None}
+        if self.mode == "exact":
+            # Column-major: a query only touches the posting lists of its own terms
+            segment["vectors"] = vectors.tocsc()
+        else:
+            segment["vectors"] = vectors
+            segment["codes"] = np.vstack(codes)
+            segment["tables"] = []
+            for table in range(self.tables):
+                order = np.argsort(segment["codes"][:, table], kind="stable")
+                segment["tables"].append((segment["codes"][order, table], order))
+        return segment
+
+    def query(self, text, k=10, exclude_contract=None):
+        """
+        The k indexed clauses most similar to text, best first:
+        [{"contract_id", "position", "clause", "level", "score", "type", "similarity"}].
+        exclude_contract: leave out the clauses of this contract (e.g. the one being reviewed).
+        """
+        started = time.perf_counter()
+        vector = self.vectorizer.transform([text])
+        if not vector.nnz:
+            return []
+        self._refresh()
+        code = self._lsh_codes(vector)[0] if self.mode == "lsh" else None
+        with self._lock:
+            excluded = self._contracts.get(exclude_contract)
+            segments = self._compiled()
+            if not segments:
+                return []
+            rows, scores = self._score(segments, vector, code, excluded)
+            if code is not None and np.count_nonzero(scores > 0) < k:
+                # Too few neighbours shared a bucket: better slow than short
+                metrics.inc("clause_search_fallbacks")
+                rows, scores = self._score(segments, vector, None, excluded)
+            top = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            results = []
+            for i in top:
+                if scores[i] <= 0:
+                    break
+                row = self._rows[rows[i]]
+                results.append({"contract_id": row[0], "position": row[1], "clause": row[2], "level": row[3],
+                                "score": row[4], "type": row[5], "similarity": round(float(scores[i]), 4)})
+        metrics.observe("clause_search_seconds", time.perf_counter() - started,
+                        help="Clause similarity lookup latency.", mode=self.mode)
+        return results
+
+    def _score(self, segments, vector, code, excluded):
+        """
+        (rows, similarities) of the LSH candidates of code, or of every
+        indexed clause when code is None. Caller holds the lock.
+        """
+        all_rows, all_scores = [], []
+        for segment in segments:
+            if self.mode == "exact":
+                rows = np.arange(segment["size"])
+                scores = segment["vectors"][:, vector.indices] @ vector.data
+            elif code is None:
+                rows = np.arange(segment["size"])
+                scores = (segment["vectors"] @ vector.T).toarray().ravel()
+            else:
+                rows = self._candidates(segment["tables"], code)
+                scores = (segment["vectors"][rows] @ vector.T).toarray().ravel()
+            if excluded is not None:
+                scores[segment["contracts"][rows] == excluded] = 0.0
+            all_rows.append(rows + segment["offset"])
+            all_scores.append(scores)
+        return np.concatenate(all_rows), np.concatenate(all_scores)
+
+    def _candidates(self, tables, code):
+        """
+        Rows in the query's bucket, or in a bucket whose code differs from it
+        in one bit, in any table.
+        """
+        probes = code[:, None] ^ np.concatenate([[0], self._bit_values])
+        found = []
+        for table, (codes, order) in enumerate(tables):
+            starts = np.searchsorted(codes, probes[table], side="left")
+            ends = np.searchsorted(codes, probes[table], side="right")
+            found.extend(order[start:end] for start, end in zip(starts, ends))
+        return np.unique(np.concatenate(found))
+
+    def load(self):
+        """
+        Loads clauses written since the last refresh now, instead of on the
+        next query after refresh_interval.
+        """
+        self._refresh(force=True)
+
+    def _refresh(self, force=False):
+        """
+        Loads clauses written since the last refresh (by this or another process).
+        Queries arriving during a refresh wait for it instead of starting their own.
+        """
+        with self._refresh_lock:
+            if not force and time.monotonic() < self._next_refresh:
+                return
+            try:
+                query = self.db.collection(self.collection).select(
+                    ["contract_id", "position", "clause", "level", "score", "type", "timestamp"])
+                if self._loaded_until is not None:
+                    query = query.where("timestamp", ">=", self._loaded_until)
+                rows = []
+                for snapshot in query.order_by("timestamp").stream():
+                    data = snapshot.to_dict()
+                    # Documents at the previous boundary timestamp were already loaded
+                    if data['timestamp'] == self._loaded_until and snapshot.id in self._boundary_ids:
+                        continue
+                    if data['timestamp'] != self._loaded_until:
+                        self._loaded_until = data['timestamp']
+                        self._boundary_ids = set()
+                    self._boundary_ids.add(snapshot.id)
+                    rows.append((data.get('contract_id'), data.get('position'), data.get('clause'), data.get('level'),
+                                 data.get('score'), data.get('type')))
+                    if len(rows) == _LOAD_BATCH:
+                        self._append(rows)
+                        rows = []
+                self._append(rows)
+            except Exception as e:
+                logger.warning(f"Failed to refresh clause index: {e}")
+            self._next_refresh = time.monotonic() + self.refresh_interval
@@ -0,0 +1,184 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One pass over line starts. Recognised clause markers:
+#   ARTICLE IV / Section 4 / Clause 4.2   (keyword headings)
+#   1.  2.3  2.3.1  4)  2.3(a)            (numbered items)
+#   (a)  (iv)  (1)                        (sub-items)
+#   DEFINITIONS                           (all-caps heading lines)
+CLAUSE_MARKER_RE = re.compile(r"""
+    ^[ \t]*
+    (?:
+        (?P<keyword>article|section|clause)[ \t]+(?P<keyword_num>\d{1,3}(?:\.\d{1,3})*|[ivxlc]+)\b\.?
+      | (?P<num>\d{1,3}(?:\.\d{1,3})+|\d{1,3}(?=[.)(]))(?P<num_sub>\([a-z0-9]{1,4}\))?[.)]?(?=\s)
+      | \((?P<sub>[a-z]{1,2}|[ivx]{1,5}|\d{1,2})\)(?=\s)
+      | (?-i:(?P<caps>[A-Z][A-Z0-9 ,&'/\-]{3,78}[A-Z]))[ \t]*$
+    )
+""", re.MULTILINE | re.VERBOSE | re.IGNORECASE)
+
+ROMAN_RE = re.compile(r"^[ivxlc]+$", re.IGNORECASE)
+SUB_ROMAN_RE = re.compile(r"^[ivx]+$")
+
+# Relative depth of each marker kind; a marker closes every open clause of equal or deeper rank.
+RANK_HEADING = 0
+RANK_ARTICLE = 1
+RANK_NUMBERED = 2      # + number of dotted parts - 1
+RANK_SUB = 10
+
+class Clause:
+    """
+    A node in the clause tree. start/end are character offsets into the
+    original (uncleaned) text and cover the clause's own text, excluding children.
+    """
+    __slots__ = ("number", "heading", "level", "start", "end", "text", "children", "parent", "_rank")
+
+    def __init__(self, number, heading, start, rank, parent=None):
+        self.number = number
+        self.heading = heading
+        self.start = start
+        self.end = start
+        self.text = ""
+        self.children = []
+        self.parent = parent
+        self.level = parent.level + 1 if parent else 0
+        self._rank = rank
+
+    def walk(self):
+        """
+        Yields this clause and all descendants in document order.
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def to_dict(self):
+        return {
+            "number": self.number,
+            "heading": self.heading,
+            "level": self.level,
+            "start": self.start,
+            "end": self.end,
+            "text": self.text,
+            "children": [child.to_dict() for child in self.children]
+        }
+
+    def __repr__(self):
+        return f"Clause({self.number!r}, level={self.level}, {self.start}:{self.end})"
+
+class StructuralSegmenter:
+    """
+    Splits raw contract text into hierarchical clauses using the numbering and
+    heading lines that mark legal clauses. Must run before clean_text, which
+    collapses the newlines the markers are anchored to. Linear in text length.
+    """
+    def __init__(self, min_markers=2, min_length=10):
+        self.min_markers = min_markers
+        self.min_length = min_length
+
+    def segment(self, text):
+        """
+        Returns the top-level Clause nodes. Text before the first marker becomes
+        an unnumbered preamble clause.
+        """
+        roots = []
+        stack = []
+        preamble = Clause(None, None, 0, -1)
+        current = preamble
+
+        for match in CLAUSE_MARKER_RE.finditer(text):
+            number, heading, rank = self._describe(match, stack)
+            if heading and self._is_bare_marker(current, text, match.start()):
+                # "ARTICLE I\nDEFINITIONS": the caps line titles the open article
+                current.heading = heading
+                continue
+            self._close(current, text, match.start())
+            if current is preamble and preamble.text:
+                roots.append(preamble)
+
+            while stack and stack[-1]._rank >= rank:
+                stack.pop()
+            parent = stack[-1] if stack else None
+            current = Clause(number, heading, match.start(), rank, parent)
+            (parent.children if parent else roots).append(current)
+            stack.append(current)
+
+        self._close(current, text, len(text))
+        if current is preamble and preamble.text:
+            roots.append(preamble)
+        return roots
+
+    def count_markers(self, roots):
+        return sum(1 for root in roots for node in root.walk() if node.number is not None or node.heading)
+
+    def flatten(self, roots):
+        """
+        Flat list of clause texts (whitespace collapsed) in document order,
+        for consumers such as RiskEngine.analyze_contract. Nodes that are only
+        a marker and title ("ARTICLE I DEFINITIONS") are left out: there is
+        nothing in them to score.
+        """
+        clauses = []
+        for root in roots:
+            for node in root.walk():
+                if len(node.text) > self.min_length and self._has_body(node):
+                    clauses.append(node.text)
+        return clauses
+
+    def _has_body(self, node):
+        body = node.text
+        if node.number is not None:
+            body = CLAUSE_MARKER_RE.sub("", body, count=1).strip()
+        if node.heading and body.startswith(node.heading):
+            body = body[len(node.heading):]
+        return bool(body.strip(" .:-"))
+
+    def _describe(self, match, stack):
+        if match.group("keyword"):
+            number = f"{match.group('keyword').title()} {match.group('keyword_num')}"
+            parts = match.group("keyword_num").split(".")
+            if match.group("keyword").lower() == "article" or ROMAN_RE.match(parts[0]):
+                return number, None, RANK_ARTICLE
+            return number, None, RANK_NUMBERED + len(parts) - 1
+        if match.group("num"):
+            number = match.group("num") + (match.group("num_sub") or "")
+            rank = RANK_NUMBERED + len(match.group("num").split(".")) - 1
+            return number, None, rank + (1 if match.group("num_sub") else 0)
+        if match.group("sub"):
+            sub = match.group("sub").lower()
+            top = stack[-1] if stack and stack[-1]._rank >= RANK_SUB else None
+            if sub.isdigit():
+                return f"({sub})", None, RANK_SUB + 2
+            # (i), (ii) nest under (a), (b) -- unless "(i)" simply follows "(h)"
+            if SUB_ROMAN_RE.match(sub) and top is not None:
+                if top._rank > RANK_SUB:
+                    return f"({sub})", None, RANK_SUB + 1
+                previous = top.number.strip("()")
+                if not (len(previous) == 1 and len(sub) == 1 and ord(sub) == ord(previous) + 1):
+                    return f"({sub})", None, RANK_SUB + 1
+            return f"({sub})", None, RANK_SUB
+        return None, match.group("caps").strip(), RANK_HEADING
+
+    def _is_bare_marker(self, clause, text, end):
+        if clause.number is None or clause.heading is not None:
+            return False
+        return not CLAUSE_MARKER_RE.sub("", text[clause.start:end], count=1).strip()
+
+    def _close(self, clause, text, end):
+        clause.end = end
+        body_start = clause.start
+        if clause.heading and clause.number is None:
+            # Heading line: the heading itself is the clause marker
+            body_start = text.find("\n", clause.start, end)
+            body_start = end if body_start == -1 else body_start
+        elif clause.number is not None and clause.heading is None and clause._rank < RANK_SUB:
+            # A short, capitalised, unpunctuated first line is the clause title ("1. Definitions")
+            line_end = text.find("\n", clause.start, end)
+            if line_end != -1:
+                title = CLAUSE_MARKER_RE.sub("", text[clause.start:line_end], count=1).strip()
+                if title and title[0].isupper() and len(title.split()) <= 6 and title[-1].isalnum():
+                    clause.heading = title
+        clause.text = " ".join(text[body_start:end].split())
@@ -2,10 +2,32 @@ import pdfplumber
 import docx
 import os
 import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+def _extract_page_range(file_path, start, end):
+    """
+    Process-pool worker: extracts pages [start, end) of a PDF.
+    """
+    texts = []
+    with pdfplumber.open(file_path) as pdf:
+        for page in pdf.pages[start:end]:
+            texts.append(page.extract_text() or "")
+            page.close()
+    return texts
+
 class ContractParser:
+    def __init__(self, workers=None, pages_per_task=8, max_pages_in_flight=64):
+        """
+        workers: processes for PDF extraction (None/1 = extract in-process).
+        max_pages_in_flight: bound on extracted-but-unconsumed pages in pool mode.
+        """
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        self.max_pages_in_flight = max_pages_in_flight
+
     def parse_file(self, file_path):
         """
         Parses PDF or DOCX file and returns extracted text.
@@ -18,25 +40,62 @@ class ContractParser:
         else:
             raise ValueError(f"Unsupported file format: {ext}")
 
+    def iter_pages(self, file_path):
+        """
+        Yields the text of a PDF or DOCX file page by page (paragraph by paragraph
+        for DOCX) as it is extracted.
+        """
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext == '.pdf':
+            return self.iter_pdf_pages(file_path)
+        elif ext == '.docx':
+            return (para.text for para in docx.Document(file_path).paragraphs)
+        else:
+            raise ValueError(f"Unsupported file format: {ext}")
+
+    def iter_pdf_pages(self, source, workers=None):
+        """
+        Yields each page's text in order. source is a path or file-like object.
+        With workers > 1 (path sources only), page ranges are extracted in a
+        process pool and reassembled in order.
+        """
+        workers = self.workers if workers is None else workers
+        if workers and workers > 1 and isinstance(source, (str, os.PathLike)):
+            yield from self._iter_pdf_pages_parallel(source, workers)
+            return
+        with pdfplumber.open(source) as pdf:
+            for page in pdf.pages:
+                yield page.extract_text() or ""
+                # Drop the page's cached layout objects; keeps memory flat on long documents
+                page.close()
+
+    def _iter_pdf_pages_parallel(self, file_path, workers):
+        with pdfplumber.open(file_path) as pdf:
+            page_count = len(pdf.pages)
+        ranges = deque((start, min(start + self.pages_per_task, page_count))
+                       for start in range(0, page_count, self.pages_per_task))
+        max_tasks = max(1, self.max_pages_in_flight // self.pages_per_task)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            while ranges or pending:
+                while ranges and len(pending) < max_tasks:
+                    start, end = ranges.popleft()
+                    pending.append(pool.submit(_extract_page_range, file_path, start, end))
+                yield from pending.popleft().result()
+
     def _parse_pdf(self, file_path):
-        text = ""
         try:
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    extracted = page.extract_text()
-                    if extracted:
-                        text += extracted + "\n"
+            text = "".join(f"{extracted}\n" for extracted in self.iter_pdf_pages(file_path) if extracted)
         except Exception as e:
             logger.error(f"Error parsing PDF {file_path}: {e}")
             raise
         return text
 
     def _parse_docx(self, file_path):
-        text = ""
         try:
             doc = docx.Document(file_path)
-            for para in doc.paragraphs:
-                text += para.text + "\n"
+            text = "".join(f"{para.text}\n" for para in doc.paragraphs)
         except Exception as e:
             logger.error(f"Error parsing DOCX {file_path}: {e}")
             raise
@@ -46,12 +105,17 @@ class ContractParser:
         """
         Handle Streamlit UploadedFile object.
         """
-        if uploaded_file.name.endswith('.pdf'):
-            with pdfplumber.open(uploaded_file) as pdf:
-                text = "\n".join([page.extract_text() or "" for page in pdf.pages])
-            return text
-        elif uploaded_file.name.endswith('.docx'):
-            doc = docx.Document(uploaded_file)
+        return self.parse_stream(uploaded_file, uploaded_file.name)
+
+    def parse_stream(self, fileobj, filename):
+        """
+        Parses a seekable binary file object (an upload, uploads.StagedUpload.open()),
+        using filename for the format.
+        """
+        if filename.endswith('.pdf'):
+            return "\n".join(self.iter_pdf_pages(fileobj, workers=1))
+        elif filename.endswith('.docx'):
+            doc = docx.Document(fileobj)
             text = "\n".join([para.text for para in doc.paragraphs])
             return text
         else:
@@ -0,0 +1,111 @@
+import logging
+from datetime import datetime
+from firebase_config import FIRESTORE_BATCH_LIMIT
+from history_queries import fetch_page, notify_write
+
+logger = logging.getLogger(__name__)
+
+CONTRACTS = 'contracts'
+RISK_ANALYSIS = 'risk_analysis'
+RISK_FIELDS = ("position", "clause", "level", "score", "explanation", "type")
+
+def contract_aggregates(analysis_result):
+    """
+    The per-contract fields stored on the contract document (no clause texts).
+    """
+    level_counts = {}
+    for risk in analysis_result['risks']:
+        level_counts[risk['level']] = level_counts.get(risk['level'], 0) + 1
+    return {
+        "risk_score": analysis_result['risk_score'],
+        "summary": analysis_result['summary'],
+        "risk_count": len(analysis_result['risks']),
+        "level_counts": level_counts
+    }
+
+def find_by_hash(db, file_hash):
+    """
+    The stored contract uploaded with this file hash (including its id), or None.
+    """
+    for snapshot in db.collection(CONTRACTS).where('hash', '==', file_hash).limit(1).stream():
+        return {**snapshot.to_dict(), "id": snapshot.id}
+    return None
+
+def save_contracts(db, entries, batch_size=FIRESTORE_BATCH_LIMIT):
+    """
+    Stores contracts and their per-clause results with batched writes.
+
+    entries: iterable of (contract_data, risks). Each risk becomes one
+    'risk_analysis' document (with its position in the contract); the contract
+    document only holds aggregates and is written after its risks, so a
+    contract never shows up in history without its clauses.
+    Returns the new contract ids.
+    """
+    ids = []
+    batch = db.batch()
+    pending = 0
+    for contract_data, risks in entries:
+        contract_ref = db.collection(CONTRACTS).document()
+        timestamp = contract_data.setdefault("timestamp", datetime.now())
+        documents = [(db.collection(RISK_ANALYSIS).document(), {
+            "contract_id": contract_ref.id,
+            "position": position,
+            "clause": risk['clause'],
+            "level": risk['level'],
+            "score": risk['score'],
+            "explanation": risk['explanation'],
+            "type": risk['type'],
+            "timestamp": timestamp
+        }) for position, risk in enumerate(risks)]
+        contract_data["id"] = contract_ref.id
+        documents.append((contract_ref, contract_data))
+        for doc_ref, data in documents:
+            batch.set(doc_ref, data)
+            pending += 1
+            if pending == batch_size:
+                batch.commit()
+                batch = db.batch()
+                pending = 0
+        ids.append(contract_ref.id)
+    if pending:
+        batch.commit()
+    notify_write(RISK_ANALYSIS)
+    notify_write(CONTRACTS)
+    return ids
+
+def save_contract(db, contract_data, risks):
+    return save_contracts(db, [(contract_data, risks)])[0]
+
+def fetch_risks(db, contract_id, page_size=20, after=None):
+    """
+    One page of a contract's clause results in contract order.
+    after: the position of the last clause already seen (None for the first page).
+    Returns {"risks": [dict], "next": position or None}.
+    """
+    page = fetch_page(db, RISK_ANALYSIS, RISK_FIELDS, "position", descending=False,
+                      page_size=page_size, filters={"contract_id": contract_id},
+                      ranges={"position": (after + 1, None)} if after is not None else None)
+    risks = page["rows"]
+    return {"risks": risks, "next": risks[-1]["position"] if page["has_more"] else None}
+
+def iter_risks(db, contract_id, legacy=None, page_size=500):
+    """
+    Yields all clause results of a contract, one page read at a time. Contracts
+    stored before the split still carry an embedded 'risks' array, passed as legacy.
+    """
+    if legacy:
+        yield from legacy
+        return
+    after = None
+    while True:
+        page = fetch_risks(db, contract_id, page_size=page_size, after=after)
+        yield from page["risks"]
+        if page["next"] is None:
+            return
+        after = page["next"]
+
+def load_risks(db, contract_id, legacy=None, page_size=500):
+    """
+    All clause results of a contract as a list (see iter_risks).
+    """
+    return list(iter_risks(db, contract_id, legacy, page_size))
@@ -1,91 +1,37 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
-import json
-from datetime import datetime
+import threading
+from mock_firestore import MockFirestore
 
 # Path to service account key
 # User needs to place 'serviceAccountKey.json' in the root or config folder
 SERVICE_ACCOUNT_KEY = 'serviceAccountKey.json'
 
-class MockFirestore:
-    """
-    In-memory mock for Firestore when no credentials are provided.
-    Allows the app to run locally for demonstration purposes.
-    """
-    def __init__(self):
-        self._data = {
-            'contracts': {},
-            'risk_analysis': {},
-            'audit_logs': {}
-        }
-        print("WARNING: Running in Mock Firestore mode. Data will not be persisted.")
-
-    def collection(self, name):
-        return MockCollection(self._data, name)
-
-class MockCollection:
-    def __init__(self, db_data, name):
-        self.db_data = db_data
-        self.name = name
-        if name not in self.db_data:
-            self.db_data[name] = {}
-
-    def document(self, doc_id=None):
-        if doc_id is None:
-            import uuid
-            doc_id = str(uuid.uuid4())
-        return MockDocument(self.db_data[self.name], doc_id)
-
-    def add(self, data):
-        import uuid
-        doc_id = str(uuid.uuid4())
-        data['id'] = doc_id
-        data['timestamp'] = datetime.now()
-        self.db_data[self.name][doc_id] = data
-        return None, MockDocument(self.db_data[self.name], doc_id)
-    
-    def stream(self):
-        for doc_id, data in self.db_data[self.name].items():
-            yield MockDocumentSnapshot(doc_id, data)
-
-class MockDocument:
-    def __init__(self, collection_data, doc_id):
-        self.collection_data = collection_data
-        self.doc_id = doc_id
-
-    def set(self, data, merge=False):
-        if merge and self.doc_id in self.collection_data:
-            self.collection_data[self.doc_id].update(data)
-        else:
-            self.collection_data[self.doc_id] = data
-            
-    def get(self):
-        data = self.collection_data.get(self.doc_id)
-        if data:
-            return MockDocumentSnapshot(self.doc_id, data)
-        return MockDocumentSnapshot(self.doc_id, None, exists=False)
-
-class MockDocumentSnapshot:
-    def __init__(self, doc_id, data, exists=True):
-        self.id = doc_id
-        self._data = data
-        self.exists = exists
+# Firestore rejects write batches with more than 500 operations
+FIRESTORE_BATCH_LIMIT = 500
 
-    def to_dict(self):
-        return self._data
+# Process that initialized the default firebase_admin app
+_app_pid = None
 
 def initialize_firebase():
     """
     Initializes Firebase app.
     Returns a Firestore client (real or mock).
     """
+    global _app_pid
     try:
         if os.path.exists(SERVICE_ACCOUNT_KEY):
+            # Imported here: firebase_admin (and grpc) take a while to import
+            import firebase_admin
+            from firebase_admin import credentials, firestore
             cred = credentials.Certificate(SERVICE_ACCOUNT_KEY)
+            # firebase_admin._apps survives fork, and firestore.client() would hand a
+            # forked child the parent's cached client: start the child on a new app
+            if firebase_admin._apps and _app_pid not in (None, os.getpid()):
+                firebase_admin.delete_app(firebase_admin.get_app())
             # Check if app is already initialized to avoid errors on reload
             if not firebase_admin._apps:
                 firebase_admin.initialize_app(cred)
+                _app_pid = os.getpid()
             db = firestore.client()
             print("SUCCESS: Connected to Firebase Firestore.")
             return db
@@ -97,5 +43,31 @@ def initialize_firebase():
         print(f"ERROR: Failed to initialize Firebase: {e}. Using MockFirestore.")
         return MockFirestore()
 
-# Initialize on module load or call explicitly
-db = initialize_firebase()
+class LazyClient:
+    """
+    Stands in for the Firestore client and initializes it on first use, so
+    importing this module neither imports firebase_admin nor connects.
+
+    The gRPC channels of a Firestore client do not survive fork(), so a
+    client created in another process (e.g. a pre-fork server's master) is
+    replaced by a new one in the forked child.
+    """
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        if self._client is None or self._pid not in (None, os.getpid()):
+            with self._lock:
+                if self._client is None or self._pid not in (None, os.getpid()):
+                    self._client = self._factory()
+                    self._pid = os.getpid()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.client(), name)
+
+# Connects on first use (call db.client() to connect up front)
+db = LazyClient(initialize_firebase)
@@ -0,0 +1,46 @@
+"""
+Production serving for the REST API:
+
+    gunicorn -c gunicorn.conf.py api:app
+
+The app (spaCy pipeline, risk model, keyword matcher) is imported once in the
+master process and the workers are forked from it, so every worker shares
+the model pages copy-on-write instead of loading and training its own copy.
+
+With LEXIGUARD_STARTUP=lazy the app is not preloaded: each worker imports it
+quickly, answers /health at once and loads the models in a background thread
+(see /ready). Faster to come up, but every worker holds its own copy.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("LEXIGUARD_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("LEXIGUARD_WORKERS", multiprocessing.cpu_count()))
+# NLP calls are serialized per worker (see NLPProcessor), so threads mainly
+# overlap Firestore and network I/O; CPU scaling comes from workers.
+threads = int(os.environ.get("LEXIGUARD_THREADS", 4))
+worker_class = "gthread"
+timeout = int(os.environ.get("LEXIGUARD_TIMEOUT", 120))
+preload_app = os.environ.get("LEXIGUARD_STARTUP", "eager") != "lazy"
+
+# Keep the cyclic GC from running while the app is preloaded, so the model
+# objects are not scattered across partly collected generations before they
+# are frozen below. Only the preload window is affected.
+if preload_app:
+    gc.disable()
+
+def when_ready(server):
+    # Runs in the master after preloading, before any worker is forked.
+    # Everything loaded so far goes to the permanent generation, which the
+    # workers' collector never scans (and so never un-shares).
+    if preload_app:
+        gc.freeze()
+        server.log.info(f"Models preloaded; froze {gc.get_freeze_count()} objects before forking workers.")
+    gc.enable()
+
+def post_worker_init(worker):
+    # The clause and near-duplicate indexes are per worker and read Firestore,
+    # so they are loaded after the fork, in the background, not while preloading.
+    from api import indexes
+    indexes.start()
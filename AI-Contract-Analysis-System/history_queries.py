@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Same value as firestore.Query.DESCENDING / ASCENDING
+DESCENDING = "DESCENDING"
+ASCENDING = "ASCENDING"
+
+HISTORY_FIELDS = ("filename", "timestamp", "risk_score")
+AUDIT_FIELDS = ("timestamp", "user", "action", "details")
+
+class PageCache:
+    """
+    Caches result pages per collection. Every write to a collection bumps its
+    generation, which invalidates that collection's cached pages; the TTL bounds
+    staleness from writes made by other processes.
+    """
+    def __init__(self, max_pages=512, ttl=30):
+        self.max_pages = max_pages
+        self.ttl = ttl
+        self._pages = OrderedDict()   # key -> (expires_at, generation, page)
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def notify_write(self, collection):
+        with self._lock:
+            self._generations[collection] = self._generations.get(collection, 0) + 1
+
+    def get(self, collection, key):
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is None:
+                return None
+            expires_at, generation, page = entry
+            if expires_at <= time.monotonic() or generation != self._generations.get(collection, 0):
+                del self._pages[key]
+                return None
+            self._pages.move_to_end(key)
+            return page
+
+    def put(self, collection, key, page):
+        with self._lock:
+            self._pages[key] = (time.monotonic() + self.ttl, self._generations.get(collection, 0), page)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+
+page_cache = PageCache()
+
+def notify_write(collection):
+    page_cache.notify_write(collection)
+
+def fetch_page(db, collection, fields, order_field, descending=True, page_size=25,
+               cursor=None, ranges=None, filters=None):
+    """
+    Fetches one page of a collection, sorted and filtered server-side, carrying
+    only the projected fields.
+
+    ranges: {field: (low, high)} inclusive bounds, either side may be None.
+        Only order_field may be ranged: Firestore rejects a range on one field
+        ordered by another.
+    filters: {field: value} equality filters.
+    cursor: the 'cursor' of the previous page (None for the first page).
+    Returns {"rows": [dict], "cursor": snapshot, "has_more": bool}.
+    """
+    ranges = {field: bounds for field, bounds in (ranges or {}).items() if bounds and any(b is not None for b in bounds)}
+    filters = filters or {}
+    unordered = sorted(field for field in ranges if field != order_field)
+    if unordered:
+        raise ValueError(f"Range filters on {unordered} need the query ordered by that field, not {order_field!r}")
+    # A page is identified by the row it starts after, not by its number:
+    # two sessions on "page 2" may have paged over different data
+    after = (cursor.id, cursor.get(order_field)) if cursor is not None else None
+    key = (collection, tuple(fields), order_field, descending, page_size, after,
+           tuple(sorted(ranges.items())), tuple(sorted(filters.items())))
+    page = page_cache.get(collection, key)
+    if page is not None:
+        return page
+
+    projection = list(dict.fromkeys(list(fields) + [order_field]))
+    query = db.collection(collection).select(projection)
+    for field, value in filters.items():
+        query = query.where(field, "==", value)
+    for field, (low, high) in ranges.items():
+        if low is not None:
+            query = query.where(field, ">=", low)
+        if high is not None:
+            query = query.where(field, "<=", high)
+    query = query.order_by(order_field, direction=DESCENDING if descending else ASCENDING)
+    if cursor is not None:
+        query = query.start_after(cursor)
+    # One extra row tells us whether there is a next page
+    snapshots = list(query.limit(page_size + 1).stream())
+
+    has_more = len(snapshots) > page_size
+    snapshots = snapshots[:page_size]
+    page = {
+        "rows": [{"id": snap.id, **(snap.to_dict() or {})} for snap in snapshots],
+        "cursor": snapshots[-1] if snapshots else None,
+        "has_more": has_more
+    }
+    page_cache.put(collection, key, page)
+    return page
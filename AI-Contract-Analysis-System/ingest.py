@@ -0,0 +1,273 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from analysis_cache import AnalysisCache
+from contract_parser import ContractParser
+from metrics import metrics
+from uploads import HASH_CHUNK_BYTES
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx')
+STAGES = ("parse", "segment", "analyze", "persist")
+
+_parser = None
+
+def _parse_worker(path):
+    """
+    Process-pool worker: hashes and parses one file.
+    Returns (path, file_hash, raw_text, seconds, error).
+    """
+    global _parser
+    if _parser is None:
+        _parser = ContractParser()
+    started = time.perf_counter()
+    try:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                digest.update(chunk)
+        raw_text = _parser.parse_file(path)
+        return path, digest.hexdigest(), raw_text, time.perf_counter() - started, None
+    except Exception as e:
+        return path, None, None, time.perf_counter() - started, str(e)
+
+def iter_sources(paths=(), manifest=None):
+    """
+    Yields the contract files to ingest: PDF/DOCX files under the given
+    directories (recursively, in sorted order), files given directly, and the
+    paths listed one per line in manifest.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+    if manifest:
+        with open(manifest, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield line
+
+class Checkpoint:
+    """
+    Append-only JSONL log of finished files, flushed and fsynced after every
+    batch. Files logged as stored or duplicate are skipped on resume; failed
+    ones are retried. A crash between a batch commit and its checkpoint only
+    means the batch is re-read, and its files are then found by hash.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        torn = False
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    torn = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    if entry.get("status") != "error":
+                        self.done.add(entry["path"])
+        self._file = open(path, "a", encoding="utf-8")
+        if torn:
+            # Otherwise the next entry is appended to the torn line and lost with it
+            self._file.write("\n")
+
+    def record(self, entries):
+        for entry in entries:
+            self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+class Ingestor:
+    """
+    Bulk ingestion pipeline: files are hashed and parsed in a process pool,
+    then handled in batches of batch_size with one nlp.pipe segmentation pass,
+    one RiskEngine.analyze_contracts call and one batched Firestore write
+    (contracts, risks, clause digests and analysis cache entries).
+    Per-stage counts and busy seconds are kept in self.stages.
+    """
+    def __init__(self, db, nlp, risk_engine, analysis_cache, near_duplicates, checkpoint, batch_size=64):
+        self.db = db
+        self.nlp = nlp
+        self.risk_engine = risk_engine
+        self.analysis_cache = analysis_cache
+        self.near_duplicates = near_duplicates
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.version = f"{risk_engine.version}/{nlp.segmenter}"
+        self.stages = {stage: [0, 0.0] for stage in STAGES}
+        self.counts = {"stored": 0, "duplicate": 0, "error": 0, "skipped": 0}
+        self._seen = set()  # file hashes ingested in this run
+
+    def run(self, paths, workers=None, max_in_flight=None, report_interval=10.0):
+        max_in_flight = max_in_flight or (workers or os.cpu_count() or 1) * 4
+        started = last_report = time.perf_counter()
+        batch = []
+        pending = deque()
+
+        def collect():
+            nonlocal batch, last_report
+            batch.append(self._parsed(pending.popleft().result()))
+            if len(batch) == self.batch_size:
+                self._process_batch(batch)
+                batch = []
+            if time.perf_counter() - last_report >= report_interval:
+                self.report(time.perf_counter() - started)
+                last_report = time.perf_counter()
+
+        # Parsed files are taken in input order; at most max_in_flight are parsed ahead
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path in self._unfinished(paths):
+                pending.append(pool.submit(_parse_worker, path))
+                while len(pending) >= max_in_flight or (pending and pending[0].done()):
+                    collect()
+            while pending:
+                collect()
+        if batch:
+            self._process_batch(batch)
+        metrics.inc("ingested_files", self.counts["stored"])
+        self.report(time.perf_counter() - started)
+
+    def _unfinished(self, paths):
+        for path in paths:
+            if path in self.checkpoint.done:
+                self.counts["skipped"] += 1
+                continue
+            yield path
+
+    def _parsed(self, result):
+        path, file_hash, raw_text, seconds, error = result
+        self._record_stage("parse", 1, seconds)
+        return {"path": path, "hash": file_hash, "text": raw_text, "error": error}
+
+    def _record_stage(self, stage, count, seconds):
+        self.stages[stage][0] += count
+        self.stages[stage][1] += seconds
+
+    def _process_batch(self, batch):
+        # Imported here so parse workers (which import this module under spawn) never touch Firebase
+        from contract_store import contract_aggregates, find_by_hash, save_contracts
+
+        entries = []
+        todo = []
+        for item in batch:
+            if item["error"]:
+                logger.error(f"Failed to parse {item['path']}: {item['error']}")
+                entries.append({"path": item["path"], "status": "error", "error": item["error"]})
+                continue
+            if item["hash"] in self._seen:
+                duplicate = {"id": None}
+            else:
+                duplicate = find_by_hash(self.db, item["hash"])
+            if duplicate is not None:
+                entries.append({"path": item["path"], "status": "duplicate", "id": duplicate.get("id")})
+                continue
+            self._seen.add(item["hash"])
+            item["clean"] = self.nlp.clean_text(item["text"])
+            item["analysis_key"] = AnalysisCache.make_key(item["clean"], self.version)
+            todo.append(item)
+
+        if todo:
+            try:
+                started = time.perf_counter()
+                clause_lists = self.nlp.segment_documents([item.pop("text") for item in todo],
+                                                          batch_size=self.batch_size)
+                self._record_stage("segment", len(todo), time.perf_counter() - started)
+
+                started = time.perf_counter()
+                known = {}
+                for clauses in clause_lists:
+                    match = self.near_duplicates.find(clauses, self.risk_engine.version)
+                    if match:
+                        known.update(match["known"])
+                analyses = self.risk_engine.analyze_contracts(clause_lists, known_results=known)
+                self._record_stage("analyze", len(todo), time.perf_counter() - started)
+
+                started = time.perf_counter()
+                now = datetime.now()
+                aggregates = [contract_aggregates(analysis) for analysis in analyses]
+                ids = save_contracts(self.db, (({
+                    "filename": os.path.basename(item["path"]),
+                    "hash": item["hash"],
+                    "timestamp": now,
+                    **aggregate,
+                    "full_text_snippet": item["clean"][:500],
+                    "analysis_key": item["analysis_key"],
+                    "source": "ingest"
+                }, analysis['risks']) for item, analysis, aggregate in zip(todo, analyses, aggregates)))
+                self.near_duplicates.add_many((doc_id, analysis['clause_digest'], self.risk_engine.version)
+                                              for analysis, doc_id in zip(analyses, ids))
+                self.analysis_cache.put_many((item["analysis_key"], {**aggregate, "contract_id": doc_id})
+                                             for item, aggregate, doc_id in zip(todo, aggregates, ids))
+                self._record_stage("persist", len(todo), time.perf_counter() - started)
+                entries.extend({"path": item["path"], "status": "stored", "id": doc_id}
+                               for item, doc_id in zip(todo, ids))
+            except Exception as e:
+                logger.error(f"Failed to ingest batch: {e}")
+                entries.extend({"path": item["path"], "status": "error", "error": str(e)} for item in todo)
+
+        for entry in entries:
+            self.counts[entry["status"]] += 1
+        self.checkpoint.record(entries)
+
+    def report(self, elapsed):
+        done = self.counts["stored"] + self.counts["duplicate"] + self.counts["error"]
+        stages = "  ".join(f"{stage} {count / seconds if seconds else 0:.1f}/s"
+                           for stage, (count, seconds) in self.stages.items())
+        print(f"[{elapsed:7.1f}s] {done} files ({done / elapsed if elapsed else 0:.1f}/s): "
+              f"{self.counts['stored']} stored, {self.counts['duplicate']} duplicate, "
+              f"{self.counts['error']} failed, {self.counts['skipped']} already done | {stages}", flush=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory or manifest of PDF/DOCX contracts")
+    parser.add_argument("paths", nargs="*", help="Directories (searched recursively) or files")
+    parser.add_argument("--manifest", default=None, help="File with one contract path per line")
+    parser.add_argument("--workers", type=int, default=None, help="Parse processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Documents per NLP/scoring/write batch")
+    parser.add_argument("--checkpoint", default="ingest_checkpoint.jsonl", help="Progress log used to resume")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="Seconds between progress lines")
+    parser.add_argument("--spacy-model", default="en_core_web_sm")
+    args = parser.parse_args(argv)
+    if not args.paths and not args.manifest:
+        parser.error("give at least one directory/file or --manifest")
+
+    from firebase_config import db
+    from nlp_processor import NLPProcessor
+    from risk_engine import RiskEngine
+    from analysis_cache import AnalysisCache
+    from near_duplicates import NearDuplicateIndex
+
+    checkpoint = Checkpoint(args.checkpoint)
+    if checkpoint.done:
+        print(f"Resuming: {len(checkpoint.done)} files already ingested according to {args.checkpoint}")
+    ingestor = Ingestor(db, NLPProcessor(args.spacy_model), RiskEngine(), AnalysisCache(db),
+                        NearDuplicateIndex(db), checkpoint, batch_size=args.batch_size)
+    try:
+        ingestor.run(iter_sources(args.paths, args.manifest), workers=args.workers,
+                     report_interval=args.report_interval)
+    finally:
+        checkpoint.close()
+    return 1 if ingestor.counts["error"] else 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    pass
+
+class JobQueue:
+    """
+    In-process job broker for long analyses: a bounded queue drained by a pool
+    of background worker threads. Finished jobs are kept for result_ttl seconds.
+
+    Job state is also written to the db's 'jobs' collection (with an expires_at
+    timestamp), so with several server processes any of them can answer for a
+    job another one is running.
+
+    Workers are started lazily on the first submit (and restarted after a
+    fork), so the queue is safe to create at import time in a pre-fork server.
+    """
+    def __init__(self, handler, workers=2, max_queue=100, result_ttl=3600, db=None, collection='jobs'):
+        self.handler = handler
+        self.db = db
+        self.collection = collection
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+
+    def submit(self, payload):
+        """
+        Enqueues a job and returns its id. Raises QueueFullError when the queue is at max_queue.
+        """
+        self._ensure_started()
+        self._expire()
+        job_id = str(uuid.uuid4())
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "submitted_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        try:
+            self._queue.put_nowait((job_id, payload))
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job_id]
+            raise QueueFullError(f"Job queue is full ({self.max_queue} jobs waiting)")
+        self._persist(job_id, self._public(job))
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return self._public(job)
+        if self.db is None:
+            return None
+        try:
+            snapshot = self.db.collection(self.collection).document(job_id).get()
+        except Exception as e:
+            logger.warning(f"Job lookup failed: {e}")
+            return None
+        if not snapshot.exists:
+            return None
+        job = snapshot.to_dict()
+        expires_at = job.pop("expires_at", None)
+        # Firestore reads naive datetimes as UTC and returns them tz-aware
+        if expires_at is not None and expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at is not None and expires_at <= datetime.now(timezone.utc):
+            return None
+        return job
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"queued": self._queue.qsize(), "max_queue": self.max_queue, "workers": self.workers, "jobs": counts}
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._threads = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                             for i in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def _work(self):
+        while True:
+            job_id, payload = self._queue.get()
+            self._update(job_id, status="running", started_at=datetime.now().isoformat())
+            try:
+                result = self.handler(payload)
+                self._update(job_id, status="done", result=result, finished_at=datetime.now().isoformat(),
+                             _expires=time.monotonic() + self.result_ttl)
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}")
+                self._update(job_id, status="failed", error=str(e), finished_at=datetime.now().isoformat(),
+                             _expires=time.monotonic() + self.result_ttl)
+            finally:
+                self._queue.task_done()
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            public = self._public(job)
+        self._persist(job_id, public)
+
+    @staticmethod
+    def _public(job):
+        return {k: v for k, v in job.items() if not k.startswith("_")}
+
+    def _persist(self, job_id, job):
+        if self.db is None:
+            return
+        try:
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.result_ttl)
+            self.db.collection(self.collection).document(job_id).set({**job, "expires_at": expires_at})
+        except Exception as e:
+            logger.warning(f"Could not store job {job_id}: {e}")
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.get("_expires", now + 1) <= now]
+            for job_id in expired:
+                del self._jobs[job_id]
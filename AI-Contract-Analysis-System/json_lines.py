@@ -0,0 +1,22 @@
+import json
+from datetime import datetime
+
+def dumps(record):
+    """
+    One JSON line for an append-only log. Datetimes are kept as {"$dt": iso}
+    so they come back as datetimes; other non-JSON values become strings.
+    """
+    return json.dumps(record, default=_encode)
+
+def loads(line):
+    return json.loads(line, object_hook=_decode)
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return str(value)
+
+def _decode(obj):
+    if len(obj) == 1 and "$dt" in obj:
+        return datetime.fromisoformat(obj["$dt"])
+    return obj
@@ -0,0 +1,173 @@
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Latency histogram buckets in seconds (Prometheus 'le' bounds)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Metrics:
+    """
+    In-process counters and latency histograms, rendered in the Prometheus
+    text exposition format. No external client library; every operation is
+    a dict update under one lock.
+
+    Metrics are per process: behind gunicorn each worker reports its own
+    numbers, so scrape the workers individually or sum in the query.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, namespace="lexiguard"):
+        self.buckets = tuple(buckets)
+        self.namespace = namespace
+        self._counters = {}     # (name, labels) -> value
+        self._histograms = {}   # (name, labels) -> [bucket counts..., sum, count]
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, help=None, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            if help:
+                self._help.setdefault(name, help)
+
+    def observe(self, name, seconds, help=None, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [0] * (len(self.buckets) + 2)
+                if help:
+                    self._help.setdefault(name, help)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    hist[i] += 1
+            hist[-2] += seconds
+            hist[-1] += 1
+
+    @contextmanager
+    def span(self, stage):
+        """
+        Times a pipeline stage into the stage_seconds histogram.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start,
+                         help="Time spent per pipeline stage.", stage=stage)
+
+    def snapshot(self):
+        """
+        Plain dict view (counters and per-histogram count/sum), e.g. for /health or logs.
+        """
+        with self._lock:
+            counters = {self._series(name, labels): value for (name, labels), value in self._counters.items()}
+            histograms = {self._series(name, labels): {"count": hist[-1], "sum": round(hist[-2], 6)}
+                          for (name, labels), hist in self._histograms.items()}
+        return {"counters": counters, "histograms": histograms}
+
+    def render(self):
+        """
+        The Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        with self._lock:
+            for kind, series in (("counter", self._counters), ("histogram", self._histograms)):
+                by_name = {}
+                for (name, labels), value in series.items():
+                    by_name.setdefault(name, []).append((labels, value))
+                for name in sorted(by_name):
+                    full = f"{self.namespace}_{name}" if kind == "histogram" else f"{self.namespace}_{name}_total"
+                    if name in self._help:
+                        lines.append(f"# HELP {full} {self._help[name]}")
+                    lines.append(f"# TYPE {full} {kind}")
+                    for labels, value in sorted(by_name[name]):
+                        if kind == "counter":
+                            lines.append(f"{full}{_labels(labels)} {_number(value)}")
+                            continue
+                        for bound, count in zip(self.buckets, value):
+                            lines.append(f"{full}_bucket{_labels(labels + (('le', _number(bound)),))} {count}")
+                        lines.append(f"{full}_bucket{_labels(labels + (('le', '+Inf'),))} {value[-1]}")
+                        lines.append(f"{full}_sum{_labels(labels)} {_number(value[-2])}")
+                        lines.append(f"{full}_count{_labels(labels)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _series(self, name, labels):
+        return f"{name}{_labels(labels)}" if labels else name
+
+class RequestProfiler:
+    """
+    Samples requests with cProfile and keeps the profile only when the request
+    was slower than threshold seconds. Only one request is profiled at a time
+    (Python allows a single active profiler). Load dumps with pstats or snakeviz.
+    """
+    def __init__(self, sample_rate=0.0, threshold=2.0, dump_dir="profiles"):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.dump_dir = dump_dir
+        self._busy = threading.Lock()
+
+    def start(self):
+        """
+        Returns a running profile, or None when this request is not sampled.
+        """
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if not self._busy.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # another profiler is active in this process
+            self._busy.release()
+            return None
+        return profile
+
+    def stop(self, profile, name, elapsed):
+        """
+        Stops the profile and dumps it if the request was slow. Returns the dump path or None.
+        """
+        try:
+            profile.disable()
+        finally:
+            self._busy.release()
+        if elapsed < self.threshold:
+            return None
+        try:
+            os.makedirs(self.dump_dir, exist_ok=True)
+            safe_name = "".join(ch if ch.isalnum() else "_" for ch in name)
+            path = os.path.join(self.dump_dir, f"{safe_name}_{datetime.now():%Y%m%d_%H%M%S}_{int(elapsed * 1000)}ms.prof")
+            profile.dump_stats(path)
+            logger.warning(f"Slow request {name} took {elapsed:.2f}s; profile written to {path}")
+            return path
+        except OSError as e:
+            logger.error(f"Failed to write profile: {e}")
+            return None
+
+def _labels(labels):
+    if not labels:
+        return ""
+    body = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return "{" + body + "}"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# Shared registry used by the pipeline modules, api.py and app.py
+metrics = Metrics()
+span = metrics.span
+inc = metrics.inc
@@ -0,0 +1,465 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+
+import json_lines
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "firestore_schema.json")
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+def load_index_config(schema_path=SCHEMA_PATH):
+    """
+    Reads the 'indexes' (hash) and 'sorted_indexes' lists of each collection
+    from firestore_schema.json.
+    """
+    try:
+        with open(schema_path) as f:
+            schema = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read {schema_path}: {e}. Mock store runs without indexes.")
+        return {}
+    return {
+        name: (spec.get("indexes", []), spec.get("sorted_indexes", []))
+        for name, spec in schema.items()
+    }
+
+class _SortedIndex:
+    """
+    Sorted (value, doc_id) keys split into buckets of ~LOAD items, so inserts
+    and deletes stay cheap at millions of entries (a flat list would memmove
+    the whole tail on every insert).
+    """
+    LOAD = 1000
+
+    def __init__(self):
+        self._lists = []
+        self._maxes = []
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self._lists)
+
+    def add(self, key):
+        if not self._maxes:
+            self._lists.append([key])
+            self._maxes.append(key)
+            return
+        i = bisect.bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            i -= 1
+            self._lists[i].append(key)
+            self._maxes[i] = key
+        else:
+            bisect.insort(self._lists[i], key)
+        bucket = self._lists[i]
+        if len(bucket) > 2 * self.LOAD:
+            tail = bucket[self.LOAD:]
+            del bucket[self.LOAD:]
+            self._lists.insert(i + 1, tail)
+            self._maxes[i] = bucket[-1]
+            self._maxes.insert(i + 1, tail[-1])
+
+    def remove(self, key):
+        i = bisect.bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return
+        bucket = self._lists[i]
+        j = bisect.bisect_left(bucket, key)
+        if j < len(bucket) and bucket[j] == key:
+            del bucket[j]
+            if bucket:
+                self._maxes[i] = bucket[-1]
+            else:
+                del self._lists[i]
+                del self._maxes[i]
+
+    def irange(self, low=None, high=None, reverse=False):
+        """
+        Yields keys k with low <= k < high (either bound may be None), in order.
+        """
+        if not reverse:
+            i = 0 if low is None else bisect.bisect_left(self._maxes, low)
+            j = 0 if low is None or i == len(self._lists) else bisect.bisect_left(self._lists[i], low)
+            for bucket in self._lists[i:]:
+                for key in bucket[j:] if j else bucket:
+                    if high is not None and key >= high:
+                        return
+                    yield key
+                j = 0
+        else:
+            i = len(self._lists) - 1 if high is None else min(bisect.bisect_left(self._maxes, high), len(self._lists) - 1)
+            if i < 0:
+                return
+            j = len(self._lists[i]) if high is None else bisect.bisect_left(self._lists[i], high)
+            for n in range(i, -1, -1):
+                bucket = self._lists[n]
+                for k in range(j - 1, -1, -1):
+                    key = bucket[k]
+                    if low is not None and key < low:
+                        return
+                    yield key
+                if n:
+                    j = len(self._lists[n - 1])
+
+class _CollectionStore:
+    """
+    Documents of one collection plus their indexes:
+    hash indexes (field -> value -> set of ids) for equality filters and
+    sorted indexes (field -> sorted [(value, id)]) for ranges and ordering.
+    """
+    def __init__(self, hash_fields=(), sorted_fields=()):
+        self.docs = {}
+        self.hash_indexes = {field: {} for field in hash_fields}
+        self.sorted_indexes = {field: _SortedIndex() for field in sorted_fields}
+
+    def put(self, doc_id, data):
+        if doc_id in self.docs:
+            self._unindex(doc_id, self.docs[doc_id])
+        self.docs[doc_id] = data
+        for field, index in self.hash_indexes.items():
+            value = data.get(field)
+            if _hashable(value):
+                index.setdefault(value, set()).add(doc_id)
+        for field, index in self.sorted_indexes.items():
+            value = data.get(field)
+            if value is not None:
+                index.add((value, doc_id))
+
+    def delete(self, doc_id):
+        data = self.docs.pop(doc_id, None)
+        if data is not None:
+            self._unindex(doc_id, data)
+
+    def _unindex(self, doc_id, data):
+        for field, index in self.hash_indexes.items():
+            value = data.get(field)
+            if _hashable(value) and value in index:
+                index[value].discard(doc_id)
+                if not index[value]:
+                    del index[value]
+        for field, index in self.sorted_indexes.items():
+            value = data.get(field)
+            if value is not None:
+                index.remove((value, doc_id))
+
+class MockFirestore:
+    """
+    Local stand-in for Firestore when no credentials are provided.
+    Keeps documents in memory with the indexes declared in firestore_schema.json
+    and supports where/order_by/limit/start_after queries. Pass log_path (or set
+    LEXIGUARD_MOCK_DB) to persist every write to an append-only JSONL log that
+    is replayed on startup.
+    """
+    def __init__(self, log_path=None, schema_path=SCHEMA_PATH):
+        self._index_config = load_index_config(schema_path)
+        self._stores = {}
+        self._lock = threading.RLock()
+        self._log = None
+        for name in ('contracts', 'risk_analysis', 'audit_logs'):
+            self._store(name)
+
+        log_path = log_path or os.environ.get("LEXIGUARD_MOCK_DB")
+        if log_path:
+            self._replay(log_path)
+            self._log = open(log_path, "a", encoding="utf-8")
+            print(f"WARNING: Running in Mock Firestore mode. Data is persisted to {log_path}.")
+        else:
+            print("WARNING: Running in Mock Firestore mode. Data will not be persisted.")
+
+    def collection(self, name):
+        return MockCollection(self, name)
+
+    def batch(self):
+        return MockWriteBatch()
+
+    def _store(self, name):
+        store = self._stores.get(name)
+        if store is None:
+            hash_fields, sorted_fields = self._index_config.get(name, ([], []))
+            store = self._stores[name] = _CollectionStore(hash_fields, sorted_fields)
+        return store
+
+    def _write(self, collection, doc_id, data):
+        with self._lock:
+            store = self._store(collection)
+            if data is None:
+                store.delete(doc_id)
+            else:
+                store.put(doc_id, data)
+            if self._log:
+                self._log.write(json_lines.dumps({"c": collection, "id": doc_id, "d": data}) + "\n")
+                self._log.flush()
+
+    def _replay(self, log_path):
+        if not os.path.exists(log_path):
+            return
+        with open(log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json_lines.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping corrupt line in {log_path}")
+                    continue
+                store = self._store(entry["c"])
+                if entry["d"] is None:
+                    store.delete(entry["id"])
+                else:
+                    store.put(entry["id"], entry["d"])
+
+class MockWriteBatch:
+    def __init__(self):
+        self._writes = []
+
+    def set(self, doc_ref, data, merge=False):
+        self._writes.append((doc_ref, data, merge))
+
+    def commit(self):
+        for doc_ref, data, merge in self._writes:
+            doc_ref.set(data, merge=merge)
+        self._writes = []
+
+class MockQuery:
+    def __init__(self, db, name, filters=(), orders=(), limit=None, cursor=None, projection=None):
+        self._db = db
+        self._name = name
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+        self._projection = projection
+
+    def _copy(self, **changes):
+        fields = {"filters": self._filters, "orders": self._orders, "limit": self._limit,
+                  "cursor": self._cursor, "projection": self._projection}
+        fields.update(changes)
+        return MockQuery(self._db, self._name, **fields)
+
+    def where(self, field, op, value):
+        if op not in _OPERATORS:
+            raise ValueError(f"Unsupported operator: {op}")
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def select(self, field_paths):
+        """
+        Projection: returned snapshots only carry these fields.
+        """
+        return self._copy(projection=tuple(field_paths))
+
+    def start_after(self, document_or_values):
+        """
+        Accepts a snapshot or a dict of the order_by field values.
+        """
+        if isinstance(document_or_values, MockDocumentSnapshot):
+            cursor = (document_or_values.to_dict() or {}, document_or_values.id)
+        else:
+            cursor = (dict(document_or_values), None)
+        return self._copy(cursor=cursor)
+
+    def get(self):
+        return list(self.stream())
+
+    def stream(self):
+        with self._db._lock:
+            store = self._db._store(self._name)
+            rows, ordered = self._plan(store)
+            matched = []
+            for doc_id, data in rows:
+                if not all(_OPERATORS[op](data.get(field), value) for field, op, value in self._filters):
+                    continue
+                matched.append((doc_id, data))
+                if ordered and self._limit is not None and len(matched) >= self._limit:
+                    break
+        if not ordered:
+            matched = self._sort(matched)
+            if self._cursor:
+                matched = [row for row in matched if self._after_cursor(row)]
+            if self._limit is not None:
+                matched = matched[:self._limit]
+        for doc_id, data in matched:
+            if self._projection is not None:
+                data = {field: data[field] for field in self._projection if field in data}
+            yield MockDocumentSnapshot(doc_id, data, reference=MockDocument(self._db, self._name, doc_id))
+
+    def _plan(self, store):
+        """
+        Picks the cheapest access path. Returns (rows, ordered); ordered means rows
+        come out of a sorted index already in the requested order and past the
+        cursor, so the limit can stop the scan early.
+        """
+        # 1. Single-field ordering served by a sorted index (with cursor/range bounds)
+        if len(self._orders) == 1 and self._orders[0][0] in store.sorted_indexes:
+            field, direction = self._orders[0]
+            low, high = self._bounds(field)
+            if self._cursor:
+                values, cursor_id = self._cursor
+                value = values.get(field)
+                if direction == DESCENDING:
+                    bound = (value, cursor_id if cursor_id is not None else "")
+                    high = bound if high is None else min(high, bound)
+                else:
+                    # Smallest key greater than (value, cursor_id)
+                    bound = (value, cursor_id + "\0" if cursor_id is not None else _MAX_ID)
+                    low = bound if low is None else max(low, bound)
+            keys = store.sorted_indexes[field].irange(low, high, reverse=direction == DESCENDING)
+            return ((doc_id, store.docs[doc_id]) for _, doc_id in keys), True
+
+        # 2. Equality on a hash-indexed field
+        for field, op, value in self._filters:
+            if op == "==" and field in store.hash_indexes and _hashable(value):
+                ids = store.hash_indexes[field].get(value, ())
+                return [(doc_id, store.docs[doc_id]) for doc_id in ids], False
+            if op == "in" and field in store.hash_indexes:
+                ids = set().union(*(store.hash_indexes[field].get(v, set()) for v in value if _hashable(v)))
+                return [(doc_id, store.docs[doc_id]) for doc_id in ids], False
+
+        # 3. Range filter on a sorted-index field
+        for field, op, value in self._filters:
+            if op in ("<", "<=", ">", ">=") and field in store.sorted_indexes:
+                low, high = self._bounds(field)
+                keys = store.sorted_indexes[field].irange(low, high)
+                return [(doc_id, store.docs[doc_id]) for _, doc_id in keys], False
+
+        # 4. Full scan
+        return list(store.docs.items()), False
+
+    def _bounds(self, field):
+        """
+        Half-open [low, high) key range on a sorted index implied by the filters on field.
+        """
+        low = high = None
+        for f, op, value in self._filters:
+            if f != field or value is None:
+                continue
+            lows, highs = [], []
+            if op == ">":
+                lows.append((value, _MAX_ID))
+            elif op == ">=":
+                lows.append((value, ""))
+            elif op == "<":
+                highs.append((value, ""))
+            elif op == "<=":
+                highs.append((value, _MAX_ID))
+            elif op == "==":
+                lows.append((value, ""))
+                highs.append((value, _MAX_ID))
+            for bound in lows:
+                low = bound if low is None else max(low, bound)
+            for bound in highs:
+                high = bound if high is None else min(high, bound)
+        return low, high
+
+    def _sort(self, rows):
+        # Document id is the final tie-breaker (and the default order), as in Firestore
+        descending = bool(self._orders) and self._orders[-1][1] == DESCENDING
+        rows = sorted(rows, key=lambda row: row[0], reverse=descending)
+        for field, direction in reversed(self._orders):
+            rows = [row for row in rows if row[1].get(field) is not None]
+            rows.sort(key=lambda row: row[1][field], reverse=direction == DESCENDING)
+        return rows
+
+    def _after_cursor(self, row):
+        values, cursor_id = self._cursor
+        for field, direction in self._orders:
+            a, b = row[1].get(field), values.get(field)
+            if a == b:
+                continue
+            return a > b if direction != DESCENDING else a < b
+        if cursor_id is None:
+            return False
+        return row[0] > cursor_id if not self._orders or self._orders[-1][1] != DESCENDING else row[0] < cursor_id
+
+class MockCollection(MockQuery):
+    def __init__(self, db, name):
+        super().__init__(db, name)
+        db._store(name)
+
+    def document(self, doc_id=None):
+        if doc_id is None:
+            doc_id = str(uuid.uuid4())
+        return MockDocument(self._db, self._name, doc_id)
+
+    def add(self, data):
+        doc_id = str(uuid.uuid4())
+        data['id'] = doc_id
+        data['timestamp'] = datetime.now()
+        self._db._write(self._name, doc_id, data)
+        return None, MockDocument(self._db, self._name, doc_id)
+
+class MockDocument:
+    def __init__(self, db, collection, doc_id):
+        self._db = db
+        self._collection = collection
+        self.doc_id = doc_id
+        self.id = doc_id
+
+    def set(self, data, merge=False):
+        with self._db._lock:
+            existing = self._db._store(self._collection).docs.get(self.doc_id)
+            if merge and existing is not None:
+                data = {**existing, **data}
+            self._db._write(self._collection, self.doc_id, data)
+
+    def update(self, data):
+        with self._db._lock:
+            existing = self._db._store(self._collection).docs.get(self.doc_id)
+            if existing is None:
+                raise KeyError(f"No document to update: {self._collection}/{self.doc_id}")
+            self._db._write(self._collection, self.doc_id, {**existing, **data})
+
+    def delete(self):
+        self._db._write(self._collection, self.doc_id, None)
+
+    def get(self):
+        data = self._db._store(self._collection).docs.get(self.doc_id)
+        if data is not None:
+            return MockDocumentSnapshot(self.doc_id, data, reference=self)
+        return MockDocumentSnapshot(self.doc_id, None, exists=False, reference=self)
+
+class MockDocumentSnapshot:
+    def __init__(self, doc_id, data, exists=True, reference=None):
+        self.id = doc_id
+        self._data = data
+        self.exists = exists
+        self.reference = reference
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+# Sorts after any uuid4 document id; used for inclusive/exclusive bisect bounds
+_MAX_ID = "\uffff"
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a is not None and a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a is not None and a not in b,
+    "array-contains": lambda a, b: isinstance(a, list) and b in a,
+    "array-contains-any": lambda a, b: isinstance(a, list) and any(v in a for v in b),
+}
+
+def _hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return value is not None
@@ -0,0 +1,173 @@
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import pickle
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock, processes starting together may each train
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+DEFAULT_MODEL_PATH = os.environ.get("LEXIGUARD_MODEL_PATH", os.path.join(MODELS_DIR, "risk_model.pkl"))
+
+# Artifact layout: one JSON header line followed by the pickled pipeline.
+ARTIFACT_MAGIC = b"LEXIGUARD-MODEL"
+ARTIFACT_FORMAT = 1
+
+# Dummy dataset. In a real scenario this would come from labelled contracts.
+TRAINING_DATA = [
+    ("The Provider shall indemnify the Client against all losses.", "High"),
+    ("Limitation of Liability: The Provider's liability shall not exceed $1000.", "High"),
+    ("This agreement may be terminated by either party with 30 days notice.", "High"),
+    ("Any dispute shall be resolved via arbitration in New York.", "High"),
+    ("Confidential Information shall not be disclosed to third parties.", "Medium"),
+    ("This agreement is governed by the laws of California.", "Medium"),
+    ("All notices must be in writing and sent via certified mail.", "Low"),
+    ("This contract is renewable automatically unless cancelled.", "Medium"),
+    ("The standard warranty period is 12 months.", "Medium"),
+    ("If any provision is found invalid, the rest remains in effect.", "Low")
+]
+
+class ModelArtifactError(Exception):
+    pass
+
+def train_pipeline(data=TRAINING_DATA):
+    """
+    Fits the TF-IDF + LogisticRegression risk pipeline.
+    sklearn is imported here so loading a saved artifact never pays for training code paths.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+
+    texts = [text for text, _ in data]
+    labels = [label for _, label in data]
+    pipeline = make_pipeline(
+        TfidfVectorizer(stop_words='english'),
+        LogisticRegression()
+    )
+    pipeline.fit(texts, labels)
+    return pipeline
+
+def serialize(pipeline):
+    """
+    The pickled pipeline and its SHA256 hex digest.
+    """
+    payload = pickle.dumps(pipeline, protocol=pickle.HIGHEST_PROTOCOL)
+    return payload, hashlib.sha256(payload).hexdigest()
+
+def model_version(sha256):
+    """
+    The model version used in cache keys: derived from the artifact's content,
+    so every process that loads or trains the same model agrees on it.
+    """
+    return sha256[:12]
+
+def save_model(pipeline, path=DEFAULT_MODEL_PATH, version=None):
+    """
+    Writes a versioned, checksummed model artifact. Returns the header.
+    The file is written to a temp path and renamed so concurrent readers never see a partial file.
+    version: a label for humans; defaults to model_version of the content.
+    """
+    import sklearn
+
+    payload, digest = serialize(pipeline)
+    header = {
+        "format": ARTIFACT_FORMAT,
+        "version": version or model_version(digest),
+        "sha256": digest,
+        "size": len(payload),
+        "sklearn": sklearn.__version__,
+        "created": datetime.now().isoformat()
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(ARTIFACT_MAGIC + b" " + json.dumps(header, sort_keys=True).encode("utf-8") + b"\n")
+        f.write(payload)
+    os.replace(tmp_path, path)
+    logger.info(f"Saved risk model {header['version']} to {path}")
+    return header
+
+@contextmanager
+def training_lock(path=DEFAULT_MODEL_PATH):
+    """
+    Exclusive lock (path + ".lock") around training and saving an artifact,
+    so processes that start together without one do not all train: the first
+    trains, the others find its artifact once they get the lock.
+    """
+    lock_file = None
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        lock_file = open(f"{path}.lock", "a")
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+    except OSError as e:
+        logger.warning(f"Could not lock {path}.lock: {e}")
+    try:
+        yield
+    finally:
+        if lock_file is not None:
+            lock_file.close()
+
+def read_header(path=DEFAULT_MODEL_PATH):
+    with open(path, "rb") as f:
+        return _parse_header(f.readline())[0]
+
+def load_model(path=DEFAULT_MODEL_PATH, verify=True):
+    """
+    Memory-maps the artifact, verifies its checksum and unpickles the pipeline.
+    Returns (pipeline, header).
+    """
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header, offset = _parse_header(mm[:mm.find(b"\n") + 1])
+            payload = memoryview(mm)[offset:]
+            try:
+                if len(payload) != header["size"]:
+                    raise ModelArtifactError(f"Truncated model artifact {path}")
+                if verify and hashlib.sha256(payload).hexdigest() != header["sha256"]:
+                    raise ModelArtifactError(f"Checksum mismatch for model artifact {path}")
+                pipeline = pickle.loads(payload)
+            finally:
+                payload.release()
+    return pipeline, header
+
+def _parse_header(line):
+    if not line.startswith(ARTIFACT_MAGIC + b" "):
+        raise ModelArtifactError("Not a LexiGuard model artifact")
+    header = json.loads(line[len(ARTIFACT_MAGIC) + 1:])
+    if header.get("format") != ARTIFACT_FORMAT:
+        raise ModelArtifactError(f"Unsupported model artifact format: {header.get('format')}")
+    return header, len(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LexiGuard risk model artifact store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train = sub.add_parser("train", help="Train the risk model and write an artifact")
+    train.add_argument("--output", default=DEFAULT_MODEL_PATH)
+    train.add_argument("--version", default=None, help="Artifact version label (default: content hash)")
+
+    info = sub.add_parser("info", help="Show an artifact header and verify its checksum")
+    info.add_argument("path", nargs="?", default=DEFAULT_MODEL_PATH)
+
+    args = parser.parse_args(argv)
+    if args.command == "train":
+        header = save_model(train_pipeline(), args.output, args.version)
+        print(json.dumps(header, indent=2))
+    elif args.command == "info":
+        _, header = load_model(args.path)
+        print(json.dumps(header, indent=2))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,199 @@
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from clause_cache import clause_fingerprint
+from firebase_config import FIRESTORE_BATCH_LIMIT
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+class MinHasher:
+    """
+    MinHash signatures over a set of shingles (here: clause fingerprints).
+    The fraction of equal signature slots estimates the Jaccard similarity
+    of two clause sets, i.e. the share of clauses the contracts have in common.
+    """
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = rng.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, fingerprints):
+        """
+        fingerprints: clause_fingerprint hex digests. Returns a uint32 array, or None for an empty set.
+        """
+        if not fingerprints:
+            return None
+        values = np.array([int(fp[:8], 16) for fp in set(fingerprints)], dtype=np.uint64)
+        hashed = (np.outer(values, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return hashed.min(axis=0).astype(np.uint32)
+
+    @staticmethod
+    def similarity(sig_a, sig_b):
+        return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+def known_results(digest):
+    """
+    Clause fingerprint -> risk result map of a stored clause digest.
+    """
+    return {c['fp']: {"risk_level": c['risk_level'], "risk_score": c['risk_score'],
+                      "explanation": c['explanation']} for c in digest.get('clauses', [])}
+
+class NearDuplicateIndex:
+    """
+    LSH index of contract MinHash signatures, kept alongside 'contracts'.
+
+    Each analyzed contract gets a 'clause_digests' document (same id as the
+    contract) with its signature, LSH band keys and per-clause results
+    without the clause text. Signatures are split into bands of rows slots;
+    contracts sharing any band are candidates, so a lookup touches only a few
+    buckets instead of every stored contract. The closest candidate above
+    threshold is returned with its clause results, so unchanged clauses
+    are not scored again.
+
+    The in-memory buckets are loaded from the collection on first use (or by
+    load(), e.g. during warm-up) and topped up with newer digests every
+    refresh_interval seconds, which keeps several server processes roughly
+    in sync.
+    """
+    def __init__(self, db, num_perm=128, bands=16, threshold=0.7, collection='clause_digests',
+                 refresh_interval=30):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.db = db
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.collection = collection
+        self.refresh_interval = refresh_interval
+        self._buckets = {}      # band key -> set of contract ids
+        self._signatures = {}   # contract id -> signature
+        self._loaded_until = None
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+        # Held for a whole refresh, so concurrent lookups do not each reload
+        self._refresh_lock = threading.Lock()
+
+    def band_keys(self, signature):
+        return [f"{band}:{hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).hexdigest()}"
+                for band in range(self.bands)]
+
+    def find(self, clauses, version):
+        """
+        Closest previously analyzed contract sharing at least threshold of its
+        clauses with these, or None. Returns {"contract_id", "similarity",
+        "known"}; known maps clause fingerprint -> result and is only filled
+        when the match was scored with the same engine version.
+        """
+        signature = self.hasher.signature([clause_fingerprint(clause) for clause in clauses if clause.strip()])
+        if signature is None:
+            return None
+        self._refresh()
+        with self._lock:
+            candidates = set()
+            for key in self.band_keys(signature):
+                candidates.update(self._buckets.get(key, ()))
+            scored = [(self.hasher.similarity(signature, self._signatures[cid]), cid) for cid in candidates]
+        metrics.inc("near_duplicate_lookups")
+        if not scored:
+            return None
+        similarity, contract_id = max(scored)
+        if similarity < self.threshold:
+            return None
+
+        digest = self.get_digest(contract_id)
+        known = known_results(digest) if digest and digest.get('version') == version else {}
+        metrics.inc("near_duplicate_matches")
+        return {"contract_id": contract_id, "similarity": round(similarity, 3), "known": known}
+
+    def get_digest(self, contract_id):
+        """
+        The stored clause digest of a contract, or None.
+        """
+        try:
+            snapshot = self.db.collection(self.collection).document(contract_id).get()
+            return snapshot.to_dict() if snapshot.exists else None
+        except Exception as e:
+            logger.warning(f"Failed to load clause digest {contract_id}: {e}")
+            return None
+
+    def add(self, contract_id, clause_digest, version):
+        self.add_many([(contract_id, clause_digest, version)])
+
+    def add_many(self, items, batch_size=FIRESTORE_BATCH_LIMIT):
+        """
+        Indexes analyzed contracts. items: (contract_id, clause_digest, version)
+        where clause_digest is RiskEngine.analyze_contract(...)['clause_digest'].
+        """
+        now = datetime.now()
+        batch = self.db.batch()
+        pending = 0
+        try:
+            for contract_id, clause_digest, version in items:
+                signature = self.hasher.signature([c['fp'] for c in clause_digest])
+                if signature is None:
+                    continue
+                bands = self.band_keys(signature)
+                batch.set(self.db.collection(self.collection).document(contract_id), {
+                    "contract_id": contract_id,
+                    "version": version,
+                    "signature": signature.tolist(),
+                    "bands": bands,
+                    "clauses": clause_digest,
+                    "timestamp": now
+                })
+                self._insert(contract_id, signature, bands)
+                pending += 1
+                if pending == batch_size:
+                    batch.commit()
+                    batch = self.db.batch()
+                    pending = 0
+            if pending:
+                batch.commit()
+        except Exception as e:
+            logger.error(f"Failed to store clause digests: {e}")
+
+    def _insert(self, contract_id, signature, bands):
+        with self._lock:
+            if contract_id in self._signatures:
+                return
+            self._signatures[contract_id] = signature
+            for key in bands:
+                self._buckets.setdefault(key, set()).add(contract_id)
+
+    def load(self):
+        """
+        Loads digests written since the last refresh now, instead of on the
+        next lookup after refresh_interval.
+        """
+        self._refresh(force=True)
+
+    def _refresh(self, force=False):
+        """
+        Loads digests written since the last refresh (by this or another process).
+        Lookups arriving during a refresh wait for it instead of starting their own.
+        """
+        with self._refresh_lock:
+            if not force and time.monotonic() < self._next_refresh:
+                return
+            try:
+                query = self.db.collection(self.collection).select(["signature", "bands", "timestamp"])
+                if self._loaded_until is not None:
+                    query = query.where("timestamp", ">=", self._loaded_until)
+                for snapshot in query.order_by("timestamp").stream():
+                    data = snapshot.to_dict()
+                    self._insert(snapshot.id, np.array(data['signature'], dtype=np.uint32), data['bands'])
+                    self._loaded_until = data['timestamp']
+            except Exception as e:
+                logger.warning(f"Failed to refresh near-duplicate index: {e}")
+            self._next_refresh = time.monotonic() + self.refresh_interval
@@ -1,19 +1,85 @@
 import spacy
+import os
 import re
 import logging
+import threading
+from clause_segmenter import StructuralSegmenter
+from metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+# Components each operation actually needs; everything else is skipped per call.
+OPERATION_COMPONENTS = {
+    "segment": ("sentences",),
+    "entities": ("ner",),
+    # Also used by chunked entity extraction, which needs sentence boundaries to place the cuts
+    "process": ("sentences", "ner"),
+}
+# Not used by any operation, so not loaded unless full_pipeline=True.
+UNUSED_COMPONENTS = ("tagger", "attribute_ruler", "lemmatizer")
+SEGMENTERS = ("spacy", "structural")
+# Segmenter used by the app, the API and ingestion (see segment_document)
+SEGMENTER = os.environ.get("LEXIGUARD_SEGMENTER", "spacy")
+
 class NLPProcessor:
-    def __init__(self, model_name="en_core_web_sm"):
+    def __init__(self, model_name="en_core_web_sm", full_pipeline=False, segmenter=None, chunk_chars=100000):
+        """
+        segmenter: "spacy" (sentence boundaries) or "structural" (clause numbering
+        and headings, falling back to spaCy when the document has no structure);
+        defaults to LEXIGUARD_SEGMENTER.
+        chunk_chars: texts longer than this are processed in chunks (see iter_clauses).
+        """
+        segmenter = segmenter or SEGMENTER
+        if segmenter not in SEGMENTERS:
+            raise ValueError(f"Unknown segmenter: {segmenter}")
+        self.segmenter = segmenter
+        self.chunk_chars = chunk_chars
+        self.structural_segmenter = StructuralSegmenter()
+        # spaCy does not guarantee thread safety (the shared Vocab/StringStore is
+        # mutated while parsing), so calls into self.nlp are serialized per process.
+        # Scale across cores with worker processes (see gunicorn.conf.py).
+        self._lock = threading.RLock()
+        exclude = [] if full_pipeline else list(UNUSED_COMPONENTS)
         try:
-            self.nlp = spacy.load(model_name)
+            self.nlp = spacy.load(model_name, exclude=exclude)
         except OSError:
             logger.warning(f"spaCy model '{model_name}' not found. Attempting to download...")
             from spacy.cli import download
             download(model_name)
-            self.nlp = spacy.load(model_name)
-        
+            self.nlp = spacy.load(model_name, exclude=exclude)
+        # Chunks never exceed chunk_chars, so spaCy's own length guard can sit just above it
+        self.nlp.max_length = max(self.nlp.max_length, chunk_chars + 1)
+        self._configure_operations()
+
+    def _configure_operations(self):
+        """
+        Works out which pipeline components to disable for each operation.
+        Sentence boundaries come from the lightweight 'senter' when the model ships
+        one (it is disabled by default in en_core_web_sm), else the parser.
+        """
+        names = self.nlp.component_names
+        if "senter" in names:
+            if "senter" in self.nlp.disabled:
+                self.nlp.enable_pipe("senter")
+            sentence_component = "senter"
+        elif "parser" in names:
+            sentence_component = "parser"
+        else:
+            if "sentencizer" not in names:
+                self.nlp.add_pipe("sentencizer")
+            sentence_component = "sentencizer"
+
+        self._disabled = {}
+        for operation, needed in OPERATION_COMPONENTS.items():
+            needed = {sentence_component if c == "sentences" else c for c in needed}
+            # Keep shared embedding layers (e.g. tok2vec) that a needed component listens to
+            for name, pipe in self.nlp.pipeline:
+                listeners = getattr(pipe, "listening_components", None) or []
+                if needed.intersection(listeners):
+                    needed.add(name)
+            self._disabled[operation] = [name for name in self.nlp.pipe_names if name not in needed]
+
+
     def clean_text(self, text):
         """
         Cleans extracted text by removing excessive whitespace and artifacts.
@@ -24,23 +90,245 @@ class NLPProcessor:
         # text = re.sub(r'[^\w\s.,;:!?()"\'-]', '', text) 
         return text.strip()
 
+    def clean_stream(self, chunks):
+        """
+        Incremental clean_text over an iterable of text chunks (e.g. PDF pages).
+        Yields cleaned, non-empty pieces; join them with a single space.
+        """
+        for chunk in chunks:
+            cleaned = self.clean_text(chunk)
+            if cleaned:
+                yield cleaned
+
+    def segment_stream(self, chunks, buffer_chars=20000):
+        """
+        Incremental segment_clauses over an iterable of raw text chunks.
+        Text is buffered until buffer_chars, segmented, and every sentence except
+        the last (which may continue in the next chunk) is yielded.
+
+        A buffer without a sentence boundary is parsed again only once it has
+        doubled, and is cut at chunk_chars as in iter_clauses, so unpunctuated
+        text costs linear rather than quadratic time.
+        """
+        buffer = ""
+        threshold = buffer_chars
+        for piece in self.clean_stream(chunks):
+            buffer = f"{buffer} {piece}" if buffer else piece
+            if len(buffer) < threshold:
+                continue
+            if len(buffer) >= self.chunk_chars:
+                clauses = list(self.iter_clauses(buffer))
+                for _, _, clause in clauses[:-1]:
+                    yield clause
+                buffer = buffer[clauses[-1][0]:] if clauses else ""
+                threshold = buffer_chars
+                continue
+            with self._lock:
+                sents = list(self.nlp(buffer, disable=self._disabled["segment"]).sents)
+            if len(sents) < 2:
+                threshold = min(2 * len(buffer), self.chunk_chars)
+                continue
+            for sent in sents[:-1]:
+                clause = sent.text.strip()
+                if len(clause) > 10:
+                    yield clause
+            buffer = buffer[sents[-1].start_char:]
+            threshold = buffer_chars
+        if buffer:
+            yield from self.segment_clauses(buffer)
+
     def segment_clauses(self, text):
         """
         Segments text into clauses or sentences.
         For legal docs, often numbered lists or paragraphs are clauses.
         Here we use spaCy sentence segmentation as a baseline.
         """
-        doc = self.nlp(text)
-        clauses = [sent.text.strip() for sent in doc.sents if len(sent.text.strip()) > 10]
-        return clauses
+        if len(text) > self.chunk_chars:
+            return [clause for _, _, clause in self.iter_clauses(text)]
+        with metrics.span("segment"), self._lock:
+            doc = self.nlp(text, disable=self._disabled["segment"])
+        metrics.inc("nlp_docs", operation="segment")
+        return self._clauses(doc)
+
+    def segment_structure(self, raw_text):
+        """
+        Hierarchical clauses (see clause_segmenter.Clause) with character offsets
+        into raw_text. Pass the text *before* clean_text: it relies on line breaks.
+        """
+        return self.structural_segmenter.segment(raw_text)
+
+    def segment_document(self, raw_text):
+        """
+        Cleans and segments raw extracted text with the configured segmenter.
+        """
+        clauses = self._structural_clauses(raw_text)
+        if clauses is not None:
+            return clauses
+        with metrics.span("clean"):
+            clean_text = self.clean_text(raw_text)
+        return self.segment_clauses(clean_text)
+
+    def segment_documents(self, raw_texts, batch_size=32, n_process=1):
+        """
+        Bulk segment_document: one clause list per raw text, in order. The
+        texts that need spaCy go through a single segment_many pass.
+        """
+        results = []
+        piped = []
+        for raw_text in raw_texts:
+            clauses = self._structural_clauses(raw_text)
+            if clauses is None:
+                piped.append(len(results))
+                with metrics.span("clean"):
+                    clauses = self.clean_text(raw_text)
+            results.append(clauses)
+        for i, clauses in zip(piped, self.segment_many([results[i] for i in piped], batch_size, n_process)):
+            results[i] = clauses
+        return results
+
+    def _structural_clauses(self, raw_text):
+        """
+        Clause texts from the structural segmenter, or None when it is not the
+        configured segmenter or the text has too little numbering to use it.
+        """
+        if self.segmenter != "structural":
+            return None
+        with metrics.span("segment_structure"):
+            roots = self.segment_structure(raw_text)
+        if self.structural_segmenter.count_markers(roots) >= self.structural_segmenter.min_markers:
+            metrics.inc("nlp_docs", operation="segment_structure")
+            return self.structural_segmenter.flatten(roots)
+        logger.info("No clause numbering found; falling back to spaCy sentence segmentation.")
+        return None
 
     def extract_entities(self, text):
         """
         Extracts named entities (ORG, DATE, MONEY, GPE, etc.)
         """
-        doc = self.nlp(text)
-        entities = [(ent.text, ent.label_) for ent in doc.ents]
-        return entities
+        if len(text) > self.chunk_chars:
+            return [(ent_text, label) for _, _, ent_text, label in self.iter_entities(text)]
+        with metrics.span("entities"), self._lock:
+            doc = self.nlp(text, disable=self._disabled["entities"])
+        metrics.inc("nlp_docs", operation="entities")
+        return self._entities(doc)
+
+    def process(self, text):
+        """
+        Parses the text once and returns both clauses and entities:
+        {"clauses": [...], "entities": [(text, label)]}.
+        """
+        if len(text) > self.chunk_chars:
+            clauses, entities = [], []
+            for kind, start, end, *value in self._iter_chunked(text, "process"):
+                if kind == "clause":
+                    clauses.append(value[0])
+                else:
+                    entities.append(tuple(value))
+            return {"clauses": clauses, "entities": entities}
+        with metrics.span("process"), self._lock:
+            doc = self.nlp(text, disable=self._disabled["process"])
+        metrics.inc("nlp_docs", operation="process")
+        return {"clauses": self._clauses(doc), "entities": self._entities(doc)}
+
+    def segment_many(self, texts, batch_size=32, n_process=1):
+        """
+        Bulk segment_clauses built on nlp.pipe. Yields one clause list per
+        input text, in order. Texts longer than chunk_chars (which spaCy
+        would reject) are segmented in chunks instead, see iter_clauses.
+        """
+        return self._pipe(texts, "segment", self._clauses, self.segment_clauses, batch_size, n_process)
+
+    def process_many(self, texts, batch_size=32, n_process=1):
+        """
+        Bulk process built on nlp.pipe: one {"clauses", "entities"} dict per
+        input text, in order. Texts longer than chunk_chars are processed in chunks.
+        """
+        def extract(doc):
+            return {"clauses": self._clauses(doc), "entities": self._entities(doc)}
+        return self._pipe(texts, "process", extract, self.process, batch_size, n_process)
+
+    def _pipe(self, texts, operation, extract, chunked, batch_size, n_process):
+        texts = list(texts)
+        docs = self.nlp.pipe((text for text in texts if len(text) <= self.chunk_chars),
+                             disable=self._disabled[operation], batch_size=batch_size, n_process=n_process)
+        for text in texts:
+            if len(text) > self.chunk_chars:
+                yield chunked(text)
+                continue
+            # Hold the lock only while spaCy produces the next doc, so the
+            # consumer's own work between docs does not block other threads
+            with metrics.span(f"pipe_{operation}"), self._lock:
+                doc = next(docs)
+            metrics.inc("nlp_docs", operation=operation)
+            yield extract(doc)
+
+    def iter_clauses(self, text, chunk_chars=None):
+        """
+        Chunked segment_clauses for arbitrarily long texts: yields
+        (start, end, clause) with offsets into text. Only one chunk is parsed
+        at a time, so memory does not grow with the document.
+        """
+        for _, start, end, clause in self._iter_chunked(text, "segment", chunk_chars):
+            yield start, end, clause
+
+    def iter_entities(self, text, chunk_chars=None):
+        """
+        Chunked extract_entities: yields (start, end, text, label) with offsets into text.
+        """
+        for _, start, end, ent_text, label in self._iter_chunked(text, "entities", chunk_chars):
+            yield start, end, ent_text, label
+
+    def _iter_chunked(self, text, operation, chunk_chars=None):
+        """
+        Splits text into chunks of at most chunk_chars, cut at whitespace, and
+        parses them one by one. The last sentence of a chunk may be truncated,
+        so it is not emitted; the next chunk starts at that sentence, which is
+        the only overlap. Every clause and entity is therefore emitted exactly
+        once, with its offset in the full text.
+
+        operation: "segment" yields ("clause", start, end, text), "entities"
+        yields ("entity", start, end, text, label), "process" yields both.
+        """
+        chunk_chars = chunk_chars or self.chunk_chars
+        disable = self._disabled["process" if operation == "entities" else operation]
+        offset = 0
+        while offset < len(text):
+            end = min(offset + chunk_chars, len(text))
+            if end < len(text):
+                # Cut at whitespace so no word is split (unless the chunk has none)
+                space = text.rfind(" ", offset + chunk_chars // 2, end)
+                if space > offset:
+                    end = space
+            with metrics.span(f"chunk_{operation}"), self._lock:
+                doc = self.nlp(text[offset:end], disable=disable)
+            metrics.inc("nlp_chunks", operation=operation)
+
+            sents = list(doc.sents)
+            if end == len(text) or len(sents) < 2:
+                cut = end
+            else:
+                cut = offset + sents[-1].start_char
+
+            if operation != "entities":
+                for sent in sents:
+                    if offset + sent.start_char >= cut:
+                        break
+                    clause = sent.text.strip()
+                    if len(clause) > 10:
+                        start = offset + sent.start_char + (len(sent.text) - len(sent.text.lstrip()))
+                        yield "clause", start, start + len(clause), clause
+            if operation != "segment":
+                for ent in doc.ents:
+                    if offset + ent.start_char >= cut:
+                        break
+                    yield "entity", offset + ent.start_char, offset + ent.end_char, ent.text, ent.label_
+            offset = cut
+
+    def _clauses(self, doc):
+        return [sent.text.strip() for sent in doc.sents if len(sent.text.strip()) > 10]
+
+    def _entities(self, doc):
+        return [(ent.text, ent.label_) for ent in doc.ents]
 
 if __name__ == "__main__":
     # Test
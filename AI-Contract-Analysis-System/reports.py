@@ -0,0 +1,111 @@
+import argparse
+import logging
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import render_pdf_report
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPORT_CACHE_MB = int(os.environ.get("LEXIGUARD_REPORT_CACHE_MB", 64))
+
+class ReportCache:
+    """
+    LRU cache of rendered PDF reports, bounded by total size in bytes.
+    Keyed by contract hash and analysis version, so a repeat download is
+    served without re-rendering and a new model/keyword set renders afresh.
+    """
+    def __init__(self, max_bytes=DEFAULT_REPORT_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(contract, version):
+        identity = contract.get('analysis_key') or contract.get('hash') or contract.get('id')
+        return f"{identity}:{version}"
+
+    def get(self, key):
+        with self._lock:
+            report = self._entries.get(key)
+            if report is not None:
+                self._entries.move_to_end(key)
+            return report
+
+    def put(self, key, report):
+        if len(report) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = report
+            self.size += len(report)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+def _render_to_file(output_path, analysis_result):
+    """
+    Process-pool worker: renders one report and writes it to output_path.
+    """
+    report = render_pdf_report(analysis_result)
+    with open(output_path, "wb") as f:
+        f.write(report)
+    return output_path, len(report)
+
+def render_reports(items, output_dir, workers=None, max_in_flight=32):
+    """
+    Bulk mode: renders reports for many contracts in a process pool.
+
+    items: iterable of (name, analysis_result) with the risks included; it is
+    consumed lazily and at most max_in_flight contracts are pending at once,
+    so memory stays bounded however many contracts there are.
+    Yields (name, path, size) in input order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for name, analysis_result in items:
+            path = os.path.join(output_dir, f"report_{name}.pdf")
+            pending.append((name, executor.submit(_render_to_file, path, analysis_result)))
+            if len(pending) >= max_in_flight:
+                done_name, future = pending.popleft()
+                yield (done_name, *future.result())
+        while pending:
+            done_name, future = pending.popleft()
+            yield (done_name, *future.result())
+
+def main(argv=None):
+    from firebase_config import db
+    from contract_store import CONTRACTS, load_risks
+    from history_queries import DESCENDING
+
+    parser = argparse.ArgumentParser(description="Render PDF reports for stored contracts in bulk")
+    parser.add_argument("--output-dir", default="reports")
+    parser.add_argument("--workers", type=int, default=None, help="Render processes (default: CPU count)")
+    parser.add_argument("--limit", type=int, default=None, help="Only the newest N contracts")
+    args = parser.parse_args(argv)
+
+    query = db.collection(CONTRACTS).order_by("timestamp", direction=DESCENDING)
+    if args.limit:
+        query = query.limit(args.limit)
+
+    def contracts():
+        for snapshot in query.stream():
+            contract = snapshot.to_dict()
+            contract["risks"] = load_risks(db, snapshot.id, legacy=contract.get('risks'))
+            yield contract.get('hash') or snapshot.id, contract
+
+    count = 0
+    for name, path, size in render_reports(contracts(), args.output_dir, args.workers):
+        count += 1
+        logger.info(f"{name}: {path} ({size} bytes)")
+    print(f"Rendered {count} reports to {args.output_dir}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
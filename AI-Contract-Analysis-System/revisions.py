@@ -0,0 +1,76 @@
+import difflib
+import logging
+
+from near_duplicates import known_results
+
+logger = logging.getLogger(__name__)
+
+class RevisionError(Exception):
+    pass
+
+def analyze_revision(risk_engine, near_duplicates, base_contract, base_id, clauses):
+    """
+    Analyzes clauses as a revision of a stored contract.
+
+    The new clause list is diffed against the base contract's clause digest
+    (by fingerprint, with difflib). Unchanged clauses keep their stored
+    results and only inserted or modified clauses go through the RiskEngine,
+    so scoring cost follows the size of the redline. If the base was scored
+    with another engine version, every clause is scored again, but the diff
+    is still reported.
+
+    A base without a digest (stored before digests existed, or never given
+    one) cannot be diffed: every clause is scored and the delta only carries
+    the risk score change, with base_clauses_known False.
+
+    Returns (analysis_result, delta).
+    """
+    digest = near_duplicates.get_digest(base_id)
+    if digest is None:
+        logger.warning(f"No clause digest stored for contract {base_id}; analyzing the revision in full.")
+        digest = {}
+    base_clauses = digest.get('clauses', [])
+    same_version = digest.get('version') == risk_engine.version
+    if digest and not same_version:
+        logger.info(f"Contract {base_id} was analyzed with {digest.get('version')}; rescoring all clauses.")
+
+    analysis_result = risk_engine.analyze_contract(clauses, known_results=known_results(digest) if same_version else None)
+    scored = [clause for clause in clauses if clause.strip()]
+    new_clauses = analysis_result['clause_digest']
+
+    delta = {
+        "base_contract_id": base_id,
+        "base_risk_score": base_contract.get('risk_score'),
+        "risk_score_change": analysis_result['risk_score'] - base_contract.get('risk_score', 0),
+        "unchanged": 0,
+        "added": [],
+        "modified": [],
+        "removed": [],
+        "rescored": analysis_result['clause_cache']['misses'],
+        "base_clauses_known": bool(digest)
+    }
+    if not digest:
+        return analysis_result, delta
+    matcher = difflib.SequenceMatcher(None, [c['fp'] for c in base_clauses], [c['fp'] for c in new_clauses],
+                                      autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta["unchanged"] += i2 - i1
+            continue
+        # A replaced block pairs up old and new clauses; any surplus is a pure insert/delete
+        paired = min(i2 - i1, j2 - j1) if tag == "replace" else 0
+        for k in range(paired):
+            delta["modified"].append({
+                "position": j1 + k,
+                "clause": scored[j1 + k],
+                "before": _level(base_clauses[i1 + k]),
+                "after": _level(new_clauses[j1 + k])
+            })
+        for j in range(j1 + paired, j2):
+            delta["added"].append({"position": j, "clause": scored[j], **_level(new_clauses[j])})
+        for i in range(i1 + paired, i2):
+            delta["removed"].append({"position": i, **_level(base_clauses[i])})
+    return analysis_result, delta
+
+def _level(clause):
+    return {"level": clause['risk_level'], "score": clause['risk_score']}
@@ -1,109 +1,228 @@
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.pipeline import make_pipeline
+from keyword_matcher import KeywordMatcher
+from clause_cache import ClauseCache, clause_fingerprint
+from metrics import metrics
+import model_store
+import atexit
 import logging
-import pickle
 import os
 
 logger = logging.getLogger(__name__)
 
 class RiskEngine:
-    def __init__(self):
-        self.model = None
-        self.vectorizer = None
+    def __init__(self, model_path=None, clause_cache_size=50000, clause_cache_path=None):
+        self.model_path = model_path or model_store.DEFAULT_MODEL_PATH
         self.risky_keywords = {
             "High": ["indemnify", "liability", "termination", "arbitration", "liquidated damages", "exclusivity"],
             "Medium": ["confidentiality", "warranty", "jurisdiction", "governing law", "auto-renewal"],
             "Low": ["notice", "severability", "amendment", "waiver"]
         }
-        # Initialize with a dummy model or load existing
+        self.keyword_matcher = KeywordMatcher(self.risky_keywords)
+        # Fingerprint -> result memo for boilerplate clauses; optionally persisted across restarts
+        clause_cache_path = clause_cache_path or os.environ.get("LEXIGUARD_CLAUSE_CACHE")
+        self.clause_cache = ClauseCache(clause_cache_size, clause_cache_path)
+        if clause_cache_path:
+            atexit.register(self.clause_cache.save)
+        # Load the persisted model, or train the dummy model if none exists
         self._initialize_model()
 
     def _initialize_model(self):
         """
-        Initializes a basic ML model. In a real scenario, this would load a trained model.
-        Here we train on a small dummy dataset to ensure the system is 'working'.
+        Loads the persisted risk model artifact (see model_store.py).
+        Falls back to training on the dummy dataset when no artifact exists or
+        it cannot be loaded, and saves the result (replacing a broken artifact)
+        so the next process can just load it. Raises if no model can be built:
+        without one every clause without a keyword would score Low 0.0.
         """
+        header = self._load_artifact()
+        if header is None:
+            with model_store.training_lock(self.model_path):
+                # Another process may have written the artifact while this one waited
+                header = self._load_artifact()
+                if header is None:
+                    self.pipeline = model_store.train_pipeline()
+                    logger.info("Risk Model initialized and trained on dummy data.")
+                    try:
+                        header = model_store.save_model(self.pipeline, self.model_path)
+                    except Exception as e:
+                        logger.warning(f"Could not save model artifact to {self.model_path}: {e}")
+                        header = {"sha256": model_store.serialize(self.pipeline)[1]}
+        self.model_version = model_store.model_version(header["sha256"])
+
+    def _load_artifact(self):
+        """
+        Sets self.pipeline from the artifact and returns its header, or None
+        when there is no usable artifact.
+        """
+        if not os.path.exists(self.model_path):
+            return None
         try:
-            # Dummy dataset
-            data = [
-                ("The Provider shall indemnify the Client against all losses.", "High"),
-                ("Limitation of Liability: The Provider's liability shall not exceed $1000.", "High"),
-                ("This agreement may be terminated by either party with 30 days notice.", "High"),
-                ("Any dispute shall be resolved via arbitration in New York.", "High"),
-                ("Confidential Information shall not be disclosed to third parties.", "Medium"),
-                ("This agreement is governed by the laws of California.", "Medium"),
-                ("All notices must be in writing and sent via certified mail.", "Low"),
-                ("This contract is renewable automatically unless cancelled.", "Medium"),
-                ("The standard warranty period is 12 months.", "Medium"),
-                ("If any provision is found invalid, the rest remains in effect.", "Low")
-            ]
-            df = pd.DataFrame(data, columns=["text", "risk_level"])
-            
-            self.pipeline = make_pipeline(
-                TfidfVectorizer(stop_words='english'),
-                LogisticRegression()
-            )
-            self.pipeline.fit(df['text'], df['risk_level'])
-            logger.info("Risk Model initialized and trained on dummy data.")
+            self.pipeline, header = model_store.load_model(self.model_path)
         except Exception as e:
-            logger.error(f"Failed to initialize model: {e}")
-            self.pipeline = None
+            logger.error(f"Failed to load model artifact {self.model_path}: {e}")
+            return None
+        logger.info(f"Risk Model {model_store.model_version(header['sha256'])} loaded from {self.model_path}.")
+        return header
+
+    @property
+    def version(self):
+        """
+        Identifies the model + keyword configuration; part of every analysis cache key.
+        """
+        return f"{self.model_version}-{self.keyword_matcher.fingerprint()}"
+
+    def set_keywords(self, keywords_by_level):
+        """
+        Replaces the risk keywords, e.g. from the admin 'Manage Risk Keywords' page.
+        """
+        self.risky_keywords = {level: list(kws) for level, kws in keywords_by_level.items()}
+        self.keyword_matcher.set_keywords(self.risky_keywords)
+
+    def add_keyword(self, keyword, level):
+        keyword = keyword.strip().lower()
+        self.remove_keyword(keyword)
+        self.risky_keywords.setdefault(level, []).append(keyword)
+        self.keyword_matcher.add_keyword(keyword, level)
+
+    def remove_keyword(self, keyword):
+        keyword = keyword.strip().lower()
+        for kws in self.risky_keywords.values():
+            if keyword in kws:
+                kws.remove(keyword)
+        return self.keyword_matcher.remove_keyword(keyword)
+
+    def _keyword_risk(self, clause_text):
+        """
+        Keyword heuristic. Returns (level, score, explanation) or None.
+        """
+        match = self.keyword_matcher.best_match(clause_text)
+        if match is None:
+            return None
+        if match.level == "High": score = 0.9
+        elif match.level == "Medium": score = 0.6
+        else: score = 0.3
+        return match.level, score, f"Contains high-risk keyword: '{match.keyword}'"
 
     def analyze_clause_risk(self, clause_text):
         """
         Analyzes a single clause and returns risk level and score.
         Uses Hybrid approach: Keyword match + ML prediction.
         """
-        risk_level = "Low"
-        explanation = "Standard clause."
-        score = 0.0
+        return self.analyze_clauses([clause_text])[0]
+
+    def analyze_clauses(self, clauses):
+        """
+        Scores a list of clauses in one pass.
+        """
+        return self._score_clauses(clauses)[0]
+
+    def _score_clauses(self, clauses, known=None):
+        """
+        Returns (results, cached, fingerprints) where cached[i] says whether
+        clause i was reused rather than scored. Clauses seen before come from
+        known (fingerprint -> result, e.g. from a near-duplicate contract scored
+        with this same version) or the clause cache; for the rest, keyword hits
+        are resolved first and the remaining clauses are vectorized into a
+        single sparse matrix and scored with one predict_proba call.
+        """
+        self.clause_cache.ensure_version(self.version)
+        fingerprints = [clause_fingerprint(clause_text) for clause_text in clauses]
+        results = [None] * len(clauses)
+        keyword_indices = []
+        ml_indices = []
+
+        # 0. Known results, then the clause cache (boilerplate seen in earlier contracts)
+        for i, fingerprint in enumerate(fingerprints):
+            cached = known.get(fingerprint) if known else None
+            if cached is None:
+                cached = self.clause_cache.get(fingerprint)
+            if cached is not None:
+                results[i] = dict(cached)
+        cached_flags = [result is not None for result in results]
+        hits = sum(cached_flags)
+        metrics.inc("clauses_scored", len(clauses))
+        metrics.inc("cache_hits", hits, cache="clause")
+        metrics.inc("cache_misses", len(clauses) - hits, cache="clause")
 
         # 1. Keyword Heuristic (Override)
-        text_lower = clause_text.lower()
-        for level, keywords in self.risky_keywords.items():
-            for kw in keywords:
-                if kw in text_lower:
-                    risk_level = level
-                    explanation = f"Contains high-risk keyword: '{kw}'"
-                    if level == "High": score = 0.9
-                    elif level == "Medium": score = 0.6
-                    else: score = 0.3
-                    break
-            if score > 0: break
-
-        # 2. ML Prediction (Refinement)
-        if self.pipeline:
+        for i, clause_text in enumerate(clauses):
+            if results[i] is not None:
+                continue
+            hit = self._keyword_risk(clause_text)
+            if hit:
+                level, score, explanation = hit
+                keyword_indices.append(i)
+            else:
+                level, score, explanation = "Low", 0.0, "Standard clause."
+                ml_indices.append(i)
+            results[i] = {
+                "risk_level": level,
+                "risk_score": float(score),
+                "explanation": explanation
+            }
+        computed = keyword_indices
+        metrics.inc("keyword_hits", len(keyword_indices))
+
+        # 2. ML Prediction (Refinement) for clauses the keywords didn't catch
+        if ml_indices:
             try:
-                ml_pred = self.pipeline.predict([clause_text])[0]
-                ml_proba = self.pipeline.predict_proba([clause_text]).max()
-                
-                # If keyword didn't catch it but ML did
-                if score == 0:
-                    risk_level = ml_pred
-                    score = ml_proba
-                    explanation = f"ML Model detected pattern similar to {risk_level} risk."
+                with metrics.span("risk_model"):
+                    proba = self.pipeline.predict_proba([clauses[i] for i in ml_indices])
+                metrics.inc("model_calls")
+                metrics.inc("model_clauses", len(ml_indices))
+                classes = self.pipeline.classes_
+                best = proba.argmax(axis=1)
+                for row, i in enumerate(ml_indices):
+                    risk_level = str(classes[best[row]])
+                    results[i] = {
+                        "risk_level": risk_level,
+                        "risk_score": float(proba[row, best[row]]),
+                        "explanation": f"ML Model detected pattern similar to {risk_level} risk."
+                    }
+                computed = keyword_indices + ml_indices
             except Exception as e:
                 logger.warning(f"ML prediction failed: {e}")
 
-        return {
-            "risk_level": risk_level,
-            "risk_score": float(score),
-            "explanation": explanation
-        }
+        for i in computed:
+            self.clause_cache.put(fingerprints[i], dict(results[i]))
 
-    def analyze_contract(self, clauses):
+        return results, cached_flags, fingerprints
+
+    def analyze_contract(self, clauses, known_results=None):
         """
         Analyzes list of clauses and aggregates risk.
+        known_results: optional fingerprint -> result map of clauses that need no
+        scoring (see near_duplicates.NearDuplicateIndex).
+        """
+        with metrics.span("analyze"):
+            scored = [clause for clause in clauses if clause.strip()]
+            analyses, cached, fingerprints = self._score_clauses(scored, known_results)
+            return self._aggregate(clauses, scored, analyses, sum(cached), fingerprints)
+
+    def analyze_contracts(self, clause_lists, known_results=None):
+        """
+        Batch version of analyze_contract: the clauses of every contract go
+        through one _score_clauses call (one predict_proba for all cache misses).
         """
+        scored_lists = [[clause for clause in clauses if clause.strip()] for clauses in clause_lists]
+        flat = [clause for scored in scored_lists for clause in scored]
+        with metrics.span("analyze_batch"):
+            analyses, cached, fingerprints = self._score_clauses(flat, known_results)
+
+        results = []
+        offset = 0
+        for clauses, scored in zip(clause_lists, scored_lists):
+            end = offset + len(scored)
+            results.append(self._aggregate(clauses, scored, analyses[offset:end], sum(cached[offset:end]),
+                                           fingerprints[offset:end]))
+            offset = end
+        return results
+
+    def _aggregate(self, clauses, scored, analyses, cache_hits, fingerprints):
         results = []
         high_risk_count = 0
         total_score = 0
-        
-        for clause in clauses:
-            if not clause.strip(): continue
-            analysis = self.analyze_clause_risk(clause)
+
+        for clause, analysis in zip(scored, analyses):
             if analysis['risk_level'] == 'High':
                 high_risk_count += 1
             if analysis['risk_level'] != 'Low': # Only report relevant risks
@@ -122,5 +241,12 @@ class RiskEngine:
         return {
             "risks": results,
             "risk_score": overall_score,
-            "summary": f"Found {high_risk_count} high-risk clauses."
+            "summary": f"Found {high_risk_count} high-risk clauses.",
+            # Per-clause results without the text, for near-duplicate reuse
+            "clause_digest": [{"fp": fp, **analysis} for fp, analysis in zip(fingerprints, analyses)],
+            "clause_cache": {
+                "hits": cache_hits,
+                "misses": len(scored) - cache_hits,
+                "hit_rate": cache_hits / len(scored) if scored else 0.0
+            }
         }
@@ -0,0 +1,136 @@
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# "eager": load models while importing the app (needed for gunicorn preload).
+# "lazy": import fast and load models in a background warm-up thread.
+STARTUP_MODE = os.environ.get("LEXIGUARD_STARTUP", "eager")
+
+class Warmup:
+    """
+    Runs factory (the slow part of startup: heavy imports, model loading)
+    once, in a background thread after start() or inline on the first wait().
+    Indexing (warmup["nlp"]) waits for it and looks the key up in the
+    factory's result, so a dict of components can be used as before.
+    """
+    def __init__(self, factory, name="components"):
+        self.factory = factory
+        self.name = name
+        self.result = None
+        self.error = None
+        self.seconds = None
+        self._started = False
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._done.is_set() and self.error is None
+
+    def status(self):
+        if not self._done.is_set():
+            return "loading" if self._started else "not started"
+        return "failed" if self.error is not None else "ready"
+
+    def start(self):
+        """
+        Starts the warm-up thread (once). Returns self.
+        """
+        with self._lock:
+            if not self._started:
+                self._started = True
+                threading.Thread(target=self._run, name=f"warmup-{self.name}", daemon=True).start()
+        return self
+
+    def wait(self, timeout=None):
+        """
+        The factory's result; runs it in the calling thread if nothing started
+        it yet. Raises the factory's exception if it failed, TimeoutError if
+        it is still running after timeout seconds.
+        """
+        with self._lock:
+            inline = not self._started
+            self._started = True
+        if inline:
+            self._run()
+        elif not self._done.wait(timeout):
+            raise TimeoutError(f"{self.name} are still loading")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def __getitem__(self, key):
+        return self.wait()[key]
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            self.result = self.factory()
+        except Exception as e:
+            logger.error(f"Failed to load {self.name}: {e}")
+            self.error = e
+        finally:
+            self.seconds = time.perf_counter() - started
+            metrics.observe("warmup_seconds", self.seconds, help="Time to load models and components at startup.",
+                            component=self.name)
+            logger.info(f"Loaded {self.name} in {self.seconds:.2f}s")
+            self._done.set()
+
+def profile_imports(module, python=sys.executable):
+    """
+    Imports module in a fresh interpreter with -X importtime and returns
+    (total_seconds, [(seconds, package)]): the import time spent in each
+    top-level package (sum of its modules' own time), slowest first. The
+    module-level code of module itself, e.g. model loading in eager mode,
+    counts towards module.
+    """
+    started = time.perf_counter()
+    completed = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"], capture_output=True,
+                               text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    total = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {completed.stderr.strip().splitlines()[-1:]}")
+    packages = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(own) / 1e6
+    return total, sorted(((seconds, name) for name, seconds in packages.items()), reverse=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time profile of the LexiGuard entry points")
+    parser.add_argument("modules", nargs="*", default=["api"], help="Modules to import (default: api)")
+    parser.add_argument("--mode", choices=["eager", "lazy"], default="lazy", help="LEXIGUARD_STARTUP for the import")
+    parser.add_argument("--top", type=int, default=15, help="Slowest packages to list")
+    parser.add_argument("--output", default=None, help="Write the results as JSON")
+    args = parser.parse_args(argv)
+
+    os.environ["LEXIGUARD_STARTUP"] = args.mode
+    results = {}
+    for module in args.modules:
+        total, packages = profile_imports(module)
+        results[module] = {"mode": args.mode, "total_seconds": round(total, 3),
+                           "packages": [{"name": name, "seconds": round(seconds, 3)} for seconds, name in packages]}
+        print(f"import {module} ({args.mode}): {total:.2f}s wall, including interpreter start")
+        for seconds, name in packages[:args.top]:
+            print(f"  {seconds * 1000:9.1f} ms  {name}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import os
+import sys
+
+import pytest
+import spacy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import model_store
+from mock_firestore import MockFirestore
+
+def _blank_pipeline(name, **kwargs):
+    # en_core_web_sm is not needed for the tests: a blank English pipeline gets
+    # a sentencizer from NLPProcessor, which is all segmentation uses
+    return spacy.blank("en")
+
+@pytest.fixture(autouse=True, scope="session")
+def blank_spacy():
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(spacy, "load", _blank_pipeline)
+        yield
+
+@pytest.fixture(scope="session")
+def model_path(tmp_path_factory):
+    """
+    One trained risk model artifact shared by the whole session.
+    """
+    path = str(tmp_path_factory.mktemp("models") / "risk_model.pkl")
+    model_store.save_model(model_store.train_pipeline(), path)
+    return path
+
+@pytest.fixture
+def db(monkeypatch):
+    import history_queries
+    # Cached history pages belong to the previous test's store
+    monkeypatch.setattr(history_queries, "page_cache", history_queries.PageCache())
+    return MockFirestore()
+
+@pytest.fixture
+def risk_engine(model_path):
+    from risk_engine import RiskEngine
+    return RiskEngine(model_path=model_path)
+
+@pytest.fixture
+def nlp():
+    from nlp_processor import NLPProcessor
+    return NLPProcessor()
+
+@pytest.fixture(scope="session")
+def api_module(model_path):
+    """
+    api.py, imported once (it loads the models at import) with the session's model artifact.
+    """
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(model_store, "DEFAULT_MODEL_PATH", model_path)
+        import api
+    return api
+
+@pytest.fixture
+def api(api_module, db, monkeypatch):
+    """
+    api.py backed by this test's MockFirestore, with empty caches and indexes
+    (not loaded yet: api.indexes is not started).
+    """
+    import firebase_config
+    from analysis_cache import AnalysisCache
+    from clause_index import ClauseIndex
+    from near_duplicates import NearDuplicateIndex
+    from reports import ReportCache
+    from startup import Warmup
+
+    monkeypatch.setattr(firebase_config.db, "_client", db)
+    monkeypatch.setattr(api_module, "analysis_cache", AnalysisCache(api_module.db))
+    monkeypatch.setattr(api_module, "report_cache", ReportCache())
+    monkeypatch.setattr(api_module, "near_duplicates", NearDuplicateIndex(api_module.db))
+    monkeypatch.setattr(api_module, "clause_index", ClauseIndex(api_module.db))
+    monkeypatch.setattr(api_module, "indexes", Warmup(api_module.load_indexes, name="indexes"))
+    return api_module
+
+@pytest.fixture
+def client(api):
+    return api.app.test_client()
@@ -0,0 +1,79 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from analysis_cache import AnalysisCache
+
+RESULT = {"contract_id": "c1", "risk_score": 40, "summary": "1 risk"}
+
+def test_key_ignores_whitespace_but_not_version():
+    key = AnalysisCache.make_key("The Supplier  shall\ndeliver.", "v1/spacy")
+    assert key == AnalysisCache.make_key(" The Supplier shall\ndeliver. ", "v1/spacy")
+    assert key != AnalysisCache.make_key("The Supplier shall deliver.", "v2/spacy")
+
+def test_memory_tier_is_lru_bounded(db):
+    cache = AnalysisCache(db, max_entries=2)
+    for key in "abc":
+        cache.put(key, {**RESULT, "contract_id": key})
+    assert cache.stats()["entries"] == 2
+    assert cache.get("a")["contract_id"] == "a"
+    assert cache.stats()["store_hits"] == 1
+    assert cache.get("c")["contract_id"] == "c"
+    assert cache.stats()["memory_hits"] == 1
+
+def test_store_hits_survive_a_restart(db):
+    AnalysisCache(db).put_many([("a", RESULT), ("b", {**RESULT, "contract_id": "c2"})], batch_size=1)
+    restarted = AnalysisCache(db)
+    assert restarted.get("b") == {**RESULT, "contract_id": "c2"}
+    assert restarted.get("missing") is None
+    assert restarted.stats()["hit_rate"] == 0.5
+
+def test_memory_entries_expire(db):
+    cache = AnalysisCache(db, ttl=-1)
+    cache.put("a", RESULT)
+    db.collection("analysis_cache").document("a").delete()
+    assert cache.get("a") is None
+
+def test_store_entries_expire_and_are_deleted(db):
+    cache = AnalysisCache(db, store_ttl=-1)
+    cache.put("a", RESULT)
+    stored = db.collection("analysis_cache").document("a").get().to_dict()
+    assert stored["expires_at"] < datetime.now(timezone.utc)
+    cache.invalidate()
+    assert cache.get("a") is None
+    assert not db.collection("analysis_cache").document("a").get().exists
+
+def test_entries_without_expiry_are_still_served(db):
+    db.collection("analysis_cache").document("a").set(RESULT)
+    assert AnalysisCache(db).get("a") == RESULT
+
+def test_store_entries_expire_after_store_ttl(db):
+    cache = AnalysisCache(db, store_ttl=3600)
+    cache.put("a", RESULT)
+    expires_at = db.collection("analysis_cache").document("a").get().to_dict()["expires_at"]
+    assert expires_at.tzinfo is not None
+    assert timedelta(minutes=59) < expires_at - datetime.now(timezone.utc) <= timedelta(hours=1)
+
+@pytest.fixture
+def west_of_utc(monkeypatch):
+    monkeypatch.setenv("TZ", "America/Los_Angeles")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+def test_expiry_survives_a_firestore_round_trip(db, west_of_utc):
+    AnalysisCache(db, store_ttl=3600).put("a", RESULT)
+    # Firestore stores naive datetimes as UTC and returns them tz-aware
+    ref = db.collection("analysis_cache").document("a")
+    stored = ref.get().to_dict()
+    if stored["expires_at"].tzinfo is None:
+        stored["expires_at"] = stored["expires_at"].replace(tzinfo=timezone.utc)
+    ref.set(stored)
+    assert AnalysisCache(db).get("a") == RESULT
+
+def test_naive_expiry_is_read_as_utc(db, west_of_utc):
+    expires_at = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+    db.collection("analysis_cache").document("a").set({**RESULT, "expires_at": expires_at})
+    assert AnalysisCache(db).get("a") == RESULT
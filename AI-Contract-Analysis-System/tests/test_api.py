@@ -0,0 +1,57 @@
+import json
+
+CONTRACT = ("The Provider shall indemnify the Client against all losses. "
+            "All notices must be in writing and sent via certified mail. "
+            "This agreement is governed by the laws of California.")
+OTHER = ("Either party may terminate this agreement with thirty days notice. "
+         "The Supplier shall deliver the goods within thirty days.")
+
+def _lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def test_batch_results_in_input_order(client):
+    response = client.post("/analyze/batch", json=[
+        {"text": CONTRACT, "filename": "a.txt"},
+        {"filename": "missing.txt"},
+        {"text": OTHER},
+        {"text": CONTRACT},
+    ])
+    assert response.mimetype == "application/x-ndjson"
+    results = _lines(response)
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert [r["success"] for r in results] == [True, False, True, True]
+    assert results[1]["error"] == "No text provided"
+    # The repeated document is analyzed and stored once
+    assert results[3]["id"] == results[0]["id"] and results[3]["cached"]
+    assert results[0]["details"][0]["clause"] == "The Provider shall indemnify the Client against all losses."
+
+def test_batch_accepts_ndjson(client):
+    body = "\n".join([json.dumps({"text": CONTRACT}), "not json", "", json.dumps({"text": OTHER})])
+    results = _lines(client.post("/analyze/batch", data=body, content_type="application/x-ndjson"))
+    assert [r["success"] for r in results] == [True, False, True]
+    assert results[1]["error"].startswith("Invalid JSON line")
+
+def test_batch_rejects_other_bodies(client):
+    assert client.post("/analyze/batch", json={"text": CONTRACT}).status_code == 400
+
+def test_batch_reuses_the_analysis_cache(client):
+    first = _lines(client.post("/analyze/batch", json=[{"text": CONTRACT}]))[0]
+    again = _lines(client.post("/analyze/batch", json=[{"text": "  " + CONTRACT.replace(" ", "\n", 3)}]))[0]
+    assert again["cached"] and again["id"] == first["id"]
+    assert [risk["clause"] for risk in again["details"]] == [risk["clause"] for risk in first["details"]]
+
+def test_batch_segments_documents_longer_than_a_chunk(api, client, monkeypatch):
+    [single] = _lines(client.post("/analyze/batch", json=[{"text": CONTRACT}]))
+    # spaCy rejects (E088) anything above max_length, which sits just above chunk_chars
+    monkeypatch.setattr(api.nlp, "chunk_chars", 150)
+    monkeypatch.setattr(api.nlp.nlp, "max_length", 151)
+    [result] = _lines(client.post("/analyze/batch", json=[{"text": " ".join([CONTRACT] * 20)}]))
+    assert result["success"]
+    assert [risk["clause"] for risk in result["details"]] == [risk["clause"] for risk in single["details"]] * 20
+
+def test_contracts_record_their_analysis_key(api, client, db):
+    result = client.post("/analyze", json={"text": CONTRACT}).get_json()
+    contract = db.collection("contracts").document(result["id"]).get().to_dict()
+    version = f"{api.risk_engine.version}/{api.nlp.segmenter}"
+    assert contract["analysis_key"] == api.AnalysisCache.make_key(CONTRACT, version)
+    assert "content_hash" not in contract
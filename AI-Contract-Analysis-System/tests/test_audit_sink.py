@@ -0,0 +1,89 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from audit_sink import AuditSink
+
+class FailingBatch:
+    def set(self, ref, data):
+        pass
+
+    def commit(self):
+        raise ConnectionError("store unreachable")
+
+@pytest.fixture
+def spill(tmp_path):
+    return str(tmp_path / "audit_spill.jsonl")
+
+def _actions(db):
+    return sorted(doc.to_dict()["action"] for doc in db.collection("audit_logs").stream())
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+def test_events_are_written_in_batches(db, spill):
+    sink = AuditSink(db, batch_size=2, flush_interval=0.1, spill_path=spill)
+    for n in range(5):
+        sink.log("user", f"action-{n}", "")
+    sink.close()
+    assert _actions(db) == [f"action-{n}" for n in range(5)]
+
+def test_failed_writes_are_spilled_per_process_and_replayed(db, spill, monkeypatch):
+    sink = AuditSink(db, flush_interval=0.1, spill_path=spill)
+    with monkeypatch.context() as m:
+        m.setattr(db, "batch", FailingBatch)
+        sink.log("user", "upload", "a.pdf")
+        sink.flush()
+    assert os.path.exists(f"{spill}.{os.getpid()}")
+    assert not os.path.exists(spill)
+    assert _actions(db) == []
+    sink.log("user", "analyze", "a.pdf")
+    sink.close()
+    assert _actions(db) == ["analyze", "upload"]
+    assert os.listdir(os.path.dirname(spill)) == []
+
+def test_corrupt_spill_lines_are_skipped(db, spill):
+    event = json.dumps({"user": "u", "action": "kept", "details": "", "timestamp": {"$dt": "2024-01-01T00:00:00"}})
+    with open(f"{spill}.{os.getpid()}", "w") as f:
+        f.write(event + "\n{not json\n" + event[:20])
+    sink = AuditSink(db, spill_path=spill)
+    sink.flush()
+    assert _actions(db) == ["kept"]
+    assert os.listdir(os.path.dirname(spill)) == []
+
+def test_spills_of_dead_processes_are_adopted(db, spill):
+    event = json.dumps({"user": "u", "action": "orphan", "details": "", "timestamp": {"$dt": "2024-01-01T00:00:00"}})
+    dead = _dead_pid()
+    for path in (f"{spill}.{dead}", f"{spill}.{dead}.replay", spill):
+        with open(path, "w") as f:
+            f.write(event + "\n")
+    # A live process's spill is not touched
+    live = f"{spill}.{os.getppid()}"
+    with open(live, "w") as f:
+        f.write(event + "\n")
+    AuditSink(db, spill_path=spill).flush()
+    assert _actions(db) == ["orphan"] * 3
+    assert os.listdir(os.path.dirname(spill)) == [os.path.basename(live)]
+
+def test_sink_thread_survives_errors(db, spill, monkeypatch):
+    sink = AuditSink(db, batch_size=1, flush_interval=0.05, spill_path=spill)
+    calls = []
+    def broken_replay():
+        calls.append(1)
+        raise FileNotFoundError("replay file vanished")
+    monkeypatch.setattr(sink, "_replay_spill", broken_replay)
+    sink.log("user", "first", "")
+    sink.log("user", "second", "")
+    deadline = time.monotonic() + 5
+    while len(calls) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(calls) == 2 and sink._thread.is_alive()
+    monkeypatch.setattr(sink, "_replay_spill", lambda: None)
+    sink.close()
+    assert _actions(db) == ["first", "second"]
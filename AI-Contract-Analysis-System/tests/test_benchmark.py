@@ -0,0 +1,67 @@
+import json
+import os
+import random
+
+import pytest
+
+import benchmark
+import model_store
+
+@pytest.fixture
+def default_model(model_path, monkeypatch):
+    monkeypatch.setattr(model_store, "DEFAULT_MODEL_PATH", model_path)
+
+def test_corpus_is_reproducible_and_parseable(tmp_path):
+    first = benchmark.generate_corpus(str(tmp_path / "a"), 3, 4, seed=5)
+    second = benchmark.generate_corpus(str(tmp_path / "b"), 3, 4, seed=5)
+    assert [os.path.basename(p) for p in first] == ["contract_0000.pdf", "contract_0001.docx", "contract_0002.pdf"]
+    from contract_parser import ContractParser
+    parser = ContractParser()
+    assert [parser.parse_file(p) for p in first] == [parser.parse_file(p) for p in second]
+    assert "MASTER SERVICES AGREEMENT 2" in parser.parse_file(first[1])
+    assert benchmark.make_clauses(random.Random(1), 3) == benchmark.make_clauses(random.Random(1), 3)
+
+def test_percentile():
+    assert benchmark.percentile([], 50) == 0.0
+    assert benchmark.percentile([4, 1, 3, 2], 50) == 2.5
+    assert benchmark.percentile([1, 2, 3], 100) == 3
+
+def test_every_stage_is_timed(tmp_path, default_model):
+    paths = benchmark.generate_corpus(str(tmp_path), 2, 5)
+    bench = benchmark.PipelineBenchmark()
+    bench.run_document(paths[0], record=False)
+    for path in paths:
+        bench.run_document(path)
+    results = bench.results()
+    assert [results["stages"][stage]["count"] for stage in benchmark.STAGES] == [2] * len(benchmark.STAGES)
+    assert results["end_to_end"]["docs"] == 2
+    assert bench.clauses_scored > 0
+    # Every run was persisted, warm-up included
+    assert len(bench.db.collection("contracts").get()) == 3
+
+def _results(p50, p99, rss=100):
+    stage = {"p50_ms": p50, "p99_ms": p99}
+    return {"stages": {name: stage for name in benchmark.STAGES}, "end_to_end": stage, "peak_rss_mb": rss}
+
+def test_compare_flags_slowdowns_above_the_threshold():
+    rows, regressions = benchmark.compare(_results(10.5, 20), _results(10, 20), threshold=0.10)
+    assert len(rows) == 2 * (len(benchmark.STAGES) + 1) + 1 and regressions == []
+    rows, regressions = benchmark.compare(_results(10, 30, rss=150), _results(10, 20), threshold=0.10)
+    assert {(name, metric) for name, metric, *_ in regressions} == \
+        {(name, "p99_ms") for name in benchmark.STAGES + ("end_to_end",)} | {("process", "peak_rss_mb")}
+
+def test_main_writes_and_compares_baselines(tmp_path, default_model, capsys):
+    output = str(tmp_path / "baseline.json")
+    args = ["--docs", "2", "--clauses", "3", "--warmup", "0", "--output", output]
+    assert benchmark.main(args) == 0
+    with open(output) as f:
+        baseline = json.load(f)
+    assert baseline["config"]["segmenter"] == "spacy"
+    # A baseline ten times faster than this run is a regression
+    for stats in list(baseline["stages"].values()) + [baseline["end_to_end"]]:
+        stats["p50_ms"] /= 10
+        stats["p99_ms"] /= 10
+    with open(output, "w") as f:
+        json.dump(baseline, f)
+    assert benchmark.main(args[:-2] + ["--compare", output]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
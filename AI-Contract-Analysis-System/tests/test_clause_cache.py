@@ -0,0 +1,56 @@
+from clause_cache import ClauseCache, clause_fingerprint
+
+LOW = {"risk_level": "Low", "risk_score": 0.2, "explanation": "Standard clause."}
+
+def test_fingerprint_ignores_case_and_whitespace():
+    assert clause_fingerprint("The Supplier  shall\ndeliver.") == clause_fingerprint("the supplier shall deliver.")
+    assert clause_fingerprint("The Supplier shall deliver.") != clause_fingerprint("The Supplier may deliver.")
+
+def test_lru_eviction():
+    cache = ClauseCache(max_entries=2)
+    cache.put("a", LOW)
+    cache.put("b", LOW)
+    cache.get("a")
+    cache.put("c", LOW)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == LOW
+
+def test_new_version_empties_the_cache():
+    cache = ClauseCache()
+    cache.ensure_version("v1")
+    cache.put("a", LOW)
+    cache.ensure_version("v1")
+    assert cache.get("a") == LOW
+    cache.ensure_version("v2")
+    assert cache.get("a") is None and cache.version == "v2"
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "cache" / "clauses.pkl")
+    cache = ClauseCache(path=path)
+    cache.ensure_version("v1")
+    for key in "abc":
+        cache.put(key, {**LOW, "risk_score": ord(key)})
+    cache.save()
+    # Loading into a smaller cache keeps the most recently used entries
+    restored = ClauseCache(max_entries=2, path=path)
+    assert restored.version == "v1"
+    assert restored.get("a") is None
+    assert restored.get("c")["risk_score"] == ord("c")
+
+def test_unreadable_file_is_ignored(tmp_path):
+    path = tmp_path / "clauses.pkl"
+    path.write_bytes(b"not a pickle")
+    cache = ClauseCache(path=str(path))
+    assert len(cache) == 0 and cache.version is None
+
+def test_engine_reuses_clause_results_across_contracts(risk_engine):
+    clauses = ["Payment is due within thirty days of the invoice.", "The Supplier shall deliver the goods."]
+    first = risk_engine.analyze_contract(clauses)
+    second = risk_engine.analyze_contract(list(reversed(clauses)) + ["This Agreement may be amended in writing."])
+    assert first["clause_cache"]["hits"] == 0
+    assert second["clause_cache"]["hits"] == 2
+    assert second["clause_cache"]["misses"] == 1
+    # Cached results are copies: callers may annotate them
+    first["risks"][0]["clause"] = "changed"
+    assert "clause" not in risk_engine.clause_cache.get(clause_fingerprint(clauses[0]))
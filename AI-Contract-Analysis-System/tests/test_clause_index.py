@@ -0,0 +1,140 @@
+import random
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from clause_index import ClauseIndex
+from contract_store import save_contract
+from startup import Warmup
+
+PARTIES = ["supplier", "buyer", "licensee", "licensor", "contractor", "client", "tenant", "landlord"]
+VERBS = ["shall indemnify", "may terminate", "shall pay", "must notify", "shall not assign", "shall maintain",
+         "may audit", "shall deliver"]
+OBJECTS = ["all losses", "the agreement", "the invoices", "any claims", "the premises", "confidential information",
+           "the goods", "insurance coverage", "the software", "third party rights"]
+TAILS = ["within thirty days", "without prior written consent", "at its own cost", "upon written notice",
+         "in accordance with applicable law", "for any reason", "during the term", "after termination"]
+
+def _clause(rng):
+    return (f"The {rng.choice(PARTIES)} {rng.choice(VERBS)} the {rng.choice(PARTIES)} for {rng.choice(OBJECTS)} "
+            f"{rng.choice(TAILS)} and {rng.choice(OBJECTS)} {rng.choice(TAILS)}.")
+
+def _store(db, contract, clauses, minute=0):
+    return save_contract(db, {"filename": f"{contract}.txt", "timestamp": datetime(2024, 1, 1) + timedelta(minutes=minute)},
+                         [{"clause": clause, "level": "High", "score": 0.9, "type": "ML", "explanation": "test"}
+                          for clause in clauses])
+
+def _keys(matches):
+    return [(match["contract_id"], match["position"]) for match in matches]
+
+@pytest.fixture
+def corpus(db):
+    """
+    300 clauses in 30 contracts, all built from the same small vocabulary.
+    """
+    rng = random.Random(7)
+    for contract in range(30):
+        _store(db, contract, [_clause(rng) for _ in range(10)], minute=contract)
+    return rng
+
+def test_exact_mode_ranks_by_cosine_similarity(db):
+    first = _store(db, "a", ["The supplier shall indemnify the buyer for all losses arising from defects.",
+                             "Payment is due within thirty days of the invoice date."])
+    second = _store(db, "b", ["The supplier shall indemnify the buyer for losses caused by late delivery."])
+    index = ClauseIndex(db, mode="exact")
+    matches = index.query("supplier shall indemnify the buyer", k=10)
+    assert len(index) == 3 and len(matches) == 2
+    assert matches[0]["similarity"] >= matches[1]["similarity"] > 0
+    assert {match["contract_id"] for match in matches} == {first, second}
+    assert index.query("supplier shall indemnify the buyer", k=10, exclude_contract=first)[0]["contract_id"] != first
+    assert index.query("the of and", k=10) == []
+
+def test_lsh_finds_close_paraphrases(db):
+    # Stored clauses at cosine about 0.8 from the query are all found
+    for n in range(50):
+        _store(db, n, [f"The supplier shall indemnify the buyer for all losses under order {n}.",
+                       f"Invoice {n} is payable to the account given in schedule {n}."], minute=n)
+    exact = ClauseIndex(db, mode="exact").query("supplier shall indemnify the buyer", k=10)
+    lsh = ClauseIndex(db, mode="lsh").query("supplier shall indemnify the buyer", k=10)
+    assert len(lsh) == 10
+    assert [match["similarity"] for match in lsh] == [match["similarity"] for match in exact]
+
+def test_lsh_recall_against_exact(db, corpus):
+    exact, lsh = ClauseIndex(db, mode="exact"), ClauseIndex(db, mode="lsh")
+    found = total = 0
+    for _ in range(50):
+        query = _clause(corpus)
+        expected = exact.query(query, k=5)
+        approximate = set(_keys(lsh.query(query, k=5)))
+        found += sum(key in approximate for key in _keys(expected))
+        total += len(expected)
+        # Close neighbours are never missed
+        assert all(key in approximate for key, match in zip(_keys(expected), expected) if match["similarity"] >= 0.7)
+    assert found / total >= 0.8
+
+def test_lsh_falls_back_to_exact_scoring(db, monkeypatch):
+    _store(db, "a", ["The tenant shall maintain insurance coverage for the premises.",
+                     "The landlord may audit the books upon written notice."])
+    index = ClauseIndex(db, mode="lsh")
+    # No candidate shares a bucket with the query
+    monkeypatch.setattr(index, "_candidates", lambda tables, code: tables[0][1][:0])
+    assert _keys(index.query("tenant insurance", k=5)) == _keys(ClauseIndex(db).query("tenant insurance", k=5))
+    assert len(index.query("tenant insurance", k=5)) == 1
+
+@pytest.mark.parametrize("mode", ["exact", "lsh"])
+def test_new_clauses_are_picked_up_by_load(db, corpus, mode):
+    index = ClauseIndex(db, mode=mode, refresh_interval=3600)
+    index.load()
+    assert len(index) == 300
+    for contract in range(30, 40):
+        _store(db, contract, [_clause(corpus) for _ in range(10)], minute=contract)
+    query = _clause(corpus)
+    assert len(index) == 300
+    index.load()
+    assert len(index) == 400
+    # The merged segments answer like an index built in one go
+    assert _keys(index.query(query, k=10)) == _keys(ClauseIndex(db, mode=mode).query(query, k=10))
+
+def test_concurrent_queries_refresh_once(db, corpus, monkeypatch):
+    index = ClauseIndex(db)
+    collection = db.collection
+    loads = []
+
+    def counting_collection(name):
+        loads.append(name)
+        return collection(name)
+
+    monkeypatch.setattr(db, "collection", counting_collection)
+    threads = [threading.Thread(target=index.query, args=("supplier shall indemnify",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == ["risk_analysis"] and len(index) == 300
+
+def test_bad_modes_are_rejected(db):
+    with pytest.raises(ValueError):
+        ClauseIndex(db, mode="fuzzy")
+
+def test_similar_clauses_endpoint_waits_for_the_indexes(api, client, db, monkeypatch):
+    _store(db, "a", ["The supplier shall indemnify the buyer for all losses arising from defects."])
+    assert client.get("/health").get_json()["indexes"] == "not started"
+    release = threading.Event()
+
+    def slow_load():
+        release.wait(5)
+        api.load_indexes()
+
+    monkeypatch.setattr(api, "indexes", Warmup(slow_load, name="indexes"))
+    response = client.get("/clauses/similar?text=supplier indemnify")
+    assert response.status_code == 503 and response.headers["Retry-After"] == "5"
+    assert response.get_json()["indexes"] == "loading"
+    assert client.get("/ready").get_json()["indexes"] == "loading"
+
+    release.set()
+    api.indexes.wait(5)
+    assert len(api.clause_index) == 1
+    assert client.get("/ready").get_json()["indexes"] == "ready"
+    body = client.get("/clauses/similar?text=supplier indemnify&k=3").get_json()
+    assert body["indexed_clauses"] == 1 and body["matches"][0]["clause"].startswith("The supplier")
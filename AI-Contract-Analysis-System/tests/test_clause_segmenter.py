@@ -0,0 +1,50 @@
+from clause_segmenter import StructuralSegmenter
+
+CONTRACT = """MASTER SERVICES AGREEMENT
+This Agreement is made between Acme Corp and Globex Limited.
+
+ARTICLE I
+DEFINITIONS
+1.1 "Services" means the services described in each Statement of Work.
+1.2 "Fees" means the amounts payable under Article II.
+
+ARTICLE II
+PAYMENT
+2.1 The Client shall pay all invoices within thirty days.
+(a) Late payments accrue interest at one percent per month.
+(b) Disputed amounts must be notified in writing.
+"""
+
+def test_tree_follows_the_numbering():
+    segmenter = StructuralSegmenter()
+    roots = segmenter.segment(CONTRACT)
+    [title] = roots
+    assert title.heading == "MASTER SERVICES AGREEMENT"
+    assert [node.number for node in title.children] == ["Article I", "Article II"]
+    article = title.children[1]
+    assert article.heading == "PAYMENT"
+    [clause] = article.children
+    assert clause.number == "2.1"
+    assert [child.number for child in clause.children] == ["(a)", "(b)"]
+    assert CONTRACT[clause.start:clause.end].startswith("2.1 The Client shall pay")
+
+def test_heading_only_nodes_are_not_clauses():
+    segmenter = StructuralSegmenter()
+    clauses = segmenter.flatten(segmenter.segment(CONTRACT))
+    assert "ARTICLE I DEFINITIONS" not in clauses
+    assert "ARTICLE II PAYMENT" not in clauses
+    assert clauses == [
+        "This Agreement is made between Acme Corp and Globex Limited.",
+        '1.1 "Services" means the services described in each Statement of Work.',
+        '1.2 "Fees" means the amounts payable under Article II.',
+        "2.1 The Client shall pay all invoices within thirty days.",
+        "(a) Late payments accrue interest at one percent per month.",
+        "(b) Disputed amounts must be notified in writing.",
+    ]
+
+def test_numbered_title_with_body_is_kept():
+    segmenter = StructuralSegmenter()
+    text = "1. Confidentiality\nEach party shall keep the other's information secret.\n2. Term\n"
+    roots = segmenter.segment(text)
+    assert roots[0].heading == "Confidentiality"
+    assert segmenter.flatten(roots) == ["1. Confidentiality Each party shall keep the other's information secret."]
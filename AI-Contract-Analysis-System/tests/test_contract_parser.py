@@ -0,0 +1,40 @@
+import docx
+import pytest
+from fpdf import FPDF
+
+from contract_parser import ContractParser
+
+PAGES = [f"Page {n}: The Supplier shall deliver batch {n} within thirty days." for n in range(1, 8)]
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    pdf = FPDF()
+    pdf.set_font("Arial", size=12)
+    for text in PAGES:
+        pdf.add_page()
+        pdf.cell(0, 10, txt=text)
+    path = str(tmp_path / "contract.pdf")
+    pdf.output(path)
+    return path
+
+def test_pdf_pages_stream_in_order(pdf_path):
+    parser = ContractParser()
+    assert list(parser.iter_pages(pdf_path)) == PAGES
+    assert parser.parse_file(pdf_path) == "".join(f"{text}\n" for text in PAGES)
+
+def test_process_pool_extraction_reassembles_pages_in_order(pdf_path):
+    parser = ContractParser(workers=2, pages_per_task=2, max_pages_in_flight=2)
+    assert list(parser.iter_pdf_pages(pdf_path)) == PAGES
+
+def test_streams_and_docx(pdf_path, tmp_path):
+    parser = ContractParser()
+    with open(pdf_path, "rb") as f:
+        assert parser.parse_stream(f, "contract.pdf") == "\n".join(PAGES)
+    document = docx.Document()
+    for text in PAGES[:2]:
+        document.add_paragraph(text)
+    path = str(tmp_path / "contract.docx")
+    document.save(path)
+    assert list(parser.iter_pages(path)) == PAGES[:2]
+    with pytest.raises(ValueError):
+        parser.parse_file(str(tmp_path / "contract.txt"))
@@ -0,0 +1,60 @@
+import json
+
+from contract_store import (contract_aggregates, fetch_risks, find_by_hash, iter_risks, load_risks,
+                            save_contracts, RISK_ANALYSIS)
+from mock_firestore import SCHEMA_PATH
+
+def _risk(n, level="High"):
+    return {"clause": f"Clause {n}", "level": level, "score": 0.5, "explanation": "", "type": "ML"}
+
+def _stored(db):
+    risks = [_risk(n, "High" if n % 3 else "Low") for n in range(7)]
+    analysis = {"risks": risks, "risk_score": 42, "summary": "Found 4 high-risk clauses."}
+    contract = {"filename": "a.pdf", "hash": "abc", **contract_aggregates(analysis)}
+    return risks, save_contracts(db, [(contract, risks), ({"filename": "b.pdf"}, [_risk(99)])], batch_size=3)
+
+def test_contracts_keep_aggregates_and_risks_are_separate_documents(db):
+    risks, (first, second) = _stored(db)
+    contract = db.collection("contracts").document(first).get().to_dict()
+    assert contract["risk_count"] == 7 and contract["level_counts"] == {"Low": 3, "High": 4}
+    assert "risks" not in contract
+    assert len(db.collection(RISK_ANALYSIS).where("contract_id", "==", first).get()) == 7
+    assert find_by_hash(db, "abc")["id"] == first
+    assert find_by_hash(db, "missing") is None
+
+def test_risks_are_paged_in_contract_order(db):
+    risks, (first, second) = _stored(db)
+    page = fetch_risks(db, first, page_size=3)
+    assert [risk["position"] for risk in page["risks"]] == [0, 1, 2] and page["next"] == 2
+    page = fetch_risks(db, first, page_size=3, after=5)
+    assert [risk["clause"] for risk in page["risks"]] == ["Clause 6"] and page["next"] is None
+    assert [risk["clause"] for risk in iter_risks(db, first, page_size=2)] == [risk["clause"] for risk in risks]
+    assert [risk["clause"] for risk in load_risks(db, second)] == ["Clause 99"]
+
+def test_risk_paging_has_a_declared_composite_index():
+    with open(SCHEMA_PATH, encoding="utf-8") as f:
+        composites = json.load(f)[RISK_ANALYSIS]["composite_indexes"]
+    assert [["contract_id", "ASCENDING"], ["position", "ASCENDING"]] in [index["fields"] for index in composites]
+
+def test_legacy_contracts_embed_their_risks(db):
+    legacy = [_risk(1), _risk(2)]
+    assert load_risks(db, "old", legacy=legacy) == legacy
+
+def test_contract_endpoints_page_clauses(api, client, db):
+    risks, (first, second) = _stored(db)
+    contract = client.get(f"/contracts/{first}").get_json()
+    assert contract["id"] == first and contract["risk_count"] == 7
+    page = client.get(f"/contracts/{first}/risks?page_size=4").get_json()
+    assert [risk["position"] for risk in page["risks"]] == [0, 1, 2, 3]
+    page = client.get(f"/contracts/{first}/risks?page_size=4&after={page['next']}").get_json()
+    assert [risk["position"] for risk in page["risks"]] == [4, 5, 6] and page["next"] is None
+    assert client.get("/contracts/missing/risks").status_code == 404
+    assert client.get(f"/contracts/{first}/risks?page_size=x").status_code == 400
+
+def test_legacy_contract_endpoints(api, client, db):
+    db.collection("contracts").document("old").set({"filename": "old.pdf", "risks": [_risk(n) for n in range(5)]})
+    assert client.get("/contracts/old").get_json()["risk_count"] == 5
+    page = client.get("/contracts/old/risks?page_size=2&after=1").get_json()
+    assert [risk["clause"] for risk in page["risks"]] == ["Clause 2", "Clause 3"] and page["next"] == 3
+    page = client.get("/contracts/old/risks?page_size=2&after=3").get_json()
+    assert [risk["position"] for risk in page["risks"]] == [4] and page["next"] is None
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import history_queries
+from history_queries import HISTORY_FIELDS, fetch_page, notify_write
+
+START = datetime(2024, 1, 1)
+
+def _contracts(db, count=12):
+    for n in range(count):
+        db.collection("contracts").document(f"c{n:02d}").set({
+            "filename": f"contract-{n}.pdf", "timestamp": START + timedelta(days=n),
+            "risk_score": n * 10 % 70, "summary": "long text " * 10,
+        })
+
+def _pages(db, **kwargs):
+    pages, cursor = [], None
+    while True:
+        page = fetch_page(db, "contracts", HISTORY_FIELDS, "timestamp", page_size=5, cursor=cursor, **kwargs)
+        pages.append([row["id"] for row in page["rows"]])
+        if not page["has_more"]:
+            return pages
+        cursor = page["cursor"]
+
+def test_pages_are_sorted_and_projected(db):
+    _contracts(db)
+    assert _pages(db) == [[f"c{n:02d}" for n in range(11, 6, -1)],
+                          [f"c{n:02d}" for n in range(6, 1, -1)],
+                          ["c01", "c00"]]
+    first = fetch_page(db, "contracts", HISTORY_FIELDS, "timestamp", page_size=5)
+    assert set(first["rows"][0]) == {"id", *HISTORY_FIELDS}
+
+def test_ranges_and_filters(db):
+    _contracts(db)
+    pages = _pages(db, ranges={"timestamp": (START + timedelta(days=3), START + timedelta(days=9)),
+                               "risk_score": (None, None)})
+    assert pages == [["c09", "c08", "c07", "c06", "c05"], ["c04", "c03"]]
+    assert _pages(db, filters={"risk_score": 0}) == [["c07", "c00"]]
+
+def test_ranges_must_be_on_the_order_field(db):
+    _contracts(db)
+    with pytest.raises(ValueError, match="risk_score"):
+        fetch_page(db, "contracts", HISTORY_FIELDS, "timestamp", ranges={"risk_score": (10, 50)})
+    page = fetch_page(db, "contracts", HISTORY_FIELDS, "risk_score", descending=False, ranges={"risk_score": (10, 50)})
+    assert [row["risk_score"] for row in page["rows"]] == [10, 10, 20, 20, 30, 30, 40, 40, 50]
+
+def test_pages_are_cached_until_a_write(db):
+    _contracts(db)
+    first = fetch_page(db, "contracts", HISTORY_FIELDS, "timestamp", page_size=5)
+    db.collection("contracts").document("c99").set({"filename": "new.pdf", "timestamp": START + timedelta(days=99)})
+    assert fetch_page(db, "contracts", HISTORY_FIELDS, "timestamp", page_size=5) is first
+    # Writes to other collections leave the page cached
+    notify_write("audit_logs")
+    assert fetch_page(db, "contracts", HISTORY_FIELDS, "timestamp", page_size=5) is first
+    notify_write("contracts")
+    assert fetch_page(db, "contracts", HISTORY_FIELDS, "timestamp", page_size=5)["rows"][0]["id"] == "c99"
+
+def test_cached_pages_are_keyed_by_cursor(db):
+    _contracts(db)
+    first = fetch_page(db, "contracts", HISTORY_FIELDS, "timestamp", page_size=5)
+    second = fetch_page(db, "contracts", HISTORY_FIELDS, "timestamp", page_size=5, cursor=first["cursor"])
+    other_cursor = fetch_page(db, "contracts", HISTORY_FIELDS, "timestamp", page_size=2)["cursor"]
+    other = fetch_page(db, "contracts", HISTORY_FIELDS, "timestamp", page_size=5, cursor=other_cursor)
+    assert [row["id"] for row in second["rows"]] == ["c06", "c05", "c04", "c03", "c02"]
+    assert [row["id"] for row in other["rows"]] == ["c09", "c08", "c07", "c06", "c05"]
+
+def test_page_cache_bounds():
+    cache = history_queries.PageCache(max_pages=2, ttl=30)
+    for key in "abc":
+        cache.put("contracts", key, {"rows": [key]})
+    assert cache.get("contracts", "a") is None
+    assert cache.get("contracts", "c") == {"rows": ["c"]}
+    expired = history_queries.PageCache(ttl=-1)
+    expired.put("contracts", "a", {"rows": []})
+    assert expired.get("contracts", "a") is None
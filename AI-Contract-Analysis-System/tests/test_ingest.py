@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+
+import docx
+import pytest
+
+from analysis_cache import AnalysisCache
+from ingest import Checkpoint, Ingestor, iter_sources, main
+from near_duplicates import NearDuplicateIndex
+
+CONTRACTS = {
+    "a.docx": ["The Provider shall indemnify the Client against all losses.",
+               "This agreement is governed by the laws of California."],
+    "b.docx": ["Either party may terminate this agreement with thirty days notice."],
+    "c.docx": ["The Supplier shall deliver the goods within thirty days.",
+               "All notices must be in writing and sent via certified mail."],
+}
+
+def _write_docx(path, paragraphs):
+    document = docx.Document()
+    for text in paragraphs:
+        document.add_paragraph(text)
+    document.save(str(path))
+
+@pytest.fixture
+def corpus(tmp_path):
+    root = tmp_path / "contracts"
+    (root / "nested").mkdir(parents=True)
+    for name, paragraphs in CONTRACTS.items():
+        _write_docx(root / name, paragraphs)
+    shutil.copy(root / "a.docx", root / "nested" / "copy_of_a.docx")
+    (root / "broken.docx").write_bytes(b"not a zip file")
+    (root / "notes.txt").write_text("ignored")
+    return root
+
+def _ingest(db, nlp, risk_engine, checkpoint_path, paths, batch_size=2):
+    checkpoint = Checkpoint(checkpoint_path)
+    ingestor = Ingestor(db, nlp, risk_engine, AnalysisCache(db), NearDuplicateIndex(db),
+                        checkpoint, batch_size=batch_size)
+    try:
+        ingestor.run(paths, workers=1, report_interval=3600)
+    finally:
+        checkpoint.close()
+    return ingestor
+
+def _log(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_iter_sources(corpus, tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text(f"# extra files\n\n{corpus / 'b.docx'}\n")
+    assert [os.path.relpath(path, corpus) for path in iter_sources([str(corpus)], str(manifest))] == [
+        "a.docx", "b.docx", "broken.docx", "c.docx", os.path.join("nested", "copy_of_a.docx"), "b.docx"
+    ]
+
+def test_checkpoint_skips_torn_lines_and_retries_errors(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"path": "a.pdf", "status": "stored", "id": "1"}) + "\n")
+        f.write(json.dumps({"path": "b.pdf", "status": "duplicate", "id": "1"}) + "\n")
+        f.write(json.dumps({"path": "c.pdf", "status": "error", "error": "bad"}) + "\n")
+        f.write('{"path": "d.pdf", "sta')
+    checkpoint = Checkpoint(path)
+    assert checkpoint.done == {"a.pdf", "b.pdf"}
+    # The next entry must not be glued onto the torn line
+    checkpoint.record([{"path": "c.pdf", "status": "stored", "id": "2"}])
+    checkpoint.close()
+    assert Checkpoint(path).done == {"a.pdf", "b.pdf", "c.pdf"}
+
+def test_ingest_stores_deduplicates_and_resumes(corpus, tmp_path, db, nlp, risk_engine):
+    checkpoint_path = str(tmp_path / "checkpoint.jsonl")
+    paths = list(iter_sources([str(corpus)]))
+    first = _ingest(db, nlp, risk_engine, checkpoint_path, paths)
+    assert first.counts == {"stored": 3, "duplicate": 1, "error": 1, "skipped": 0}
+    assert all(count == 3 for count, _ in [first.stages[stage] for stage in ("segment", "analyze", "persist")])
+
+    log = {os.path.basename(entry["path"]): entry for entry in _log(checkpoint_path)}
+    assert log["copy_of_a.docx"]["status"] == "duplicate"
+    assert log["broken.docx"]["status"] == "error"
+    stored = {name: db.collection("contracts").document(log[name]["id"]).get().to_dict() for name in CONTRACTS}
+    assert {name: contract["filename"] for name, contract in stored.items()} == {name: name for name in CONTRACTS}
+    assert all(contract["source"] == "ingest" and contract["analysis_key"] for contract in stored.values())
+
+    # Resume: finished files are skipped, the failed one is retried
+    _write_docx(corpus / "broken.docx", ["The Client shall pay all invoices within thirty days."])
+    second = _ingest(db, nlp, risk_engine, checkpoint_path, paths)
+    assert second.counts == {"stored": 1, "duplicate": 0, "error": 0, "skipped": 4}
+    assert len(list(db.collection("contracts").stream())) == 4
+
+def test_lost_checkpoint_finds_files_by_hash(corpus, tmp_path, db, nlp, risk_engine):
+    paths = list(iter_sources([str(corpus)]))
+    _ingest(db, nlp, risk_engine, str(tmp_path / "first.jsonl"), paths)
+    # A crash after the batch commit but before the checkpoint write
+    again = _ingest(db, nlp, risk_engine, str(tmp_path / "second.jsonl"), paths)
+    assert again.counts == {"stored": 0, "duplicate": 4, "error": 1, "skipped": 0}
+    assert len(list(db.collection("contracts").stream())) == 3
+
+def test_failed_batches_are_logged_and_retried(corpus, tmp_path, db, nlp, risk_engine, monkeypatch):
+    checkpoint_path = str(tmp_path / "checkpoint.jsonl")
+    paths = [str(corpus / name) for name in CONTRACTS]
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("scoring failed")
+
+    with monkeypatch.context() as mp:
+        mp.setattr(risk_engine, "analyze_contracts", fail)
+        failed = _ingest(db, nlp, risk_engine, checkpoint_path, paths)
+    assert failed.counts["error"] == 3
+    assert {entry["error"] for entry in _log(checkpoint_path)} == {"scoring failed"}
+    assert list(db.collection("contracts").stream()) == []
+
+    retried = _ingest(db, nlp, risk_engine, checkpoint_path, paths)
+    assert retried.counts == {"stored": 3, "duplicate": 0, "error": 0, "skipped": 0}
+
+def test_main_requires_sources(capsys):
+    with pytest.raises(SystemExit):
+        main([])
+    assert "at least one directory/file or --manifest" in capsys.readouterr().err
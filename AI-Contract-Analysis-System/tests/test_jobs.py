@@ -0,0 +1,91 @@
+import threading
+import time
+from datetime import timezone
+
+import pytest
+
+from jobs import JobQueue, QueueFullError
+
+def _wait(queue, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+def test_jobs_run_in_the_background(db):
+    queue = JobQueue(lambda payload: {"length": len(payload)}, workers=1, db=db)
+    job = _wait(queue, queue.submit("abc"))
+    assert job["status"] == "done" and job["result"] == {"length": 3}
+    assert job["started_at"] and job["finished_at"]
+
+def test_failures_are_reported(db):
+    def fail(payload):
+        raise ValueError("unreadable contract")
+    queue = JobQueue(fail, workers=1, db=db)
+    job = _wait(queue, queue.submit("abc"))
+    assert job["status"] == "failed" and job["error"] == "unreadable contract"
+
+def test_full_queue_is_rejected(db):
+    release = threading.Event()
+    queue = JobQueue(lambda payload: release.wait(5), workers=1, max_queue=1, db=db)
+    try:
+        running = queue.submit("a")
+        while queue.get(running)["status"] != "running":
+            time.sleep(0.01)
+        queue.submit("b")
+        with pytest.raises(QueueFullError):
+            queue.submit("c")
+        assert queue.stats()["jobs"] == {"running": 1, "queued": 1}
+    finally:
+        release.set()
+
+def test_other_workers_see_the_job_through_the_store(db):
+    queue = JobQueue(lambda payload: payload.upper(), workers=1, db=db)
+    other_worker = JobQueue(lambda payload: None, db=db)
+    job_id = queue.submit("abc")
+    _wait(queue, job_id)
+    job = other_worker.get(job_id)
+    assert job["status"] == "done" and job["result"] == "ABC"
+    assert "expires_at" not in job
+    assert other_worker.get("unknown") is None
+
+def test_expired_jobs_are_gone(db):
+    queue = JobQueue(lambda payload: payload, workers=1, result_ttl=-1, db=db)
+    job_id = queue.submit("abc")
+    _wait(queue, job_id)
+    queue.submit("def")
+    assert queue.get(job_id) is None
+
+def test_jobs_endpoint(client):
+    response = client.post("/jobs", json={"text": "The Provider shall indemnify the Client against all losses."})
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+    assert response.headers["Location"] == f"/jobs/{job_id}"
+    deadline = time.monotonic() + 10
+    while (job := client.get(f"/jobs/{job_id}").get_json())["status"] not in ("done", "failed"):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert job["status"] == "done" and job["result"]["success"]
+    assert client.get("/jobs/unknown").status_code == 404
+    assert client.post("/jobs", json={}).status_code == 400
+
+def test_jobs_read_back_from_firestore_west_of_utc(db, monkeypatch):
+    monkeypatch.setenv("TZ", "America/Los_Angeles")
+    time.tzset()
+    try:
+        queue = JobQueue(lambda payload: payload.upper(), workers=1, db=db)
+        job_id = queue.submit("abc")
+        _wait(queue, job_id)
+        # Firestore stores naive datetimes as UTC and returns them tz-aware
+        ref = db.collection("jobs").document(job_id)
+        stored = ref.get().to_dict()
+        if stored["expires_at"].tzinfo is None:
+            stored["expires_at"] = stored["expires_at"].replace(tzinfo=timezone.utc)
+        ref.set(stored)
+        assert JobQueue(lambda payload: None, db=db).get(job_id)["result"] == "ABC"
+    finally:
+        monkeypatch.undo()
+        time.tzset()
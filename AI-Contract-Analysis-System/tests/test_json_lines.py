@@ -0,0 +1,12 @@
+from datetime import datetime, timezone
+
+import json_lines
+
+def test_datetimes_survive_a_round_trip():
+    record = {"timestamp": datetime(2024, 1, 2, 3, 4, 5), "expires_at": datetime(2024, 1, 2, tzinfo=timezone.utc),
+              "nested": {"at": [datetime(2024, 5, 6)]}, "count": 3}
+    line = json_lines.dumps(record)
+    assert "\n" not in line
+    assert json_lines.loads(line) == record
+    # Values JSON cannot hold are written as strings rather than failing the write
+    assert json_lines.loads(json_lines.dumps({"tags": {"a"}})) == {"tags": "{'a'}"}
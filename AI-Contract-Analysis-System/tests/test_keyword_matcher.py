@@ -0,0 +1,58 @@
+from keyword_matcher import KeywordMatcher
+
+KEYWORDS = {
+    "High": ["liability", "termination"],
+    "Medium": ["limitation of liability", "governing law"],
+    "Low": ["termination fee", "notice"],
+}
+
+def spans(matches):
+    return [(m.keyword, m.start, m.end) for m in matches]
+
+def test_overlapping_keywords_are_all_found():
+    matcher = KeywordMatcher(KEYWORDS)
+    text = "Limitation of Liability and termination fee on notice."
+    assert spans(matcher.find_all(text)) == [
+        ("limitation of liability", 0, 23),
+        ("liability", 14, 23),
+        ("termination", 28, 39),
+        ("termination fee", 28, 43),
+        ("notice", 47, 53),
+    ]
+
+def test_best_match_sees_keywords_inside_longer_ones():
+    matcher = KeywordMatcher(KEYWORDS)
+    match = matcher.best_match("The Limitation of Liability clause.")
+    assert (match.keyword, match.level) == ("liability", "High")
+
+def test_offsets_index_the_original_text():
+    matcher = KeywordMatcher(KEYWORDS)
+    # "İ" lowercases to two characters, which shifted offsets into text.lower()
+    text = "İİ GOVERNING LAW applies."
+    [match] = matcher.find_all(text)
+    assert text[match.start:match.end] == "GOVERNING LAW"
+    assert match.keyword == "governing law"
+
+def test_word_boundaries():
+    matcher = KeywordMatcher({"High": ["liable"]})
+    assert matcher.find_all("reliable and liabled") == []
+    assert spans(matcher.find_all("liable.")) == [("liable", 0, 6)]
+    loose = KeywordMatcher({"High": ["liable"]}, word_boundaries=False)
+    assert spans(loose.find_all("reliable")) == [("liable", 2, 8)]
+
+def test_priority_and_registration_order():
+    matcher = KeywordMatcher({"High": ["indemnify", "arbitration"], "Low": ["notice"]})
+    assert matcher.best_match("notice of arbitration; indemnify").keyword == "indemnify"
+    assert matcher.best_match("notice only").level == "Low"
+    assert matcher.best_match("nothing here") is None
+
+def test_add_and_remove_keywords():
+    matcher = KeywordMatcher(KEYWORDS)
+    fingerprint = matcher.fingerprint()
+    matcher.add_keyword("Exclusivity", "High")
+    assert matcher.best_match("an exclusivity period").keyword == "exclusivity"
+    assert matcher.fingerprint() != fingerprint
+    assert matcher.remove_keyword("termination")
+    assert spans(matcher.find_all("termination fee")) == [("termination fee", 0, 15)]
+    assert not matcher.remove_keyword("termination")
+    assert matcher.keywords()["High"] == ["liability", "exclusivity"]
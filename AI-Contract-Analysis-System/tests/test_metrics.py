@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from metrics import Metrics, RequestProfiler
+
+def test_counters_and_histograms_render_as_prometheus_text():
+    m = Metrics(buckets=(0.1, 1.0))
+    m.inc("documents", source="api", help="Documents analyzed.")
+    m.inc("documents", 2, source="api")
+    m.inc("documents", source='say "hi"\n')
+    m.observe("stage_seconds", 0.05, stage="parse")
+    m.observe("stage_seconds", 0.5, stage="parse")
+    m.observe("stage_seconds", 5, stage="parse")
+    assert m.render().splitlines() == [
+        "# HELP lexiguard_documents_total Documents analyzed.",
+        "# TYPE lexiguard_documents_total counter",
+        'lexiguard_documents_total{source="api"} 3',
+        'lexiguard_documents_total{source="say \\"hi\\"\\n"} 1',
+        "# TYPE lexiguard_stage_seconds histogram",
+        'lexiguard_stage_seconds_bucket{stage="parse",le="0.1"} 1',
+        'lexiguard_stage_seconds_bucket{stage="parse",le="1.0"} 2',
+        'lexiguard_stage_seconds_bucket{stage="parse",le="+Inf"} 3',
+        'lexiguard_stage_seconds_sum{stage="parse"} 5.55',
+        'lexiguard_stage_seconds_count{stage="parse"} 3',
+    ]
+
+def test_span_times_failures_too():
+    m = Metrics()
+    with m.span("segment"):
+        pass
+    with pytest.raises(RuntimeError):
+        with m.span("segment"):
+            raise RuntimeError("spaCy failed")
+    assert m.snapshot()["histograms"]['stage_seconds{stage="segment"}']["count"] == 2
+    m.reset()
+    assert m.snapshot() == {"counters": {}, "histograms": {}}
+
+def test_profiler_keeps_only_slow_requests(tmp_path):
+    profiler = RequestProfiler(sample_rate=1.0, threshold=0.5, dump_dir=str(tmp_path))
+    profile = profiler.start()
+    # One request at a time
+    assert profiler.start() is None
+    assert profiler.stop(profile, "/analyze", elapsed=0.1) is None
+    path = profiler.stop(profiler.start(), "/contracts/<id>", elapsed=1.2)
+    assert os.path.dirname(path) == str(tmp_path)
+    assert os.path.basename(path).startswith("_contracts__id__")
+    assert RequestProfiler(sample_rate=0).start() is None
+
+def test_metrics_endpoint(client):
+    client.post("/analyze", json={"text": "The Provider shall indemnify the Client against all losses."})
+    response = client.get("/metrics")
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert 'lexiguard_stage_seconds_count{stage="segment"}' in body
+    assert 'lexiguard_requests_total{endpoint="analyze_contract",status="200"}' in body
@@ -0,0 +1,128 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import mock_firestore
+from mock_firestore import ASCENDING, DESCENDING, MockFirestore
+
+@pytest.fixture
+def store(monkeypatch):
+    # Small buckets, so the sorted indexes split and queries cross bucket boundaries
+    monkeypatch.setattr(mock_firestore._SortedIndex, "LOAD", 4)
+    db = MockFirestore()
+    rng = random.Random(7)
+    start = datetime(2024, 1, 1)
+    for n in range(200):
+        db.collection("contracts").document(f"doc-{n:03d}").set({
+            "hash": f"h{rng.randrange(10)}",
+            "risk_score": rng.randrange(20),
+            "timestamp": start + timedelta(hours=rng.randrange(50)),
+            "source": rng.choice(["api", "ingest"]),
+        })
+    # Rows without the ordered field are left out, as in Firestore
+    db.collection("contracts").document("no-score").set({"hash": "h1", "source": "api"})
+    return db
+
+def _reference(db, filters, orders, cursor=None, limit=None):
+    """
+    The query answered by brute force: filter, sort (document id breaks ties), cursor, limit.
+    """
+    docs = db._store("contracts").docs
+    rows = [(doc_id, data) for doc_id, data in docs.items()
+            if all(mock_firestore._OPERATORS[op](data.get(f), v) for f, op, v in filters)
+            and all(data.get(f) is not None for f, _ in orders)]
+    descending = bool(orders) and orders[-1][1] == DESCENDING
+    rows.sort(key=lambda row: row[0], reverse=descending)
+    for field, direction in reversed(orders):
+        rows.sort(key=lambda row: row[1][field], reverse=direction == DESCENDING)
+    if cursor is not None:
+        rows = rows[[doc_id for doc_id, _ in rows].index(cursor) + 1:]
+    return [doc_id for doc_id, _ in rows][:limit]
+
+QUERIES = [
+    # sorted index, with and without range bounds on the ordered field
+    ([], [("timestamp", DESCENDING)]),
+    ([], [("risk_score", ASCENDING)]),
+    ([("risk_score", ">=", 5), ("risk_score", "<", 12)], [("risk_score", DESCENDING)]),
+    ([("risk_score", "==", 7)], [("risk_score", ASCENDING)]),
+    ([("source", "==", "api")], [("timestamp", ASCENDING)]),
+    # hash index
+    ([("hash", "==", "h3")], []),
+    ([("hash", "in", ["h1", "h2"])], [("risk_score", DESCENDING)]),
+    ([("hash", "==", "h3"), ("risk_score", ">", 10)], [("timestamp", ASCENDING), ("risk_score", DESCENDING)]),
+    # range on a sorted field, ordered by another
+    ([("risk_score", ">", 15)], [("timestamp", DESCENDING)]),
+    # full scan
+    ([("source", "==", "ingest")], []),
+    ([("source", "!=", "ingest")], [("source", ASCENDING), ("risk_score", ASCENDING)]),
+]
+
+@pytest.mark.parametrize("filters,orders", QUERIES)
+def test_planner_matches_a_full_scan(store, filters, orders):
+    query = store.collection("contracts")
+    for field, op, value in filters:
+        query = query.where(field, op, value)
+    for field, direction in orders:
+        query = query.order_by(field, direction)
+    expected = _reference(store, filters, orders)
+    assert [doc.id for doc in query.stream()] == expected
+    assert [doc.id for doc in query.limit(5).stream()] == expected[:5]
+
+    # Paging with start_after walks the same sequence
+    pages, page = [], query.limit(7).get()
+    while page:
+        pages.extend(doc.id for doc in page)
+        page = query.start_after(page[-1]).limit(7).get()
+    assert pages == expected
+
+def test_start_after_values_skips_ties(store):
+    query = store.collection("contracts").order_by("risk_score")
+    rest = [doc.to_dict()["risk_score"] for doc in query.start_after({"risk_score": 10}).stream()]
+    assert rest and min(rest) == 11
+
+def test_indexes_follow_updates_and_deletes(store):
+    contracts = store.collection("contracts")
+    contracts.document("doc-000").set({"hash": "moved", "risk_score": 99})
+    contracts.document("doc-001").update({"risk_score": 98})
+    contracts.document("doc-002").delete()
+    assert [doc.id for doc in contracts.where("hash", "==", "moved").stream()] == ["doc-000"]
+    assert [doc.id for doc in contracts.order_by("risk_score", DESCENDING).limit(2).stream()] == ["doc-000", "doc-001"]
+    assert "doc-002" not in [doc.id for doc in contracts.order_by("timestamp").stream()]
+    with pytest.raises(KeyError):
+        contracts.document("doc-002").update({"risk_score": 1})
+
+def test_projection_and_merge(store):
+    contracts = store.collection("contracts")
+    contracts.document("doc-000").set({"summary": "ok"}, merge=True)
+    [doc] = contracts.where("summary", "==", "ok").select(["summary", "hash"]).stream()
+    assert set(doc.to_dict()) == {"summary", "hash"}
+
+def test_empty_documents_exist(store):
+    store.collection("jobs").document("empty").set({})
+    snapshot = store.collection("jobs").document("empty").get()
+    assert snapshot.exists and snapshot.to_dict() == {}
+
+def test_unsupported_operator(store):
+    with pytest.raises(ValueError):
+        store.collection("contracts").where("hash", "like", "h%")
+
+def test_log_is_replayed(tmp_path):
+    path = str(tmp_path / "mock_db.jsonl")
+    db = MockFirestore(log_path=path)
+    when = datetime(2024, 5, 1, 12, 30)
+    db.collection("contracts").document("a").set({"hash": "x", "timestamp": when})
+    db.collection("contracts").document("b").set({"hash": "y", "timestamp": when})
+    db.collection("contracts").document("b").delete()
+    batch = db.batch()
+    batch.set(db.collection("contracts").document("a"), {"risk_score": 3}, merge=True)
+    batch.commit()
+    db._log.close()
+    with open(path, "a") as f:
+        f.write('{"c": "contracts", "id": "torn"')
+
+    replayed = MockFirestore(log_path=path)
+    assert replayed.collection("contracts").document("a").get().to_dict() == {"hash": "x", "timestamp": when, "risk_score": 3}
+    assert not replayed.collection("contracts").document("b").get().exists
+    assert [doc.id for doc in replayed.collection("contracts").where("hash", "==", "x").stream()] == ["a"]
+    replayed._log.close()
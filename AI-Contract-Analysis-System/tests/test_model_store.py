@@ -0,0 +1,67 @@
+import multiprocessing
+import os
+
+import pytest
+
+import model_store
+from risk_engine import RiskEngine
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "model.pkl")
+    header = model_store.save_model(model_store.train_pipeline(), path, version="v1")
+    pipeline, loaded = model_store.load_model(path)
+    assert loaded == header == model_store.read_header(path)
+    assert loaded["version"] == "v1"
+    assert list(pipeline.classes_) == ["High", "Low", "Medium"]
+
+def test_default_version_is_the_content_hash(tmp_path):
+    header = model_store.save_model(model_store.train_pipeline(), str(tmp_path / "model.pkl"))
+    assert header["version"] == model_store.model_version(header["sha256"])
+
+def test_corrupt_artifact_is_rejected(tmp_path):
+    path = str(tmp_path / "model.pkl")
+    model_store.save_model(model_store.train_pipeline(), path)
+    with open(path, "r+b") as f:
+        f.seek(-10, os.SEEK_END)
+        f.write(b"0123456789")
+    with pytest.raises(model_store.ModelArtifactError):
+        model_store.load_model(path)
+
+def test_engines_loading_one_artifact_share_a_version(model_path):
+    header = model_store.read_header(model_path)
+    first, second = RiskEngine(model_path=model_path), RiskEngine(model_path=model_path)
+    assert first.model_version == second.model_version == model_store.model_version(header["sha256"])
+    assert first.version == second.version
+
+def test_missing_artifact_is_trained_and_saved(tmp_path):
+    path = str(tmp_path / "models" / "model.pkl")
+    engine = RiskEngine(model_path=path)
+    assert engine.pipeline is not None
+    assert engine.model_version == model_store.model_version(model_store.read_header(path)["sha256"])
+
+def test_unreadable_artifact_is_retrained_and_replaced(tmp_path):
+    path = str(tmp_path / "model.pkl")
+    with open(path, "wb") as f:
+        f.write(b"not a model")
+    engine = RiskEngine(model_path=path)
+    assert engine.pipeline is not None
+    assert engine.analyze_clause_risk("Payment is due within thirty days.")["explanation"].startswith("ML Model")
+    # The broken file was overwritten with a loadable artifact
+    model_store.load_model(path)
+
+def test_training_failure_raises(tmp_path, monkeypatch):
+    def fail():
+        raise RuntimeError("no training data")
+    monkeypatch.setattr(model_store, "train_pipeline", fail)
+    with pytest.raises(RuntimeError):
+        RiskEngine(model_path=str(tmp_path / "model.pkl"))
+
+def _start_engine(path):
+    return RiskEngine(model_path=path).model_version
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_processes_starting_together_agree_on_the_version(tmp_path):
+    path = str(tmp_path / "model.pkl")
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        versions = pool.map(_start_engine, [path] * 4)
+    assert len(set(versions)) == 1
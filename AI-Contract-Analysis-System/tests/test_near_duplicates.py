@@ -0,0 +1,58 @@
+import threading
+import time
+
+from clause_cache import clause_fingerprint
+from near_duplicates import MinHasher, NearDuplicateIndex
+
+CLAUSES = [f"Clause {n}: the Supplier shall perform obligation number {n}." for n in range(20)]
+
+def _digest(clauses, level="Low"):
+    return [{"fp": clause_fingerprint(c), "risk_level": level, "risk_score": 0.1, "explanation": "Standard clause."}
+            for c in clauses]
+
+def test_minhash_estimates_jaccard_similarity():
+    hasher = MinHasher(num_perm=256)
+    a = hasher.signature([clause_fingerprint(c) for c in CLAUSES])
+    b = hasher.signature([clause_fingerprint(c) for c in CLAUSES[:15] + ["different"] * 5])
+    assert hasher.similarity(a, a) == 1.0
+    # True Jaccard: 15 / 21
+    assert abs(hasher.similarity(a, b) - 15 / 21) < 0.1
+    assert hasher.signature([]) is None
+
+def test_revised_contract_matches_with_known_results(db):
+    index = NearDuplicateIndex(db)
+    index.add("c1", _digest(CLAUSES), "v1")
+    index.add("other", _digest([f"Unrelated wording {n}." for n in range(20)]), "v1")
+    revised = CLAUSES[:19] + ["Clause 19: a new obligation."]
+    match = index.find(revised, "v1")
+    assert match["contract_id"] == "c1" and match["similarity"] > 0.7
+    assert match["known"][clause_fingerprint(CLAUSES[0])]["risk_level"] == "Low"
+    # Results of another engine version are not reused
+    assert index.find(revised, "v2")["known"] == {}
+    assert index.find(CLAUSES[:5], "v1") is None
+    assert index.find([], "v1") is None
+
+def test_other_processes_see_stored_digests(db):
+    NearDuplicateIndex(db).add("c1", _digest(CLAUSES), "v1")
+    assert NearDuplicateIndex(db).find(CLAUSES, "v1")["contract_id"] == "c1"
+
+def test_concurrent_lookups_refresh_once(db, monkeypatch):
+    NearDuplicateIndex(db).add("c1", _digest(CLAUSES), "v1")
+    index = NearDuplicateIndex(db)
+    queries = []
+    collection = db.collection
+
+    def slow_collection(name):
+        queries.append(name)
+        time.sleep(0.05)
+        return collection(name)
+    monkeypatch.setattr(db, "collection", slow_collection)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(index.find(CLAUSES, "v0"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # One refresh query (plus one digest read per match), and every lookup saw its result
+    assert queries.count("clause_digests") == 1 + len(threads)
+    assert [r["contract_id"] for r in results] == ["c1"] * len(threads)
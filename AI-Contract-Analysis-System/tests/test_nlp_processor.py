@@ -0,0 +1,179 @@
+import pytest
+import spacy
+from spacy.language import Language
+
+from nlp_processor import NLPProcessor
+
+@Language.component("lexiguard_test_noop")
+def _noop(doc):
+    return doc
+
+SENTENCES = [
+    "This Agreement is made between Acme Corp and Globex Limited.",
+    "The Supplier shall deliver the goods within thirty days.",
+    "Either party may terminate this Agreement on written notice.",
+    "Ok.",
+    "Payment is due within fifteen days of the invoice date.",
+]
+TEXT = " ".join(SENTENCES)
+
+def _pipeline_with(*names, disabled=()):
+    """
+    A blank pipeline with rule-based stand-ins for the named statistical
+    components: sentence boundaries from a sentencizer, entities from an
+    entity ruler, anything else a no-op.
+    """
+    nlp = spacy.blank("en")
+    for name in names:
+        if name in ("senter", "parser"):
+            nlp.add_pipe("sentencizer", name=name)
+        elif name == "ner":
+            ruler = nlp.add_pipe("entity_ruler", name="ner")
+            ruler.add_patterns([{"label": "ORG", "pattern": "Acme Corp"}, {"label": "ORG", "pattern": "Globex Limited"}])
+        else:
+            nlp.add_pipe("lexiguard_test_noop", name=name)
+    for name in disabled:
+        nlp.disable_pipe(name)
+    return nlp
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    def use(nlp):
+        monkeypatch.setattr(spacy, "load", lambda name, **kwargs: nlp)
+        return NLPProcessor()
+    return use
+
+def test_operations_only_run_the_components_they_need(pipeline):
+    processor = pipeline(_pipeline_with("tok2vec", "parser", "ner"))
+    assert processor._disabled["segment"] == ["tok2vec", "ner"]
+    assert processor._disabled["entities"] == ["tok2vec", "parser"]
+    assert processor._disabled["process"] == ["tok2vec"]
+
+def test_senter_is_enabled_for_segmentation(pipeline):
+    processor = pipeline(_pipeline_with("senter", "parser", "ner", disabled=("senter",)))
+    assert "senter" not in processor.nlp.disabled
+    assert processor._disabled["segment"] == ["parser", "ner"]
+
+def test_sentencizer_is_added_without_a_sentence_component(nlp):
+    assert nlp.nlp.pipe_names == ["sentencizer"]
+    assert nlp._disabled["segment"] == []
+
+def test_segment_clauses_drops_fragments(nlp):
+    assert nlp.segment_clauses(TEXT) == [s for s in SENTENCES if len(s) > 10]
+
+def test_extract_entities(pipeline):
+    processor = pipeline(_pipeline_with("ner"))
+    assert processor.extract_entities(TEXT) == [("Acme Corp", "ORG"), ("Globex Limited", "ORG")]
+
+def test_process_parses_once_for_clauses_and_entities(pipeline, monkeypatch):
+    processor = pipeline(_pipeline_with("tok2vec", "parser", "ner"))
+    calls = []
+    parse = type(processor.nlp).__call__
+
+    def counting_parse(self, text, **kwargs):
+        calls.append(kwargs)
+        return parse(self, text, **kwargs)
+
+    monkeypatch.setattr(type(processor.nlp), "__call__", counting_parse)
+    result = processor.process(TEXT)
+    assert calls == [{"disable": ["tok2vec"]}]
+    assert result == {"clauses": [s for s in SENTENCES if len(s) > 10],
+                      "entities": [("Acme Corp", "ORG"), ("Globex Limited", "ORG")]}
+
+def test_process_many_matches_process(pipeline):
+    processor = pipeline(_pipeline_with("parser", "ner"))
+    texts = [TEXT, SENTENCES[1], "", " ".join(reversed(SENTENCES)), " ".join([TEXT] * 4)]
+    expected = [processor.process(text) for text in texts]
+    # The last text is longer than a chunk, so it is processed in pieces rather than piped
+    processor.chunk_chars = 200
+    assert len(texts[-1]) > processor.chunk_chars
+    assert processor.process(texts[-1]) == expected[-1]
+    assert list(processor.process_many(texts, batch_size=2)) == expected
+
+def test_segment_many_matches_segment_clauses(nlp):
+    texts = [TEXT, SENTENCES[1], "", " ".join(reversed(SENTENCES))]
+    assert list(nlp.segment_many(texts, batch_size=2)) == [nlp.segment_clauses(text) for text in texts]
+
+STRUCTURED = """1. Payment
+The Client shall pay all invoices within thirty days. Late payments accrue interest.
+2. Termination
+Either party may terminate this Agreement on written notice.
+"""
+
+def test_structural_segmenter():
+    processor = NLPProcessor(segmenter="structural")
+    assert processor.segment_document(STRUCTURED) == [
+        "1. Payment The Client shall pay all invoices within thirty days. Late payments accrue interest.",
+        "2. Termination Either party may terminate this Agreement on written notice.",
+    ]
+    # Too little numbering: sentences, as with the spaCy segmenter
+    assert processor.segment_document(TEXT) == NLPProcessor().segment_document(TEXT)
+
+def test_segmenter_is_configured_by_environment(monkeypatch):
+    import nlp_processor
+    monkeypatch.setattr(nlp_processor, "SEGMENTER", "structural")
+    assert NLPProcessor().segmenter == "structural"
+    with pytest.raises(ValueError):
+        NLPProcessor(segmenter="paragraphs")
+
+def test_segment_documents_keeps_input_order():
+    processor = NLPProcessor(segmenter="structural")
+    texts = [TEXT, STRUCTURED, "", STRUCTURED.replace("\n", " ")]
+    assert processor.segment_documents(texts, batch_size=2) == [processor.segment_document(text) for text in texts]
+
+class _CountingPipeline:
+    def __init__(self, nlp):
+        self.nlp = nlp
+        self.parsed = 0
+
+    def __call__(self, text, **kwargs):
+        self.parsed += len(text)
+        return self.nlp(text, **kwargs)
+
+def test_segment_stream_matches_segment_clauses(nlp):
+    pages = [" ".join(SENTENCES[i:] + SENTENCES[:i]) for i in range(len(SENTENCES))] * 20
+    streamed = list(nlp.segment_stream(pages, buffer_chars=300))
+    assert streamed == nlp.segment_clauses(nlp.clean_text(" ".join(pages)))
+
+def test_segment_stream_without_sentence_ends_is_linear(nlp, monkeypatch):
+    counting = _CountingPipeline(nlp.nlp)
+    monkeypatch.setattr(nlp, "nlp", counting)
+    monkeypatch.setattr(nlp, "chunk_chars", 5000)
+    pages = ["word " * 20] * 2000
+    clauses = list(nlp.segment_stream(pages, buffer_chars=200))
+    total = sum(len(page) for page in pages)
+    assert counting.parsed < 4 * total
+    # Forced cuts lose nothing
+    assert " ".join(clauses).split() == ("word " * 20 * 2000).split()
+
+LONG = "  ".join(f"{sentence} Clause {n} applies." for n, sentence in
+                 enumerate(SENTENCES * 30))
+
+@pytest.mark.parametrize("chunk_chars", [120, 257, 1000, 100000])
+def test_chunk_offsets_stitch_back_to_the_full_text(nlp, chunk_chars):
+    chunked = list(nlp.iter_clauses(LONG, chunk_chars=chunk_chars))
+    assert all(LONG[start:end] == clause for start, end, clause in chunked)
+    assert [start for start, _, _ in chunked] == sorted({start for start, _, _ in chunked})
+    assert [clause for _, _, clause in chunked] == nlp.segment_clauses(LONG)
+
+def test_long_texts_are_segmented_in_chunks(nlp, monkeypatch):
+    monkeypatch.setattr(nlp, "chunk_chars", 300)
+    monkeypatch.setattr(nlp.nlp, "max_length", 301)
+    expected = [clause for _, _, clause in nlp.iter_clauses(LONG)]
+    assert nlp.segment_clauses(LONG) == expected
+    assert len(expected) == len([s for s in SENTENCES * 30 if len(s) > 10]) + 150
+
+@pytest.mark.parametrize("chunk_chars", [90, 200, 100000])
+def test_chunked_entities_keep_their_offsets(pipeline, chunk_chars):
+    processor = pipeline(_pipeline_with("senter", "ner"))
+    entities = list(processor.iter_entities(LONG, chunk_chars=chunk_chars))
+    assert all(LONG[start:end] == text for start, end, text, _ in entities)
+    assert [(text, label) for _, _, text, label in entities] == processor.extract_entities(LONG)
+    assert len(entities) == 60
+
+def test_text_without_spaces_is_cut_anyway(nlp):
+    text = "x" * 250 + ". The Supplier shall deliver the goods."
+    chunked = list(nlp.iter_clauses(text, chunk_chars=100))
+    assert [end - start for start, end, _ in chunked[:2]] == [100, 100]
+    assert "".join(clause for _, _, clause in chunked[:-1]) == "x" * 250 + "."
+    assert chunked[-1][2] == "The Supplier shall deliver the goods."
@@ -0,0 +1,69 @@
+import os
+
+from reports import ReportCache, render_reports
+from utils import generate_pdf_report, render_pdf_report
+
+RISKS = [{"type": "Keyword", "level": "High", "clause": "The Provider shall indemnify the Client. " * 5,
+          "explanation": "Keyword 'indemnify' found."},
+         {"type": "ML", "level": "Medium", "clause": "Liability is capped at €1,000.",
+          "explanation": "ML Model detected pattern similar to Medium risk."}]
+
+def test_report_is_a_pdf_rendered_from_any_iterable():
+    # "€" is not latin-1: it is replaced instead of failing the report
+    report = render_pdf_report({"risk_score": 40}, iter(RISKS))
+    assert report.startswith(b"%PDF")
+    assert render_pdf_report({"risk_score": 40, "risks": RISKS}).startswith(b"%PDF")
+    assert render_pdf_report({"risk_score": 0, "risks": []}).startswith(b"%PDF")
+
+def test_detailed_risks_are_capped():
+    many = [{**RISKS[0], "clause": f"Clause {n} shall indemnify."} for n in range(400)]
+    capped = render_pdf_report({"risk_score": 90}, iter(many), max_risks=20)
+    assert len(capped) < 2 * len(render_pdf_report({"risk_score": 90}, many[:20], max_risks=20))
+    assert len(capped) < len(render_pdf_report({"risk_score": 90}, many, max_risks=400)) / 4
+
+    # With a stored risk count, risks beyond the cap are not read at all
+    consumed = []
+    def paged():
+        for risk in many:
+            consumed.append(risk)
+            yield risk
+    render_pdf_report({"risk_score": 90, "risk_count": len(many)}, paged(), max_risks=20)
+    assert len(consumed) == 20
+
+def test_generate_pdf_report_writes_the_file(tmp_path):
+    path = str(tmp_path / "report.pdf")
+    assert generate_pdf_report({"risk_score": 40}, path, RISKS) == path
+    with open(path, "rb") as f:
+        assert f.read(4) == b"%PDF"
+    assert generate_pdf_report({"risk_score": 40}, str(tmp_path / "missing" / "report.pdf"), RISKS) is None
+
+def test_report_cache_is_bounded_by_size():
+    cache = ReportCache(max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    cache.get("a")
+    cache.put("c", b"123")
+    assert cache.get("b") is None and cache.get("a") == b"12345" and cache.size == 8
+    cache.put("too big", b"x" * 11)
+    assert cache.get("too big") is None
+    cache.put("a", b"1")
+    assert cache.size == 4
+
+def test_report_cache_key():
+    assert ReportCache.make_key({"analysis_key": "k", "hash": "h", "id": "i"}, "v1") == "k:v1"
+    assert ReportCache.make_key({"id": "i"}, "v2") == "i:v2"
+
+def test_bulk_rendering_keeps_input_order(tmp_path):
+    items = [(f"c{n}", {"risk_score": n, "risks": RISKS[:n % 3]}) for n in range(5)]
+    rendered = list(render_reports(iter(items), str(tmp_path), workers=2, max_in_flight=2))
+    assert [name for name, _, _ in rendered] == [name for name, _ in items]
+    for name, path, size in rendered:
+        assert os.path.getsize(path) == size
+
+def test_report_endpoint_is_cached(api, client, db):
+    contract_id = client.post("/analyze", json={"text": "The Provider shall indemnify the Client against all losses."}).get_json()["id"]
+    first = client.get(f"/contracts/{contract_id}/report")
+    assert first.mimetype == "application/pdf" and first.data.startswith(b"%PDF")
+    assert client.get(f"/contracts/{contract_id}/report").data == first.data
+    assert api.report_cache.size == len(first.data)
+    assert client.get("/contracts/missing/report").status_code == 404
@@ -0,0 +1,71 @@
+import pytest
+
+from near_duplicates import NearDuplicateIndex
+from revisions import analyze_revision
+
+BASE = [
+    "The Supplier shall deliver the goods within thirty days.",
+    "Payment is due within fifteen days of the invoice date.",
+    "The Provider shall indemnify the Client against all losses.",
+    "This Agreement is governed by the laws of California.",
+    "Notices must be sent by certified mail.",
+]
+
+@pytest.fixture
+def base(risk_engine, db):
+    index = NearDuplicateIndex(db)
+    analysis = risk_engine.analyze_contract(BASE)
+    index.add("base", analysis["clause_digest"], risk_engine.version)
+    return index, {"risk_score": analysis["risk_score"]}
+
+def test_only_the_redline_is_scored(risk_engine, base):
+    index, contract = base
+    revised = [BASE[0], "Payment is due within ninety days of the invoice date.", BASE[2], BASE[4],
+               "The Client may audit the Supplier once per year."]
+    risk_engine.clause_cache.clear()
+    analysis, delta = analyze_revision(risk_engine, index, contract, "base", revised)
+    assert delta["unchanged"] == 3
+    assert [(c["position"], c["clause"]) for c in delta["modified"]] == [(1, revised[1])]
+    assert [(c["position"], c["clause"]) for c in delta["added"]] == [(4, revised[4])]
+    assert [c["position"] for c in delta["removed"]] == [3]
+    assert delta["rescored"] == 2
+    assert delta["risk_score_change"] == analysis["risk_score"] - contract["risk_score"]
+
+def test_blank_clauses_do_not_shift_positions(risk_engine, base):
+    index, contract = base
+    revised = ["  ", BASE[0], "", "A brand new clause about exclusivity rights."] + BASE[1:]
+    analysis, delta = analyze_revision(risk_engine, index, contract, "base", revised)
+    assert delta["unchanged"] == 5
+    assert [(c["position"], c["clause"]) for c in delta["added"]] == [(1, revised[3])]
+
+def test_other_engine_version_rescores_everything(risk_engine, db):
+    index = NearDuplicateIndex(db)
+    index.add("old", risk_engine.analyze_contract(BASE)["clause_digest"], "an older model")
+    risk_engine.clause_cache.clear()
+    analysis, delta = analyze_revision(risk_engine, index, {}, "old", BASE)
+    assert delta["unchanged"] == len(BASE) and delta["rescored"] == len(BASE)
+
+def test_missing_digest_falls_back_to_a_full_analysis(risk_engine, db):
+    risk_engine.clause_cache.clear()
+    analysis, delta = analyze_revision(risk_engine, NearDuplicateIndex(db), {"risk_score": 10}, "legacy", BASE)
+    assert analysis == {**risk_engine.analyze_contract(BASE), "clause_cache": analysis["clause_cache"]}
+    assert delta["base_clauses_known"] is False and delta["rescored"] == len(BASE)
+    assert delta["risk_score_change"] == analysis["risk_score"] - 10
+    assert delta["unchanged"] == 0 and delta["added"] == delta["modified"] == delta["removed"] == []
+
+def test_revision_endpoint(client):
+    first = client.post("/analyze", json={"text": " ".join(BASE)}).get_json()
+    revised = " ".join(BASE[:4] + ["Notices may be sent by email."])
+    result = client.post("/analyze", json={"text": revised, "revision_of": first["id"]}).get_json()
+    assert result["revision"]["base_contract_id"] == first["id"]
+    assert result["revision"]["unchanged"] == 4
+    assert [c["clause"] for c in result["revision"]["modified"]] == ["Notices may be sent by email."]
+    response = client.post("/analyze", json={"text": revised, "revision_of": "deleted"})
+    assert response.status_code == 404 and "not found" in response.get_json()["error"]
+
+def test_revision_of_a_contract_without_digest(client, db):
+    db.collection("contracts").document("legacy").set({"filename": "old.pdf", "risk_score": 30})
+    response = client.post("/analyze", json={"text": " ".join(BASE), "revision_of": "legacy"})
+    assert response.status_code == 200
+    revision = response.get_json()["revision"]
+    assert revision["base_contract_id"] == "legacy" and revision["base_clauses_known"] is False
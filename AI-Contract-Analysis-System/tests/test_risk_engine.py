@@ -0,0 +1,39 @@
+CLAUSES = [
+    "The Provider shall indemnify the Client against all losses.",
+    "All notices must be in writing and sent via certified mail.",
+    "This agreement is governed by the laws of California.",
+    "The parties will meet quarterly to review the project plan.",
+    "Payment is due within thirty days of the invoice date.",
+]
+
+def test_analyze_clauses_matches_single_clause_scoring(risk_engine):
+    batched = risk_engine.analyze_clauses(CLAUSES)
+    risk_engine.clause_cache.clear()
+    assert batched == [risk_engine.analyze_clause_risk(clause) for clause in CLAUSES]
+
+def test_keyword_hits_override_the_model(risk_engine):
+    result = risk_engine.analyze_clause_risk("Either party may seek arbitration.")
+    assert result == {"risk_level": "High", "risk_score": 0.9,
+                      "explanation": "Contains high-risk keyword: 'arbitration'"}
+
+def test_model_scores_clauses_without_keywords(risk_engine):
+    result = risk_engine.analyze_clause_risk("The parties will meet quarterly to review the project plan.")
+    assert result["risk_level"] in ("High", "Medium", "Low")
+    assert 0.0 < result["risk_score"] <= 1.0
+    assert result["explanation"].startswith("ML Model")
+
+def test_analyze_contract_aggregates(risk_engine):
+    result = risk_engine.analyze_contract(CLAUSES + ["   "])
+    assert result["summary"] == f"Found {sum(r['level'] == 'High' for r in result['risks'])} high-risk clauses."
+    assert len(result["clause_digest"]) == len(CLAUSES)
+    assert all(risk["level"] != "Low" for risk in result["risks"])
+    assert 0 <= result["risk_score"] <= 100
+
+def test_analyze_contracts_matches_one_contract_at_a_time(risk_engine):
+    contracts = [CLAUSES[:2], CLAUSES[2:], [], CLAUSES]
+    batched = risk_engine.analyze_contracts(contracts)
+    risk_engine.clause_cache.clear()
+    for clauses, result in zip(contracts, batched):
+        single = risk_engine.analyze_contract(clauses)
+        for key in ("risks", "risk_score", "summary"):
+            assert result[key] == single[key]
@@ -0,0 +1,99 @@
+import gc
+import multiprocessing
+import os
+import runpy
+import sys
+import types
+
+import pytest
+
+import firebase_config
+import model_store
+from firebase_config import LazyClient
+
+CONF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+class Server:
+    class log:
+        @staticmethod
+        def info(message):
+            pass
+
+def test_components_load_without_connecting(api_module, model_path, monkeypatch):
+    def connect():
+        raise AssertionError("connected while loading models")
+    monkeypatch.setattr(api_module, "db", LazyClient(connect))
+    monkeypatch.setattr(model_store, "DEFAULT_MODEL_PATH", model_path)
+    for name in ("parser", "nlp", "risk_engine", "near_duplicates", "clause_index"):
+        monkeypatch.setattr(api_module, name, getattr(api_module, name))
+    api_module.load_components()
+    assert api_module.db._client is None
+
+_lazy = LazyClient(object)
+
+def _client_id(_):
+    return id(_lazy.client())
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_client_is_recreated_after_fork():
+    parent = _lazy.client()
+    assert _lazy.client() is parent
+    with multiprocessing.get_context("fork").Pool(1) as pool:
+        [child] = pool.map(_client_id, [0])
+    # The child inherited the parent's client (at the same address) and replaced it
+    assert child != id(parent)
+    assert _lazy.client() is parent
+
+@pytest.fixture
+def fake_firebase_admin(tmp_path, monkeypatch):
+    """
+    A firebase_admin stand-in that, like the real one, caches one Firestore
+    client per app in a module-level registry.
+    """
+    class App:
+        def __init__(self):
+            self.firestore_client = object()
+
+    admin = types.ModuleType("firebase_admin")
+    admin._apps = {}
+    admin.deleted = []
+    admin.initialize_app = lambda cred: admin._apps.setdefault("[DEFAULT]", App())
+    admin.get_app = lambda: admin._apps["[DEFAULT]"]
+    admin.delete_app = lambda app: admin.deleted.append(admin._apps.pop("[DEFAULT]"))
+    admin.credentials = types.SimpleNamespace(Certificate=lambda path: path)
+    admin.firestore = types.SimpleNamespace(client=lambda: admin.get_app().firestore_client)
+    monkeypatch.setitem(sys.modules, "firebase_admin", admin)
+    key = tmp_path / "serviceAccountKey.json"
+    key.write_text("{}")
+    monkeypatch.setattr(firebase_config, "SERVICE_ACCOUNT_KEY", str(key))
+    monkeypatch.setattr(firebase_config, "_app_pid", None)
+    return admin
+
+def test_forked_child_gets_a_new_firebase_app(fake_firebase_admin, monkeypatch):
+    lazy = LazyClient(firebase_config.initialize_firebase)
+    parent = lazy.client()
+    assert lazy.client() is parent and fake_firebase_admin.deleted == []
+    parent_app = fake_firebase_admin.get_app()
+    monkeypatch.setattr(os, "getpid", lambda pid=os.getpid(): pid + 1)
+    child = lazy.client()
+    assert child is not parent and child is fake_firebase_admin.get_app().firestore_client
+    assert fake_firebase_admin.deleted == [parent_app]
+    assert lazy.client() is child
+
+def test_injected_client_is_kept():
+    lazy = LazyClient(object)
+    lazy._client = injected = object()
+    assert lazy.client() is injected
+
+@pytest.mark.parametrize("mode,disabled", [("eager", True), ("lazy", False)])
+def test_gc_is_only_held_off_while_preloading(monkeypatch, mode, disabled):
+    monkeypatch.setenv("LEXIGUARD_STARTUP", mode)
+    try:
+        conf = runpy.run_path(CONF)
+        assert gc.isenabled() != disabled
+        conf["when_ready"](Server())
+        assert gc.isenabled()
+        assert "post_fork" not in conf
+    finally:
+        gc.unfreeze()
+        gc.enable()
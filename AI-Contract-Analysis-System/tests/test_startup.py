@@ -0,0 +1,139 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import startup
+from metrics import metrics
+from startup import Warmup, profile_imports
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_wait_loads_inline_when_not_started():
+    calls = []
+    warmup = Warmup(lambda: calls.append(1) or {"nlp": "pipeline"})
+    assert warmup.status() == "not started" and not warmup.ready
+    assert warmup["nlp"] == "pipeline"
+    assert warmup.wait() == {"nlp": "pipeline"}
+    assert warmup.status() == "ready" and warmup.ready and warmup.seconds is not None
+    assert calls == [1]
+
+def test_start_loads_in_the_background_once():
+    release = threading.Event()
+    calls = []
+
+    def factory():
+        calls.append(threading.current_thread().name)
+        release.wait(5)
+        return "components"
+
+    warmup = Warmup(factory, name="models")
+    assert warmup.start() is warmup
+    warmup.start()
+    assert warmup.status() == "loading"
+    with pytest.raises(TimeoutError, match="models are still loading"):
+        warmup.wait(timeout=0.05)
+    release.set()
+    assert warmup.wait(timeout=5) == "components"
+    assert calls == ["warmup-models"]
+
+def test_failed_loads_are_reported_and_reraised():
+    series = 'warmup_seconds{component="broken"}'
+    count = metrics.snapshot()["histograms"].get(series, {}).get("count", 0)
+
+    def factory():
+        raise RuntimeError("model artifact is corrupt")
+
+    warmup = Warmup(factory, name="broken")
+    with pytest.raises(RuntimeError, match="corrupt"):
+        warmup.wait()
+    assert warmup.status() == "failed" and not warmup.ready
+    # Later waits fail the same way instead of loading again
+    with pytest.raises(RuntimeError):
+        warmup["nlp"]
+    assert metrics.snapshot()["histograms"][series]["count"] == count + 1
+
+def test_lazy_api_import_is_light_and_answers_health():
+    # Warm-up threads are not started, so the modules seen are the import's own
+    script = """
+import json, sys
+import startup
+startup.Warmup.start = lambda self: self
+import api
+client = api.app.test_client()
+analyze = client.post("/analyze", json={"text": "The Supplier shall deliver the goods."})
+print(json.dumps({
+    "heavy": sorted(m for m in ("spacy", "sklearn", "scipy", "pdfplumber", "docx", "fpdf", "firebase_admin",
+                                "pandas") if m in sys.modules),
+    "connected": api.db._client is not None,
+    "health": client.get("/health").status_code,
+    "ready": client.get("/ready").get_json(),
+    "ready_status": client.get("/ready").status_code,
+    "analyze": analyze.status_code,
+    "retry_after": analyze.headers.get("Retry-After"),
+    "metrics": client.get("/metrics").status_code
+}))
+"""
+    env = {**os.environ, "LEXIGUARD_STARTUP": "lazy"}
+    completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=ROOT,
+                               env=env, timeout=120)
+    assert completed.returncode == 0, completed.stderr
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    assert result["heavy"] == [] and not result["connected"]
+    assert result["health"] == 200 and result["metrics"] == 200
+    assert result["ready_status"] == 503 and result["ready"]["models"] == "not started"
+    assert result["analyze"] == 503 and result["retry_after"] == "5"
+
+def test_ready_reports_a_failed_load(api, client, monkeypatch):
+    def factory():
+        raise RuntimeError("no model")
+
+    failed = Warmup(factory)
+    with pytest.raises(RuntimeError):
+        failed.wait()
+    monkeypatch.setattr(api, "warmup", failed)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.get_json()["models"] == "failed" and response.get_json()["error"] == "no model"
+    assert client.get("/health").status_code == 200
+    assert client.post("/analyze", json={"text": "The Supplier shall deliver the goods."}).status_code == 503
+
+def test_app_renders_before_the_indexes_load(db, model_path, monkeypatch):
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    import firebase_config
+    import model_store
+    from near_duplicates import NearDuplicateIndex
+
+    release = threading.Event()
+    monkeypatch.setattr(NearDuplicateIndex, "load", lambda self: release.wait(30))
+    monkeypatch.setattr(firebase_config.db, "_client", db)
+    monkeypatch.setattr(model_store, "DEFAULT_MODEL_PATH", model_path)
+    monkeypatch.setattr(startup, "STARTUP_MODE", "eager")
+    st.cache_resource.clear()
+    try:
+        # Eager mode loads the models before the first page, but not the indexes
+        app = AppTest.from_file(os.path.join(ROOT, "app.py")).run(timeout=20)
+        assert not app.exception
+        assert [caption.value for caption in app.sidebar.caption] == ["Indexes: loading"]
+    finally:
+        release.set()
+        st.cache_resource.clear()
+
+def test_profile_imports(tmp_path, monkeypatch):
+    total, packages = profile_imports("mock_firestore")
+    assert total > 0 and packages == sorted(packages, reverse=True)
+    assert "mock_firestore" in [name for _, name in packages]
+    with pytest.raises(RuntimeError):
+        profile_imports("no_such_module")
+
+    monkeypatch.setenv("LEXIGUARD_STARTUP", "eager")
+    output = str(tmp_path / "imports.json")
+    assert startup.main(["mock_firestore", "--top", "3", "--output", output]) == 0
+    with open(output, encoding="utf-8") as f:
+        result = json.load(f)["mock_firestore"]
+    assert result["mode"] == "lazy" and result["total_seconds"] > 0
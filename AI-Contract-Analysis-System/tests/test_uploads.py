@@ -0,0 +1,88 @@
+import hashlib
+import io
+import os
+
+import docx
+import pytest
+
+import uploads
+from uploads import stage_upload
+
+DATA = bytes(range(256)) * 40   # 10 KiB
+
+class PlainStream:
+    """
+    A readable stream without getbuffer() or readinto(), like a socket.
+    """
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self._data.read(size)
+
+def _docx_bytes(paragraphs):
+    document = docx.Document()
+    for text in paragraphs:
+        document.add_paragraph(text)
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+@pytest.mark.parametrize("make", [io.BytesIO, PlainStream, lambda data: io.BufferedReader(io.BytesIO(data))])
+@pytest.mark.parametrize("spill_bytes", [len(DATA), len(DATA) - 1, 0])
+def test_staged_uploads_hash_and_read_back(make, spill_bytes):
+    with stage_upload(make(DATA), "contract.pdf", spill_bytes=spill_bytes, chunk_size=1000) as upload:
+        assert upload.file_hash == hashlib.sha256(DATA).hexdigest()
+        assert upload.size == len(DATA)
+        assert upload.spilled == (len(DATA) > spill_bytes)
+        assert upload.open().read() == DATA
+        # open() rewinds, and the file object seeks like a real one
+        source = upload.open()
+        source.seek(-6, io.SEEK_END)
+        assert source.read() == DATA[-6:] and source.tell() == len(DATA)
+        path = upload.path
+    assert upload.path is None
+    if path is not None:
+        assert path.endswith(".pdf") and not os.path.exists(path)
+
+def test_spilled_uploads_are_removed_on_error(monkeypatch, tmp_path):
+    monkeypatch.setattr(uploads.tempfile, "tempdir", str(tmp_path))
+
+    class Failing(PlainStream):
+        def read(self, size=-1):
+            if self._data.tell() >= 3000:
+                raise OSError("connection reset")
+            return super().read(size)
+
+    with pytest.raises(OSError):
+        stage_upload(Failing(DATA), "contract.pdf", spill_bytes=1000, chunk_size=1000)
+    assert os.listdir(tmp_path) == []
+
+def test_spilled_docx_parses(api):
+    data = _docx_bytes(["The Supplier shall deliver the goods within thirty days."])
+    with stage_upload(io.BytesIO(data), "contract.docx", spill_bytes=100) as upload:
+        assert upload.spilled
+        assert api.parser.parse_stream(upload.open(), "contract.docx") == "The Supplier shall deliver the goods within thirty days."
+
+def test_upload_endpoint_detects_duplicates(api, client, db, monkeypatch):
+    data = _docx_bytes([
+        "The Provider shall indemnify the Client against all losses.",
+        "This agreement is governed by the laws of California."
+    ])
+
+    def upload():
+        return client.post("/analyze", data={"file": (io.BytesIO(data), "contract.docx")},
+                           content_type="multipart/form-data").get_json()
+
+    first = upload()
+    assert first["success"] and "duplicate" not in first
+    contract = db.collection("contracts").document(first["id"]).get().to_dict()
+    assert contract["hash"] == hashlib.sha256(data).hexdigest()
+
+    parse_calls = []
+    monkeypatch.setattr(api.parser, "parse_stream", lambda *args: parse_calls.append(args))
+    again = upload()
+    assert again["duplicate"] and again["id"] == first["id"]
+    assert again["risk_score"] == first["risk_score"]
+    assert [risk["clause"] for risk in again["details"]] == [risk["clause"] for risk in first["details"]]
+    assert parse_calls == []
@@ -0,0 +1,157 @@
+import hashlib
+import io
+import logging
+import mmap
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Uploads above this are spilled to a memory-mapped temp file
+UPLOAD_SPILL_BYTES = int(os.environ.get("LEXIGUARD_UPLOAD_SPILL_MB", 8)) * 1024 * 1024
+HASH_CHUNK_BYTES = 1024 * 1024
+
+class MappedFile(io.RawIOBase):
+    """
+    Read-only, seekable file object over an mmap. pdfplumber and python-docx
+    (zipfile) need seekable(), which mmap itself does not provide.
+    """
+    def __init__(self, mapped):
+        self._mapped = mapped
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        return self._mapped.read(None if size is None or size < 0 else size)
+
+    def readinto(self, buffer):
+        data = self._mapped.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._mapped.seek(offset, whence)
+        return self._mapped.tell()
+
+    def tell(self):
+        return self._mapped.tell()
+
+class StagedUpload:
+    """
+    An uploaded file that has been hashed once, before any parsing.
+    Small uploads keep the original in-memory object; large ones live in a
+    memory-mapped temp file, so the page cache holds them rather than Python.
+    Use as a context manager (or call close()) to remove the temp file.
+    """
+    def __init__(self, name, file_hash, size, source, path=None, mapped=None):
+        self.name = name
+        self.file_hash = file_hash
+        self.size = size
+        self.source = source
+        self.path = path
+        self._mapped = mapped
+
+    @property
+    def spilled(self):
+        return self.path is not None
+
+    def open(self):
+        """
+        The upload as a seekable binary file object, rewound to the start.
+        """
+        self.source.seek(0)
+        return self.source
+
+    def close(self):
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError as e:
+                logger.warning(f"Failed to remove upload spill file {self.path}: {e}")
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def stage_upload(fileobj, name, spill_bytes=UPLOAD_SPILL_BYTES, chunk_size=HASH_CHUNK_BYTES):
+    """
+    Hashes an upload (SHA256, as compute_file_hash) in a single pass and
+    returns a StagedUpload.
+
+    BytesIO-backed uploads (Streamlit's UploadedFile, werkzeug's in-memory
+    streams) are hashed through memoryview slices of their buffer, without
+    copying it. Other streams are read in chunks into one reusable buffer.
+    Anything larger than spill_bytes is written to a temp file on the way and
+    memory-mapped.
+    """
+    digest = hashlib.sha256()
+    getbuffer = getattr(fileobj, "getbuffer", None)
+    if getbuffer is not None:
+        with getbuffer() as view:
+            size = len(view)
+            for start in range(0, size, chunk_size):
+                digest.update(view[start:start + chunk_size])
+            if size <= spill_bytes:
+                fileobj.seek(0)
+                return StagedUpload(name, digest.hexdigest(), size, fileobj)
+            out, path = _spill_file(name)
+            try:
+                with out:
+                    for start in range(0, size, chunk_size):
+                        out.write(view[start:start + chunk_size])
+            except Exception:
+                os.remove(path)
+                raise
+        return _mapped_upload(name, digest.hexdigest(), path, size)
+
+    # Plain stream: buffered in memory until it outgrows spill_bytes
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    out, path, size = io.BytesIO(), None, 0
+    try:
+        while True:
+            count = fileobj.readinto(buffer) if hasattr(fileobj, "readinto") else _read_into(fileobj, buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+            if path is None and size + count > spill_bytes:
+                spilled, path = _spill_file(name)
+                spilled.write(out.getbuffer())
+                out = spilled
+            out.write(view[:count])
+            size += count
+    except Exception:
+        if path is not None:
+            out.close()
+            os.remove(path)
+        raise
+    if path is None:
+        out.seek(0)
+        return StagedUpload(name, digest.hexdigest(), size, out)
+    out.close()
+    return _mapped_upload(name, digest.hexdigest(), path, size)
+
+def _read_into(fileobj, buffer):
+    data = fileobj.read(len(buffer))
+    buffer[:len(data)] = data
+    return len(data)
+
+def _spill_file(name):
+    fd, path = tempfile.mkstemp(prefix="lexiguard_upload_", suffix=os.path.splitext(name)[1])
+    return os.fdopen(fd, "wb"), path
+
+def _mapped_upload(name, file_hash, path, size):
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    logger.info(f"Spilled {size} byte upload {name} to {path}")
+    return StagedUpload(name, file_hash, size, MappedFile(mapped), path=path, mapped=mapped)
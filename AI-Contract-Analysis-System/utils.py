@@ -1,8 +1,9 @@
 import hashlib
+import itertools
 import logging
 import os
-from fpdf import FPDF
 from datetime import datetime
+from audit_sink import AuditSink
 
 # Setup logging
 logging.basicConfig(
@@ -15,17 +16,28 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Risks detailed in a PDF report; the rest are only counted
+REPORT_MAX_RISKS = int(os.environ.get("LEXIGUARD_REPORT_MAX_RISKS", 200))
+
 def compute_file_hash(file_bytes):
     """
     Computes SHA256 hash of file content for duplicate detection.
     """
     return hashlib.sha256(file_bytes).hexdigest()
 
-def generate_pdf_report(analysis_result, output_path):
+def render_pdf_report(analysis_result, risks=None, max_risks=None):
     """
-    Generates a PDF report from the analysis result.
+    Renders the PDF report and returns it as bytes (no temp file).
+    risks: any iterable of risk dicts, e.g. a generator paging them from
+    risk_analysis; defaults to analysis_result['risks']. fpdf keeps the whole
+    document in memory, so only the first max_risks (default
+    REPORT_MAX_RISKS) are detailed and the rest are summarized in one line;
+    report size and memory are bounded whatever the number of risks.
     """
+    from fpdf import FPDF
+
     pdf = FPDF()
+    pdf.set_compression(True)
     pdf.add_page()
     pdf.set_font("Arial", size=12)
     
@@ -45,35 +57,68 @@ def generate_pdf_report(analysis_result, output_path):
     pdf.cell(200, 10, txt="Identified Risks", ln=True)
     pdf.set_font("Arial", size=12)
     
-    risks = analysis_result.get('risks', [])
-    if not risks:
+    if risks is None:
+        risks = analysis_result.get('risks', [])
+    if max_risks is None:
+        max_risks = REPORT_MAX_RISKS
+    risks = iter(risks)
+    rendered = remaining = 0
+    for risk in itertools.islice(risks, max_risks):
+        pdf.set_font("Arial", 'B', 12)
+        pdf.cell(200, 10, txt=_latin1(f"- {risk['type']} ({risk['level']})"), ln=True)
+        pdf.set_font("Arial", size=10)
+        pdf.multi_cell(0, 5, txt=_latin1(f"  Clause: {risk['clause'][:100]}..."))
+        pdf.multi_cell(0, 5, txt=_latin1(f"  Explanation: {risk['explanation']}"))
+        pdf.ln(5)
+        rendered += 1
+    if rendered == max_risks:
+        # Stored contracts carry their risk count, which saves paging through the rest
+        if 'risk_count' in analysis_result:
+            remaining = max(0, analysis_result['risk_count'] - rendered)
+        else:
+            remaining = sum(1 for _ in risks)
+        if remaining > 0:
+            pdf.set_font("Arial", 'I', 10)
+            pdf.multi_cell(0, 5, txt=f"{remaining} more risks not shown. See the full analysis in LexiGuard.")
+    if not rendered and not remaining:
         pdf.cell(200, 10, txt="No significant risks detected.", ln=True)
-    else:
-        for risk in risks:
-            pdf.set_font("Arial", 'B', 12)
-            pdf.cell(200, 10, txt=f"- {risk['type']} ({risk['level']})", ln=True)
-            pdf.set_font("Arial", size=10)
-            pdf.multi_cell(0, 5, txt=f"  Clause: {risk['clause'][:100]}...")
-            pdf.multi_cell(0, 5, txt=f"  Explanation: {risk['explanation']}")
-            pdf.ln(5)
-            
+
+    output = pdf.output(dest='S')
+    # fpdf 1.x returns a latin-1 str, fpdf2 a bytearray
+    return output.encode('latin-1') if isinstance(output, str) else bytes(output)
+
+def generate_pdf_report(analysis_result, output_path, risks=None):
+    """
+    Generates a PDF report from the analysis result.
+    """
     try:
-        pdf.output(output_path)
+        report = render_pdf_report(analysis_result, risks)
+        with open(output_path, "wb") as f:
+            f.write(report)
         return output_path
     except Exception as e:
         logger.error(f"Failed to generate PDF: {e}")
         return None
 
+def _latin1(text):
+    # The core PDF fonts only cover latin-1
+    return text.encode('latin-1', 'replace').decode('latin-1')
+
+# One background audit sink per database client
+_audit_sinks = {}
+
+def get_audit_sink(db):
+    sink = _audit_sinks.get(id(db))
+    if sink is None:
+        sink = _audit_sinks[id(db)] = AuditSink(db)
+    return sink
+
 def log_audit_event(db, user, action, details):
     """
     Logs an audit event to Firestore (or mock).
+    The event is queued and written in the background by the AuditSink.
     """
     try:
-        db.collection('audit_logs').add({
-            'user': user,
-            'action': action,
-            'details': details,
-            'timestamp': datetime.now()
-        })
+        get_audit_sink(db).log(user, action, details)
     except Exception as e:
         logger.error(f"Failed to log audit event: {e}")